@@ -1,17 +1,43 @@
-from flask import Flask
+from time import perf_counter
+from flask import Flask, g, request
 from flask_cors import CORS
 from flask_socketio import SocketIO
-from app.routes import traffic_routes, prediction_routes
+from app.config import METRICS_ENABLED, SERVER_MODE
+from app.services import http_encoding
+from app.routes import traffic_routes, prediction_routes, metrics_routes, cache_routes
 
-socketio = SocketIO(cors_allowed_origins="*")
+socketio = SocketIO(cors_allowed_origins="*", async_mode=SERVER_MODE)
+
+def _instrument(app):
+    from app.metrics import http_request_seconds
+
+    @app.before_request
+    def start_timer():
+        g.request_start = perf_counter()
+
+    @app.after_request
+    def record_latency(response):
+        start = g.pop("request_start", None)
+        if start is not None:
+            # Rótulo pelo padrão da rota (ex.: /api/traffic/captures/<ip>) para não criar uma série por IP
+            route = request.url_rule.rule if request.url_rule is not None else "desconhecida"
+            http_request_seconds.observe(perf_counter() - start, request.method, route, response.status_code)
+        return response
 
 def create_app():
     app = Flask(__name__)
     CORS(app)
+    http_encoding.install(app)
 
     app.register_blueprint(traffic_routes.bp)
     app.register_blueprint(prediction_routes.bp)
+    app.register_blueprint(cache_routes.bp)
+    if METRICS_ENABLED:
+        app.register_blueprint(metrics_routes.bp)
+        _instrument(app)
 
+    # Importado antes do init_app: os eventos ficam em socketio.handlers e valem para todo app criado
+    from app import socket_events  # noqa: F401
     socketio.init_app(app)
 
     return app
@@ -4,7 +4,112 @@ from dotenv import load_dotenv
 load_dotenv()
 
 SERVER_IP = os.getenv("SERVER_IP")
+# Endereços e prefixos CIDR monitorados (IPv4/IPv6), separados por vírgula; padrão: SERVER_IP
+MONITORED_ADDRESSES = [a.strip() for a in os.getenv("MONITORED_ADDRESSES", "").split(",") if a.strip()]
+if not MONITORED_ADDRESSES and SERVER_IP:
+    MONITORED_ADDRESSES = [SERVER_IP]
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-if not SERVER_IP:
-    raise RuntimeError("Defina a variável SERVER_IP no .env")
+# Servidor: "threading" (padrão) ou cooperativo com "gevent"/"eventlet" (o monkey patch fica em run.py)
+SERVER_MODE = os.getenv("SERVER_MODE", "threading").lower()
+
+# Janela (s) de agregação do reporter: cada flush grava uma linha por cliente
+REPORT_INTERVAL = int(os.getenv("REPORT_INTERVAL", "5"))
+# Gravação do flush em traffic_logs: "copy" (COPY FROM STDIN) ou "values" (INSERT de várias linhas)
+TRAFFIC_INSERT_METHOD = os.getenv("TRAFFIC_INSERT_METHOD", "copy").lower()
+# Gravação assíncrona: lotes aguardando o banco na fila em memória; além disso (ou com o
+# banco fora do ar) eles vão para segmentos em WRITER_SPILL_DIR e são relidos em ordem
+WRITER_QUEUE_SIZE = max(1, int(os.getenv("WRITER_QUEUE_SIZE", "64")))
+WRITER_SPILL_DIR = os.getenv("WRITER_SPILL_DIR", "spill")
+WRITER_SEGMENT_BYTES = int(os.getenv("WRITER_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+# Espera (s) entre tentativas de gravar com o banco fora do ar
+WRITER_RETRY_INTERVAL = float(os.getenv("WRITER_RETRY_INTERVAL", "5"))
+# Rotas de histórico com stream=ndjson|json: linhas buscadas por vez no cursor do servidor
+STREAM_FETCH_SIZE = max(1, int(os.getenv("STREAM_FETCH_SIZE", "2000")))
+# Cache das respostas GET das rotas de tráfego e previsões (por rota e argumentos, LRU com
+# RESPONSE_CACHE_SIZE entradas); limpo a cada gravação no banco, dura no máximo RESPONSE_CACHE_TTL (s)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(REPORT_INTERVAL)))
+RESPONSE_CACHE_SIZE = max(1, int(os.getenv("RESPONSE_CACHE_SIZE", "1024")))
+# Respostas JSON/MessagePack a partir de COMPRESS_MIN_BYTES saem com gzip ou brotli (Accept-Encoding)
+RESPONSE_COMPRESSION = os.getenv("RESPONSE_COMPRESSION", "true").lower() in ("1", "true", "yes")
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+
+# /api/traffic lê um snapshot da janela em andamento, refeito a cada REALTIME_REFRESH_INTERVAL (s)
+# fora das requisições; os REALTIME_TOP_MAX maiores clientes já ficam separados para ?limit=
+REALTIME_REFRESH_INTERVAL = float(os.getenv("REALTIME_REFRESH_INTERVAL", "1"))
+REALTIME_TOP_MAX = max(1, int(os.getenv("REALTIME_TOP_MAX", "100")))
+# Salas do websocket (traffic_subscribe): maior n das salas top:<n>, salas por cliente e
+# espera (s) pelo ack de uma mensagem antes de considerá-la perdida e mandar um snapshot
+LIVE_TOP_MAX = max(1, int(os.getenv("LIVE_TOP_MAX", "100")))
+LIVE_MAX_ROOMS = max(1, int(os.getenv("LIVE_MAX_ROOMS", "50")))
+LIVE_ACK_TIMEOUT = float(os.getenv("LIVE_ACK_TIMEOUT", "30"))
+
+# Motor de captura: "scapy" (dissecação completa) ou "raw" (leitura direta dos bytes)
+CAPTURE_ENGINE = os.getenv("CAPTURE_ENGINE", "scapy").lower()
+# Interface de captura (vazio = interface padrão do Scapy / todas no motor raw)
+CAPTURE_INTERFACE = os.getenv("CAPTURE_INTERFACE") or None
+# Número de workers de captura (com o motor "raw" o kernel reparte os fluxos entre eles)
+CAPTURE_WORKERS = max(1, int(os.getenv("CAPTURE_WORKERS", "1")))
+# "thread" ou "process" (processos escalam entre núcleos; somente Linux). Nos modos cooperativos
+# a captura fica fora do processo do servidor, para não disputar o loop de eventos
+CAPTURE_WORKER_MODE = os.getenv("CAPTURE_WORKER_MODE", "thread" if SERVER_MODE == "threading" else "process").lower()
+# Pacotes acumulados por lote no motor "raw" antes da contabilidade vetorizada (0 = por pacote)
+CAPTURE_BATCH_SIZE = max(0, int(os.getenv("CAPTURE_BATCH_SIZE", "65536")))
+# Filtro BPF gerado a partir dos endereços monitorados e anexado no kernel (descarta o resto antes do Python)
+CAPTURE_KERNEL_FILTER = os.getenv("CAPTURE_KERNEL_FILTER", "true").lower() in ("1", "true", "yes")
+# Filtro BPF adicional do usuário, combinado com AND (ex.: "not port 22")
+CAPTURE_FILTER = os.getenv("CAPTURE_FILTER") or None
+
+# Tabela de fluxos (5-tupla) por worker, exportada para a tabela `flows`
+FLOW_TRACKING = os.getenv("FLOW_TRACKING", "false").lower() in ("1", "true", "yes")
+FLOW_TABLE_SIZE = int(os.getenv("FLOW_TABLE_SIZE", "65536"))
+FLOW_IDLE_TIMEOUT = float(os.getenv("FLOW_IDLE_TIMEOUT", "15"))
+FLOW_ACTIVE_TIMEOUT = float(os.getenv("FLOW_ACTIVE_TIMEOUT", "300"))
+# Máximo de fluxos expirados aguardando gravação (por worker); o excedente é descartado
+FLOW_EXPORT_LIMIT = int(os.getenv("FLOW_EXPORT_LIMIT", "100000"))
+
+# Amostragem adaptativa: sob sobrecarga o worker passa a contabilizar 1 a cada N pacotes
+# (N dobra até SAMPLING_MAX_RATE) e multiplica os contadores por N
+CAPTURE_SAMPLING = os.getenv("CAPTURE_SAMPLING", "true").lower() in ("1", "true", "yes")
+SAMPLING_MAX_RATE = int(os.getenv("SAMPLING_MAX_RATE", "64"))
+# Atraso (s) entre a chegada e o processamento do pacote considerado sobrecarga
+SAMPLING_LAG_THRESHOLD = float(os.getenv("SAMPLING_LAG_THRESHOLD", "0.5"))
+# Intervalo (s) entre reavaliações da taxa
+SAMPLING_INTERVAL = float(os.getenv("SAMPLING_INTERVAL", "1.0"))
+
+# Modo sketch: contadores exatos só para os SKETCH_TOP_K maiores clientes; o resto vai
+# para uma linha "outros" e um Count-Min (SKETCH_WIDTH x SKETCH_DEPTH) com memória constante
+TRAFFIC_SKETCH = os.getenv("TRAFFIC_SKETCH", "false").lower() in ("1", "true", "yes")
+SKETCH_TOP_K = int(os.getenv("SKETCH_TOP_K", "1000"))
+SKETCH_WIDTH = int(os.getenv("SKETCH_WIDTH", "2048"))
+SKETCH_DEPTH = min(64, max(1, int(os.getenv("SKETCH_DEPTH", "4"))))
+
+# Partições diárias de traffic_logs: criadas com PARTITION_PREMAKE_DAYS de antecedência; as que
+# terminam há mais de TRAFFIC_RETENTION_DAYS (0 = nunca) são resumidas nos rollups e removidas
+TRAFFIC_RETENTION_DAYS = int(os.getenv("TRAFFIC_RETENTION_DAYS", "30"))
+PARTITION_PREMAKE_DAYS = max(1, int(os.getenv("PARTITION_PREMAKE_DAYS", "7")))
+PARTITION_MAINTENANCE_INTERVAL = float(os.getenv("PARTITION_MAINTENANCE_INTERVAL", "3600"))
+
+# Endpoint /metrics (formato Prometheus) e instrumentação da captura, do reporter e das rotas
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# O tempo de processamento por pacote é medido em 1 a cada N pacotes (o motor em lote mede cada lote)
+METRICS_SAMPLE_EVERY = max(1, int(os.getenv("METRICS_SAMPLE_EVERY", "1024")))
+
+if not MONITORED_ADDRESSES:
+    raise RuntimeError("Defina a variável SERVER_IP (ou MONITORED_ADDRESSES) no .env")
+
+if CAPTURE_ENGINE not in ("scapy", "raw"):
+    raise RuntimeError("CAPTURE_ENGINE deve ser 'scapy' ou 'raw'")
+
+if TRAFFIC_INSERT_METHOD not in ("copy", "values"):
+    raise RuntimeError("TRAFFIC_INSERT_METHOD deve ser 'copy' ou 'values'")
+
+if CAPTURE_WORKER_MODE not in ("thread", "process"):
+    raise RuntimeError("CAPTURE_WORKER_MODE deve ser 'thread' ou 'process'")
+
+if SERVER_MODE not in ("threading", "gevent", "eventlet"):
+    raise RuntimeError("SERVER_MODE deve ser 'threading', 'gevent' ou 'eventlet'")
+
+if SERVER_MODE != "threading" and CAPTURE_WORKER_MODE != "process":
+    raise RuntimeError(f"SERVER_MODE={SERVER_MODE} requer CAPTURE_WORKER_MODE=process")
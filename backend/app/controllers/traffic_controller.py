@@ -1,13 +1,23 @@
 from app.models.traffic_model import TrafficLog
-from app.services.sniffing_service import traffic_data, data_lock
+from app.services.sniffing_service import capture_pool, get_capture_stats
 
 class TrafficController:
     @staticmethod
-    def aggregate_realtime():
-        with data_lock:
-            data_copy = dict(traffic_data)
-        report = []
-        for ip, data in data_copy.items():
-            report.append(TrafficLog(ip, data["Entrada"], data["Saída"], dict(data["protocolos"])))
-        report.sort(key=lambda x: x.inbound + x.outbound, reverse=True)
-        return report
+    def aggregate_realtime(limit=None):
+        # Snapshot já montado pela thread de atualização: nenhuma espera pelos workers de captura
+        snapshot = capture_pool.snapshot
+        return [TrafficLog(ip, data["Entrada"], data["Saída"], data["protocolos"], server_ip,
+                           data.get("erro"), snapshot.sampling_rate)
+                for (server_ip, ip), data in snapshot.ranked(limit)]
+
+    @staticmethod
+    def sampling_rate():
+        return capture_pool.snapshot.sampling_rate
+
+    @staticmethod
+    def active_clients():
+        return len(capture_pool.snapshot)
+
+    @staticmethod
+    def capture_stats():
+        return get_capture_stats()
@@ -1,24 +1,205 @@
 import os
+import threading
+from time import monotonic
 import psycopg2
+from psycopg2 import extensions
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
 
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
+# "require" em produção; "disable" para bancos locais (testes e benchmarks)
+DB_SSLMODE = os.getenv("DB_SSLMODE", "require")
+# Conexões abertas no máximo ao mesmo tempo (rotas + reporter)
+DB_POOL_SIZE = max(1, int(os.getenv("DB_POOL_SIZE", "10")))
+# Espera (s) por uma conexão livre quando o pool está todo em uso
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Idade máxima (s) de uma conexão antes de ser reaberta
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))
+# Conexões ociosas há mais que isso (s) são testadas com SELECT 1 antes do uso
+DB_POOL_CHECK_IDLE = float(os.getenv("DB_POOL_CHECK_IDLE", "30"))
 
 if not DATABASE_URL:
     raise RuntimeError("Defina a variável DATABASE_URL no .env")
 
-# Função para criar conexão
+
+class PoolTimeout(RuntimeError):
+    """
+    Nenhuma conexão livre no pool dentro do prazo (banco lento ou sobrecarregado).
+    """
+
+
+def connect():
+    """
+    Conexão avulsa, fora do pool (ex.: replay.py, que grava por muito tempo numa só).
+    """
+    return psycopg2.connect(DATABASE_URL, sslmode=DB_SSLMODE)
+
+
+class ConnectionPool:
+    """
+    Pool de conexões seguro entre threads. Na retirada, conexões velhas (acima de
+    `max_lifetime`) são fechadas e as ociosas há mais de `check_idle` passam por um
+    SELECT 1; na devolução, conexões quebradas (fechadas ou com transação em estado
+    desconhecido) são descartadas e a vaga volta para o pool.
+    """
+    def __init__(self, connect=connect, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT,
+                 max_lifetime=DB_POOL_MAX_LIFETIME, check_idle=DB_POOL_CHECK_IDLE):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_idle = check_idle
+        # (conexão, instante da devolução); a mais recente fica no fim
+        self._idle = []
+        self._created = {}
+        self._condition = threading.Condition()
+
+    def __len__(self):
+        return len(self._created)
+
+    def _expired(self, conn, now):
+        return now - self._created[conn] > self.max_lifetime
+
+    def _discard(self, conn):
+        self._created.pop(conn, None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conn):
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self):
+        deadline = monotonic() + self.timeout
+        while True:
+            with self._condition:
+                while True:
+                    now = monotonic()
+                    conn = None
+                    while self._idle:
+                        conn, returned = self._idle.pop()
+                        if conn.closed or self._expired(conn, now):
+                            self._discard(conn)
+                            conn = None
+                        else:
+                            break
+                    if conn is not None:
+                        break
+                    if len(self._created) < self.size:
+                        # Reserva a vaga antes de conectar, fora do lock
+                        placeholder = object()
+                        self._created[placeholder] = now
+                        break
+                    if now >= deadline:
+                        raise PoolTimeout(f"Nenhuma conexão livre no pool após {self.timeout:g}s")
+                    self._condition.wait(deadline - now)
+            if conn is None:
+                break
+            # O SELECT 1 vai pela rede: fora do lock, para não travar quem pega ou devolve conexões
+            if now - returned <= self.check_idle or self._healthy(conn):
+                return conn
+            with self._condition:
+                self._discard(conn)
+                self._condition.notify()
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._condition:
+                del self._created[placeholder]
+                self._condition.notify()
+            raise
+        with self._condition:
+            del self._created[placeholder]
+            self._created[conn] = monotonic()
+        return conn
+
+    def putconn(self, conn, broken=False):
+        if not broken and not conn.closed:
+            status = conn.get_transaction_status()
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                broken = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except Exception:
+                    broken = True
+        with self._condition:
+            if conn not in self._created:
+                return
+            if broken or conn.closed or self._expired(conn, monotonic()):
+                self._discard(conn)
+            else:
+                self._idle.append((conn, monotonic()))
+            self._condition.notify()
+
+    def closeall(self):
+        with self._condition:
+            for conn, _returned in self._idle:
+                self._discard(conn)
+            self._idle = []
+
+    def connection(self):
+        return _PooledConnection(self)
+
+
+class _PooledConnection:
+    """
+    `with pool.connection() as conn:` faz commit (ou rollback, se houver exceção)
+    e devolve a conexão ao pool, em vez de fechá-la.
+    """
+    def __init__(self, pool):
+        self._pool = pool
+        self._conn = None
+
+    def __enter__(self):
+        self._conn = self._pool.getconn()
+        return self._conn.__enter__()
+
+    def __exit__(self, exc_type, exc, tb):
+        conn, self._conn = self._conn, None
+        broken = isinstance(exc, (psycopg2.OperationalError, psycopg2.InterfaceError))
+        try:
+            if not conn.closed:
+                conn.__exit__(exc_type, exc, tb)
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self._pool.putconn(conn, broken)
+        return False
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+# Conexão do pool compartilhado, para uso em `with get_connection() as conn:`
 def get_connection():
-    return psycopg2.connect(DATABASE_URL, sslmode="require")
+    return get_pool().connection()
 
 # Função para executar query e retornar resultados
 def fetch_traffic(since):
     with get_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cursor:
             cursor.execute("""
-                SELECT id, client_ip, inbound, outbound, protocols, created_at
+                SELECT id, client_ip, inbound, outbound, protocol_map(proto_ids, proto_bytes) AS protocols, created_at
                 FROM traffic_logs
                 WHERE created_at >= %s
             """, (since,))
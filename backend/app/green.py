@@ -0,0 +1,22 @@
+"""
+Execução de trabalho bloqueante nos modos cooperativos (SERVER_MODE=gevent/eventlet).
+
+Com o monkey patch do início de run.py, threads viram greenlets e o psycopg2 (via psycogreen)
+cede o loop enquanto espera o banco. O que ainda prende o loop (ajustes de modelos
+com NumPy/statsmodels e a espera pelos processos de captura) vai para uma thread
+nativa com run_blocking(); no modo "threading" a função roda direto.
+"""
+from app.config import SERVER_MODE
+
+
+def run_blocking(function, *args, **kwargs):
+    """
+    function(*args, **kwargs) numa thread nativa, sem bloquear os outros greenlets.
+    """
+    if SERVER_MODE == "gevent":
+        import gevent
+        return gevent.get_hub().threadpool.apply(function, args, kwargs)
+    if SERVER_MODE == "eventlet":
+        from eventlet import tpool
+        return tpool.execute(function, *args, **kwargs)
+    return function(*args, **kwargs)
@@ -0,0 +1,200 @@
+import bisect
+import threading
+
+# Prefixo de todas as métricas expostas em /metrics
+PREFIX = "traffic_monitor_"
+
+# Faixas (s) do tempo por pacote, medido em amostras no caminho de captura
+PACKET_TIME_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = PREFIX + name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS, labels=()):
+        self.name = PREFIX + name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.labels = labels
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        for label_values, (counts, total) in items:
+            lines.extend(render_histogram(self.name, self.buckets, counts, total, self.labels, label_values))
+        return lines
+
+
+def render_histogram(name, buckets, counts, total, labels=(), label_values=()):
+    """
+    Linhas _bucket/_sum/_count de um histograma a partir das contagens por faixa
+    (não cumulativas, a última é +Inf).
+    """
+    lines = []
+    cumulative = 0
+    for bound, count in zip(list(buckets) + ["+Inf"], counts):
+        cumulative += count
+        le = f'le="{bound}"'
+        lines.append(f"{name}_bucket{_format_labels(labels, label_values, le)} {cumulative}")
+    lines.append(f"{name}_sum{_format_labels(labels, label_values)} {_format_value(float(total))}")
+    lines.append(f"{name}_count{_format_labels(labels, label_values)} {cumulative}")
+    return lines
+
+
+class Registry:
+    """
+    Métricas do processo em formato texto do Prometheus. Além das métricas
+    registradas, `collectors` geram linhas na hora da leitura (ex.: contadores
+    que já vivem nos shards de captura, sem custo extra no caminho por pacote).
+    """
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, help_text, labels=()):
+        metric = Counter(name, help_text, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS, labels=()):
+        metric = Histogram(name, help_text, buckets, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for collector in self.collectors:
+            lines.extend(collector())
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def capture_collector(pool):
+    """
+    Contadores dos workers de captura, lidos dos shards só quando /metrics é consultado.
+    """
+    def collect():
+        counters = pool.counters()
+        lines = []
+        for key, kind, help_text in (
+            ("packets_seen", "counter", "Pacotes lidos do socket (após o filtro do kernel)"),
+            ("packets_matched", "counter", "Pacotes que envolvem um endereço monitorado"),
+            ("packets_sampled", "counter", "Pacotes contabilizados (dentro da amostra)"),
+            ("packets_dropped", "counter", "Pacotes descartados pelo kernel (buffer do socket cheio)"),
+            ("flows_dropped", "counter", "Fluxos expirados descartados por exceder FLOW_EXPORT_LIMIT"),
+            ("flows_active", "gauge", "Fluxos ativos nas tabelas dos workers"),
+            ("sampling_rate", "gauge", "Maior taxa de amostragem entre os workers (1 = sem amostragem)"),
+        ):
+            name = PREFIX + key + ("_total" if kind == "counter" else "")
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}",
+                      f"{name} {_format_value(counters[key])}"]
+        name = PREFIX + "packet_processing_seconds"
+        counts, total = pool.packet_time()
+        lines += [f"# HELP {name} Tempo de processamento por pacote (amostrado)", f"# TYPE {name} histogram"]
+        lines += render_histogram(name, PACKET_TIME_BUCKETS, counts, total)
+        return lines
+    return collect
+
+
+def writer_collector(writer):
+    """
+    Fila de gravação do reporter e lotes mantidos em disco enquanto o banco não responde.
+    """
+    def collect():
+        stats = writer.stats()
+        lines = []
+        for key, kind, help_text in (
+            ("queue_depth", "gauge", "Lotes aguardando gravação na fila em memória"),
+            ("spill_bytes", "gauge", "Bytes em disco aguardando releitura para o banco"),
+            ("spilled_batches", "counter", "Lotes enviados para o disco"),
+            ("written_batches", "counter", "Lotes gravados no banco"),
+            ("dead_letter_batches", "counter", "Lotes rejeitados pelo banco, guardados na dead-letter"),
+        ):
+            name = PREFIX + "writer_" + key + ("_total" if kind == "counter" else "")
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {stats[key]}"]
+        return lines
+    return collect
+
+
+def cache_collector(cache):
+    """
+    Acertos e falhas do cache de respostas das rotas.
+    """
+    def collect():
+        stats = cache.stats()
+        lines = []
+        for key, kind, help_text in (
+            ("hits", "counter", "Respostas servidas do cache"),
+            ("misses", "counter", "Respostas calculadas (não estavam no cache)"),
+            ("invalidations", "counter", "Limpezas do cache após gravações no banco"),
+            ("evictions", "counter", "Entradas descartadas com o cache cheio"),
+            ("entries", "gauge", "Respostas guardadas no cache"),
+        ):
+            name = PREFIX + "response_cache_" + key + ("_total" if kind == "counter" else "")
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {stats.get(key, 0)}"]
+        return lines
+    return collect
+
+
+registry = Registry()
+
+swap_wait_seconds = registry.histogram(
+    "swap_wait_seconds", "Espera pelos workers de captura na troca/cópia dos shards", labels=("kind",))
+flush_rows = registry.histogram(
+    "flush_rows", "Clientes (linhas de traffic_logs) por flush do reporter", SIZE_BUCKETS)
+flush_duration_seconds = registry.histogram(
+    "flush_duration_seconds", "Duração do flush do reporter (coleta, banco e emissão)")
+db_insert_seconds = registry.histogram(
+    "db_insert_seconds", "Latência da gravação do flush no banco")
+emit_bytes = registry.histogram(
+    "emit_bytes", "Tamanho (bytes JSON) do evento traffic_update", SIZE_BUCKETS)
+live_messages = registry.counter(
+    "live_messages", "Mensagens das salas do websocket (delta, snapshot) e deltas aglutinados (coalesced)",
+    labels=("kind",))
+http_request_seconds = registry.histogram(
+    "http_request_seconds", "Latência das rotas HTTP", labels=("method", "route", "status"))
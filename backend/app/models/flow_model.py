@@ -0,0 +1,42 @@
+from datetime import datetime
+from psycopg2.extras import execute_values
+
+class FlowLog:
+    def __init__(self, src_ip, dst_ip, src_port, dst_port, protocol, bytes, packets,
+                 first_seen, last_seen, end_reason):
+        self.src_ip = src_ip
+        self.dst_ip = dst_ip
+        self.src_port = src_port
+        self.dst_port = dst_port
+        self.protocol = protocol
+        self.bytes = bytes
+        self.packets = packets
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+        self.end_reason = end_reason
+
+    @classmethod
+    def from_expired(cls, record):
+        """
+        Cria o registro a partir de uma tupla de FlowTable.drain() (timestamps em epoch).
+        """
+        src_ip, dst_ip, sport, dport, proto, nbytes, packets, first, last, reason = record
+        return cls(src_ip, dst_ip, sport, dport, proto, nbytes, packets,
+                   datetime.utcfromtimestamp(first), datetime.utcfromtimestamp(last), reason)
+
+    @staticmethod
+    def save_many(cursor, flows):
+        """
+        Erros sobem para quem chamou, que desfaz a transação do lote.
+        """
+        execute_values(
+            cursor,
+            """
+            INSERT INTO flows (src_ip, dst_ip, src_port, dst_port, protocol,
+                               bytes, packets, first_seen, last_seen, end_reason)
+            VALUES %s
+            """,
+            [(f.src_ip, f.dst_ip, f.src_port, f.dst_port, f.protocol, f.bytes, f.packets,
+              f.first_seen, f.last_seen, f.end_reason) for f in flows],
+            page_size=1000,
+        )
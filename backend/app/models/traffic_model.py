@@ -1,21 +1,88 @@
-from psycopg2.extras import Json
+import csv
+import io
+from datetime import datetime
+from psycopg2.extras import execute_values
+from app.config import TRAFFIC_INSERT_METHOD
+from app.services.packet_parser import PROTOCOL_CODE
+
+COLUMNS = "client_ip, inbound, outbound, proto_ids, proto_bytes, server_ip, sampling_rate"
+# Código reservado ("OUTROS" na tabela protocols) para nomes fora do dicionário
+UNKNOWN_PROTOCOL_CODE = 999
+
+
+def encode_protocols(protocols):
+    """
+    Converte {"TCP": bytes, ...} nos arrays paralelos (proto_ids, proto_bytes) de
+    traffic_logs, ordenados pelo código do dicionário `protocols` (PROTOCOL_CODE).
+    Nomes sem código somam em UNKNOWN_PROTOCOL_CODE: o caminho de gravação não
+    pode falhar por um protocolo novo vindo da captura.
+    """
+    totals = {}
+    for name, size in protocols.items():
+        code = PROTOCOL_CODE.get(name, UNKNOWN_PROTOCOL_CODE)
+        totals[code] = totals.get(code, 0) + int(size)
+    pairs = sorted(totals.items())
+    return [code for code, _size in pairs], [size for _code, size in pairs]
+
+
+def _array_literal(values):
+    return "{" + ",".join(map(str, values)) + "}"
+
 
 class TrafficLog:
-    def __init__(self, client_ip, inbound, outbound, protocols):
+    def __init__(self, client_ip, inbound, outbound, protocols, server_ip=None, error=None, sampling_rate=1.0,
+                 created_at=None):
         self.client_ip = client_ip
         self.inbound = inbound
         self.outbound = outbound
         self.protocols = protocols
+        self.server_ip = server_ip
+        # Modo sketch: bytes que podem ter ficado fora da contagem (não é gravado)
+        self.error = error
+        # Taxa de amostragem da janela: os contadores já vêm multiplicados por ela
+        self.sampling_rate = sampling_rate
+        # Horário da janela (UTC); sem ele, save() usa o padrão do banco
+        self.created_at = created_at
 
     @staticmethod
     def save(cursor, log):
         try:
             cursor.execute(
-                """
-                INSERT INTO traffic_logs (client_ip, inbound, outbound, protocols)
-                VALUES (%s, %s, %s, %s)
+                f"""
+                INSERT INTO traffic_logs ({COLUMNS})
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
                 """,
-                (log.client_ip, log.inbound, log.outbound, Json(log.protocols))
+                (log.client_ip, log.inbound, log.outbound, *encode_protocols(log.protocols), log.server_ip,
+                 log.sampling_rate)
             )
         except Exception as e:
             print(f"Erro ao salvar no banco: {e}")
+
+    @staticmethod
+    def save_many(cursor, logs, method=TRAFFIC_INSERT_METHOD):
+        """
+        Grava o flush inteiro num único comando: COPY FROM STDIN ("copy") ou um
+        INSERT de várias linhas ("values"). Erros sobem para quem chamou, que
+        desfaz a transação do flush.
+        """
+        if not logs:
+            return
+        now = datetime.utcnow()
+        if method == "copy":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for log in logs:
+                ids, sizes = encode_protocols(log.protocols)
+                # Campos vazios sem aspas viram NULL no COPY em CSV
+                writer.writerow((log.client_ip, log.inbound, log.outbound, _array_literal(ids), _array_literal(sizes),
+                                 log.server_ip, log.sampling_rate, (log.created_at or now).isoformat()))
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY traffic_logs ({COLUMNS}, created_at) FROM STDIN WITH (FORMAT csv)", buffer)
+        else:
+            execute_values(
+                cursor,
+                f"INSERT INTO traffic_logs ({COLUMNS}, created_at) VALUES %s",
+                [(log.client_ip, log.inbound, log.outbound, *encode_protocols(log.protocols), log.server_ip,
+                  log.sampling_rate, log.created_at or now) for log in logs],
+                page_size=len(logs),
+            )
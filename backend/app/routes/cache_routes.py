@@ -0,0 +1,9 @@
+from flask import Blueprint, jsonify
+from app.services.response_cache import response_cache
+
+bp = Blueprint('cache', __name__)
+
+# Acertos, falhas e tamanho do cache de respostas das rotas GET
+@bp.route('/api/cache', methods=['GET'])
+def get_cache_stats():
+    return jsonify(response_cache.stats())
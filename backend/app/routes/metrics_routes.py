@@ -0,0 +1,9 @@
+from flask import Blueprint, Response
+from app.metrics import registry
+
+bp = Blueprint('metrics', __name__)
+
+# Métricas da captura, do reporter e das rotas no formato texto do Prometheus
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
@@ -1,15 +1,18 @@
 from flask import Blueprint, jsonify, request
 from datetime import datetime, timedelta
 from app.db import get_connection
+from app.green import run_blocking
+from app.services.anomaly import ACTIVE_PERIODS, fetch_samples, run_batch, save_predictions, score_samples
+from app.services.response_cache import PREDICTION, response_cache
 import numpy as np
 from sklearn.linear_model import LinearRegression
-import statistics
 from statsmodels.tsa.arima.model import ARIMA
 
 bp = Blueprint('prediction', __name__)
 
 # 🔹 Rota: buscar previsões recentes (histórico de predições)
 @bp.route('/api/prediction', methods=['GET'])
+@response_cache.cached(PREDICTION)
 def get_predictions():
     try:
         limit = int(request.args.get('limit', 50))
@@ -42,6 +45,7 @@ def get_predictions():
 
 # 🔹 Rota: buscar previsão por IP
 @bp.route('/api/prediction/<ip>', methods=['GET'])
+@response_cache.cached(PREDICTION)
 def get_prediction_by_ip(ip):
     try:
         with get_connection() as conn:
@@ -80,78 +84,62 @@ def run_prediction():
         if not client_ip:
             return jsonify({"error": "No client IP available"}), 400
 
+        # 1. Registro mais recente e histórico (últimos 100) para o baseline, numa consulta só
         with get_connection() as conn:
             with conn.cursor() as cursor:
-                # 1. Obter o registro de tráfego mais recente para ser analisado
-                cursor.execute(
-                    "SELECT inbound, outbound FROM traffic_logs WHERE client_ip = %s "
-                    "ORDER BY created_at DESC LIMIT 1",
-                    (client_ip,)
-                )
-                latest_traffic = cursor.fetchone()
-                if not latest_traffic:
-                    return jsonify({"error": f"Nenhum dado de tráfego encontrado para o IP {client_ip}"}), 404
-                
-                current_inbound, current_outbound = latest_traffic
-
-                # 2. Obter o histórico de tráfego para construir o baseline (perfil normal)
-                # Usamos um período maior (ex: 100 registros) para um baseline mais estável.
-                cursor.execute(
-                    "SELECT inbound FROM traffic_logs WHERE client_ip = %s "
-                    "ORDER BY created_at DESC LIMIT 100",
-                    (client_ip,)
-                )
-                # Extrai apenas o valor de 'inbound' de cada linha
-                historical_inbound = [row[0] for row in cursor.fetchall()]
-        
+                clients, counts, values = fetch_samples(cursor, ips=[client_ip])
+        if not clients:
+            return jsonify({"error": f"Nenhum dado de tráfego encontrado para o IP {client_ip}"}), 404
+
+        # 2. Baseline (média e desvio padrão), limiar de 3 desvios e score pelo z-score:
+        # a mesma conta do lote (/api/prediction/run-batch), ver app/services/anomaly.py
+        results, _skipped = score_samples(clients, counts, values)
         # Garante que temos dados suficientes para o cálculo estatístico
-        if len(historical_inbound) < 10:
-             return jsonify({"error": f"Dados históricos insuficientes para o IP {client_ip}"}), 400
+        if not results:
+            return jsonify({"error": f"Dados históricos insuficientes para o IP {client_ip}"}), 400
 
-        # 3. Calcular o baseline: média e desvio padrão do tráfego histórico
-        mean_inbound = statistics.mean(historical_inbound)
-        std_dev_inbound = statistics.stdev(historical_inbound)
-        
-        # 4. Aplicar a regra estatística para detecção de anomalia
-        # Define um limiar (threshold). 3 desvios padrão é um valor comum.
-        threshold = mean_inbound + (3 * std_dev_inbound)
-        
-        # O tráfego é "suspeito" se o valor atual exceder significativamente o baseline
-        is_suspicious = current_inbound > threshold
-
-        # 5. Calcular um "score de anomalia" em vez de uma falsa probabilidade
-        # Usamos o Z-score, que mede quantos desvios padrão o ponto atual está da média.
-        # Adicionamos 1e-9 para evitar divisão por zero se o desvio padrão for 0.
-        anomaly_score = 0.0
-        if std_dev_inbound > 0:
-            z_score = (current_inbound - mean_inbound) / std_dev_inbound
-            # Normaliza o score para ficar aproximadamente entre 0 e 1, onde valores altos são mais anômalos
-            anomaly_score = 1 / (1 + np.exp(-z_score)) 
-        
         # Monta o resultado final
-        result = {
-            "client_ip": client_ip,
-            "prediction": "suspeito" if is_suspicious else "normal",
-            "probability": float(anomaly_score),  # Agora é um score de anomalia, não uma proporção
-            "timestamp": datetime.utcnow().isoformat()
-        }
+        result = {**results[0], "timestamp": datetime.utcnow().isoformat()}
 
         # Salva a nova predição no banco de dados
         with get_connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute(
-                    "INSERT INTO predictions (client_ip, prediction, probability, created_at) "
-                    "VALUES (%s, %s, %s, %s)",
-                    (client_ip, result["prediction"], result["probability"], datetime.utcnow())
-                )
+                save_predictions(cursor, results)
                 conn.commit()
+        # /api/prediction e /api/prediction/<ip> passam a ver a nova predição
+        response_cache.invalidate(PREDICTION)
 
         return jsonify(result)
 
     except Exception as e:
         print("Erro ao rodar detecção de anomalia:", e)
         return jsonify({"error": str(e)}), 500
-    
+
+
+# 🔹 Rota: detecção de anomalia de vários IPs numa requisição
+# Corpo: {"client_ips": [...]} ou {"period": "hour"} (todos os clientes com tráfego no período)
+@bp.route('/api/prediction/run-batch', methods=['POST'])
+def run_prediction_batch():
+    try:
+        data = request.json or {}
+        client_ips = data.get("client_ips")
+        period = data.get("period", "hour")
+        if client_ips is not None and not isinstance(client_ips, list):
+            return jsonify({"error": "client_ips deve ser uma lista"}), 400
+        if client_ips is None and period not in ACTIVE_PERIODS:
+            return jsonify({"error": "Período inválido"}), 400
+
+        since = datetime.utcnow() - ACTIVE_PERIODS[period] if client_ips is None else None
+        result = run_batch(get_connection, client_ips, since)
+        if result["predictions"]:
+            response_cache.invalidate(PREDICTION)
+        return jsonify(result)
+
+    except Exception as e:
+        print("Erro ao rodar detecção de anomalia em lote:", e)
+        return jsonify({"error": str(e)}), 500
+
+
     # 🔹 Rota: Prever o próximo valor de tráfego para um IP
 @bp.route('/api/prediction/forecast', methods=['POST'])
 def forecast_traffic():
@@ -222,6 +210,18 @@ def forecast_traffic():
         print("Erro na previsão de tráfego:", e)
         return jsonify({"error": str(e)}), 500
     
+def _arima_next_value(history):
+    # O parâmetro 'order=(p, d, q)' define o comportamento do modelo.
+    # (5, 1, 0) é um ponto de partida comum:
+    # p=5: usa os 5 últimos valores para prever o próximo
+    # d=1: diferencia os dados para torná-los estacionários (remove tendência)
+    # q=0: não usa a média móvel dos erros
+    model = ARIMA(history, order=(5, 1, 0))
+    model_fit = model.fit()
+    # Previsão para o próximo ponto no tempo (1 passo à frente)
+    return model_fit.forecast(steps=1)[0]
+
+
 # 🔹 Rota: Prever o próximo valor de tráfego com ARIMA (RECOMENDADO)
 @bp.route('/api/prediction/forecast-arima', methods=['POST'])
 def forecast_traffic_arima():
@@ -244,18 +244,9 @@ def forecast_traffic_arima():
         if len(historical_inbound) < 10: # ARIMA precisa de um pouco mais de dados
             return jsonify({"error": "Dados insuficientes para previsão com ARIMA"}), 404
 
-        # 2. Treinar o modelo ARIMA
-        # O parâmetro 'order=(p, d, q)' define o comportamento do modelo.
-        # (5, 1, 0) é um ponto de partida comum:
-        # p=5: usa os 5 últimos valores para prever o próximo
-        # d=1: diferencia os dados para torná-los estacionários (remove tendência)
-        # q=0: não usa a média móvel dos erros
-        model = ARIMA(historical_inbound, order=(5, 1, 0))
-        model_fit = model.fit()
-
-        # 3. Fazer a previsão para o próximo ponto no tempo (1 passo à frente)
-        forecast = model_fit.forecast(steps=1)
-        predicted_value = forecast[0]
+        # 2. Treinar o modelo ARIMA e 3. prever o próximo ponto (ver _arima_next_value).
+        # O ajuste leva segundos: numa thread nativa ele não trava as outras requisições
+        predicted_value = run_blocking(_arima_next_value, historical_inbound)
 
         # Garante que a predição não seja negativa
         predicted_value = max(0, predicted_value)
@@ -1,76 +1,337 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from datetime import datetime, timedelta
 from app.controllers.traffic_controller import TrafficController
 from app.db import get_connection
+from app.config import REPORT_INTERVAL, TRAFFIC_SKETCH
+from app.services.heavy_hitters import OTHERS_CLIENT, sketch_summary
+from app.services.pagination import (
+    STREAM_FORMATS, decode_cursor, encode_cursor, iter_query, stream_json, stream_ndjson,
+)
+from app.services.response_cache import TRAFFIC, response_cache
+from app.services.rollup import RESOLUTIONS, bucket_start, choose_source
+from app.services.series import (
+    GROUPS, MAX_SERIES_POINTS, build_series, choose_series_source, parse_bucket, series_points, series_query,
+    series_timestamps,
+)
 
 bp = Blueprint('traffic', __name__)
 
-# Rota em tempo real (já depende do TrafficController)
+# Rota em tempo real (já depende do TrafficController); ?limit= (ou ?top=) devolve só os maiores clientes
 @bp.route('/api/traffic', methods=['GET'])
 def get_traffic():
-    report = TrafficController.aggregate_realtime()
+    try:
+        limit = _page_limit(request.args.get("limit", request.args.get("top")))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    report = TrafficController.aggregate_realtime(limit)
     result = [{
         "client_ip": log.client_ip,
+        "server_ip": log.server_ip,
         "inbound": log.inbound,
         "outbound": log.outbound,
         "protocols": log.protocols
     } for log in report]
-    return jsonify({"traffic": result})
+    # Contadores já multiplicados pela taxa de amostragem (1 = sem amostragem)
+    response = {"traffic": result, "sampling_rate": TrafficController.sampling_rate(),
+                "active_clients": TrafficController.active_clients()}
+    if TRAFFIC_SKETCH:
+        # Top-K com limite de erro; o restante vem na linha client_ip = OTHERS_CLIENT ("outros")
+        for item, log in zip(result, report):
+            item["error"] = log.error
+        response["sketch"] = sketch_summary()
+    return jsonify(response)
+
+# Contadores da captura (filtro do kernel x pacotes processados)
+@bp.route('/api/traffic/capture', methods=['GET'])
+def get_capture_stats():
+    return jsonify(TrafficController.capture_stats())
+
+# Janela de cada período aceito pelas rotas de histórico, fluxos e protocolos
+PERIODS = {
+    'minute': timedelta(minutes=1),
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1)
+}
 
-# Rota de histórico
+# Resolução padrão de cada período (a série do período cabe em poucas centenas de pontos por IP)
+DEFAULT_RESOLUTION = {'minute': 'raw', 'hour': 'minute', 'day': 'hour', 'week': 'hour'}
+
+# Rota de histórico: lê do rollup mais grosso que atende à resolução pedida
 @bp.route('/api/traffic/aggregate', methods=['GET'])
+@response_cache.cached(TRAFFIC)
 def get_historical():
     period = request.args.get('period', 'minute')
     now = datetime.utcnow()
 
-    delta_map = {
-        'minute': timedelta(minutes=1),
-        'hour': timedelta(hours=1),
-        'day': timedelta(days=1),
-        'week': timedelta(weeks=1)
-    }
-
-    if period not in delta_map:
+    if period not in PERIODS:
         return jsonify({"error": "Período inválido"}), 400
 
-    since = now - delta_map[period]
+    # Séries por balde somadas no banco, em vez de uma linha por registro
+    if 'bucket' in request.args or 'group_by' in request.args:
+        return _get_series(period, now - PERIODS[period], now)
+
+    resolution = request.args.get('resolution', DEFAULT_RESOLUTION[period])
+    if resolution not in RESOLUTIONS:
+        return jsonify({"error": "Resolução inválida"}), 400
+
+    since = now - PERIODS[period]
+    table, width = choose_source(resolution)
+
+    try:
+        limit = _page_limit(request.args.get('limit'))
+        # Chave de ordenação (e do cursor): a PK dos rollups ou (created_at, id) nas linhas brutas
+        if width is None:
+            key = "created_at, id"
+            query = (
+                "SELECT id, client_ip, inbound, outbound, protocol_map(proto_ids, proto_bytes), created_at, "
+                "server_ip, sampling_rate FROM traffic_logs WHERE created_at >= %s"
+            )
+            params = [since]
+        else:
+            key = "bucket, server_ip, client_ip"
+            query = (
+                "SELECT samples, client_ip, inbound, outbound, protocols, bucket, NULLIF(server_ip, ''), "
+                f"sampling_rate FROM {table} WHERE bucket >= %s"
+            )
+            params = [bucket_start(since, width)]
+        ip = request.args.get('ip')
+        if ip:
+            query += " AND client_ip = %s"
+            params.append(ip)
+        after = request.args.get('cursor')
+        if after:
+            values = decode_cursor(after, key.count(",") + 1)
+            query += f" AND ({key}) > ({', '.join(['%s'] * len(values))})"
+            params += values
+        query += f" ORDER BY {key}"
+        if limit:
+            query += " LIMIT %s"
+            params.append(limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def item(row):
+        result = {
+            "client_ip": row[1],
+            "inbound": row[2],
+            "outbound": row[3],
+            "protocols": row[4],
+            "timestamp": row[5].isoformat(),
+            "server_ip": row[6],
+            "sampling_rate": row[7]
+        }
+        # Linhas brutas têm id; baldes de rollup dizem quantas linhas somaram
+        result["id" if width is None else "samples"] = row[0]
+        return result
+
+    stream = _stream_response(request.args.get('stream'), query, params, item, "traffic", {"resolution": resolution})
+    if stream is not None:
+        return stream
 
     try:
         # cria conexão e cursor local para cada request
         with get_connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute(
-                    "SELECT id, client_ip, inbound, outbound, protocols, created_at "
-                    "FROM traffic_logs WHERE created_at >= %s",
-                    (since,)
-                )
+                cursor.execute(query, params)
                 rows = cursor.fetchall()
 
-        traffic_data = []
-        for row in rows:
-            traffic_data.append({
-                "id": row[0],
-                "client_ip": row[1],
-                "inbound": row[2],
-                "outbound": row[3],
-                "protocols": row[4],
-                "timestamp": row[5].isoformat()
-            })
-
-        return jsonify({"traffic": traffic_data})
+        response = {"traffic": [item(row) for row in rows], "resolution": resolution}
+        if limit:
+            last = rows[-1] if len(rows) == limit else None
+            response["next_cursor"] = last and encode_cursor(
+                [last[5], last[0]] if width is None else [last[5], last[6] or "", last[1]]
+            )
+        return jsonify(response)
 
     except Exception as e:
         print("Erro ao buscar histórico:", e)
         return jsonify({"error": str(e)}), 500
 
+
+def _get_series(period, since, now):
+    """
+    /api/traffic/aggregate com bucket (10s, 1m, 1h...), group_by (none, ip, protocol),
+    top e ip: o banco soma por balde e a resposta traz um array de horários e, por
+    chave, arrays de valores alinhados a ele (zero nos baldes sem dados).
+    """
+    group_by = request.args.get('group_by', 'none')
+    try:
+        if group_by not in GROUPS:
+            raise ValueError("group_by inválido")
+        if 'bucket' in request.args:
+            width = parse_bucket(request.args['bucket'])
+        else:
+            width = choose_source(DEFAULT_RESOLUTION[period])[1] or timedelta(seconds=REPORT_INTERVAL)
+        top = _page_limit(request.args.get('top'), 10, "top")
+        resolution = request.args.get('resolution')
+        if resolution is None:
+            resolution, table = choose_series_source(width)
+        else:
+            if resolution not in RESOLUTIONS:
+                raise ValueError("Resolução inválida")
+            table, source_width = choose_source(resolution)
+            if source_width and (source_width > width or width % source_width):
+                raise ValueError("Resolução incompatível com o bucket")
+        start = bucket_start(since, width)
+        points = series_points(start, now, width)
+        if points > MAX_SERIES_POINTS:
+            raise ValueError(f"Bucket pequeno demais para o período (máximo de {MAX_SERIES_POINTS} pontos)")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    query, params = series_query(table, group_by, start, now, width, request.args.get('ip'), top)
+    try:
+        with get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+
+        fields = ["bytes"] if group_by == "protocol" else ["inbound", "outbound"]
+        return jsonify({
+            "resolution": resolution,
+            "bucket": int(width.total_seconds()),
+            "group_by": group_by,
+            "timestamps": series_timestamps(start, width, points),
+            "series": build_series(rows, start, width, points, fields)
+        })
+
+    except Exception as e:
+        print("Erro ao buscar séries:", e)
+        return jsonify({"error": str(e)}), 500
+
+
+def _page_limit(value, default=None, name="limit"):
+    """
+    Inteiro positivo pedido em ?limit= (ou `name`); None = sem limite.
+    """
+    if value is None:
+        return default
+    if not value.isdigit() or int(value) < 1:
+        raise ValueError(f"{name} deve ser um inteiro positivo")
+    return int(value)
+
+
+def _stream_response(fmt, query, params, item, key, extra):
+    """
+    Resposta em stream (stream=ndjson ou json) lida por um cursor do servidor, ou
+    None se o stream não foi pedido.
+    """
+    if fmt is None:
+        return None
+    if fmt not in STREAM_FORMATS:
+        return jsonify({"error": "Formato de stream inválido"}), 400
+    items = map(item, iter_query(get_connection, query, params))
+    if fmt == "ndjson":
+        return Response(stream_with_context(stream_ndjson(items)), mimetype="application/x-ndjson")
+    return Response(stream_with_context(stream_json(items, key, extra)), mimetype="application/json")
+
+# Rota dos fluxos (5-tupla) que mais trafegaram no período
+@bp.route('/api/traffic/flows', methods=['GET'])
+@response_cache.cached(TRAFFIC)
+def get_top_flows():
+    period = request.args.get('period', 'hour')
+    ip = request.args.get('ip')
+
+    if period not in PERIODS:
+        return jsonify({"error": "Período inválido"}), 400
+
+    since = datetime.utcnow() - PERIODS[period]
+
+    try:
+        limit = _page_limit(request.args.get('limit'), 50)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        query = (
+            "SELECT src_ip, dst_ip, src_port, dst_port, protocol, bytes, packets, "
+            "first_seen, last_seen, end_reason FROM flows WHERE last_seen >= %s"
+        )
+        params = [since]
+        if ip:
+            query += " AND (src_ip = %s OR dst_ip = %s)"
+            params += [ip, ip]
+        query += " ORDER BY bytes DESC LIMIT %s"
+        params.append(limit)
+
+        with get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+
+        flows = [{
+            "src_ip": r[0],
+            "dst_ip": r[1],
+            "src_port": r[2],
+            "dst_port": r[3],
+            "protocol": r[4],
+            "bytes": r[5],
+            "packets": r[6],
+            "first_seen": r[7].isoformat(),
+            "last_seen": r[8].isoformat(),
+            "end_reason": r[9]
+        } for r in rows]
+
+        return jsonify({"flows": flows})
+
+    except Exception as e:
+        print("Erro ao buscar fluxos:", e)
+        return jsonify({"error": str(e)}), 500
+
+# Rota dos protocolos que mais trafegaram no período (somados no banco, por código)
+@bp.route('/api/traffic/protocols', methods=['GET'])
+@response_cache.cached(TRAFFIC)
+def get_top_protocols():
+    period = request.args.get('period', 'hour')
+    ip = request.args.get('ip')
+
+    if period not in PERIODS:
+        return jsonify({"error": "Período inválido"}), 400
+
+    since = datetime.utcnow() - PERIODS[period]
+
+    try:
+        top = _page_limit(request.args.get('top'), 10, "top")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        query = (
+            "SELECT p.name, SUM(u.size) AS total FROM traffic_logs AS t "
+            "CROSS JOIN LATERAL unnest(t.proto_ids, t.proto_bytes) AS u(id, size) "
+            "JOIN protocols AS p ON p.id = u.id WHERE t.created_at >= %s"
+        )
+        params = [since]
+        if ip:
+            query += " AND t.client_ip = %s"
+            params.append(ip)
+        query += " GROUP BY p.name ORDER BY total DESC LIMIT %s"
+        params.append(top)
+
+        with get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+
+        return jsonify({"protocols": [{"protocol": r[0], "bytes": int(r[1])} for r in rows]})
+
+    except Exception as e:
+        print("Erro ao buscar protocolos:", e)
+        return jsonify({"error": str(e)}), 500
+
 # Rota de protocolos de um IP específico
 @bp.route('/api/traffic/protocols/<ip>', methods=['GET'])
+@response_cache.cached(TRAFFIC)
 def get_client_protocols(ip):
+    if ip == OTHERS_CLIENT:
+        # A linha "outros" do modo sketch não é um cliente
+        return jsonify({"error": f"Nenhum tráfego encontrado para o IP {ip}"}), 404
     try:
         with get_connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(
-                    "SELECT client_ip, inbound, outbound, protocols, created_at "
+                    "SELECT client_ip, inbound, outbound, protocol_map(proto_ids, proto_bytes), created_at "
                     "FROM traffic_logs WHERE client_ip = %s "
                     "ORDER BY created_at DESC LIMIT 1",
                     (ip,)
@@ -95,32 +356,53 @@ def get_client_protocols(ip):
         return jsonify({"error": str(e)}), 500
 
 @bp.route('/api/traffic/captures/<ip>', methods=['GET'])
+@response_cache.cached(TRAFFIC)
 def get_captures_by_ip(ip):
+    fmt = request.args.get('stream')
+    try:
+        # Sem stream a página padrão tem 50 linhas; com stream, o histórico inteiro
+        limit = _page_limit(request.args.get('limit'), None if fmt else 50)
+        query = (
+            "SELECT inbound, outbound, protocol_map(proto_ids, proto_bytes), created_at, id "
+            "FROM traffic_logs WHERE client_ip = %s"
+        )
+        params = [ip]
+        # Mais recentes primeiro: a próxima página continua abaixo da chave da última linha
+        after = request.args.get('cursor')
+        if after:
+            query += " AND (created_at, id) < (%s, %s)"
+            params += decode_cursor(after, 2)
+        query += " ORDER BY created_at DESC, id DESC"
+        if limit:
+            query += " LIMIT %s"
+            params.append(limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def item(r):
+        return {
+            "inbound": r[0],
+            "outbound": r[1],
+            "protocols": r[2],
+            "created_at": r[3].isoformat()
+        }
+
+    stream = _stream_response(fmt, query, params, item, "captures", {})
+    if stream is not None:
+        return stream
+
     try:
-        limit = int(request.args.get('limit', 50))
         with get_connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute(
-                    "SELECT inbound, outbound, protocols, created_at "
-                    "FROM traffic_logs WHERE client_ip = %s "
-                    "ORDER BY created_at DESC LIMIT %s",
-                    (ip, limit)
-                )
+                cursor.execute(query, params)
                 rows = cursor.fetchall()
 
-        if not rows:
-            return jsonify({"captures": []})
-
-        captures = []
-        for r in rows:
-            captures.append({
-                "inbound": r[0],
-                "outbound": r[1],
-                "protocols": r[2],               # assumindo JSON/JSONB
-                "created_at": r[3].isoformat()
-            })
-
-        return jsonify({"captures": captures})
+        response = {"captures": [item(r) for r in rows]}
+        # next_cursor só para quem pediu paginação: sem limit/cursor o corpo é o de antes
+        if 'limit' in request.args or after:
+            last = rows[-1] if rows and len(rows) == limit else None
+            response["next_cursor"] = last and encode_cursor([last[3], last[4]])
+        return jsonify(response)
 
     except Exception as e:
         print("Erro ao buscar captures:", e)
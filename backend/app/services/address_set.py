@@ -0,0 +1,72 @@
+import ipaddress
+import numpy as np
+
+
+class AddressSet:
+    """
+    Endereços e prefixos monitorados (IPv4 e IPv6), compilados para consulta com
+    inteiros. Hosts (/32, /128) ficam num set de bytes empacotados; cada tamanho de
+    prefixo distinto vira um set com as redes já deslocadas (endereço >> bits do
+    host). Uma consulta faz no máximo uma busca por tamanho distinto, então o custo
+    não cresce com o número de prefixos configurados.
+    """
+    def __init__(self, entries):
+        networks = [ipaddress.ip_network(entry.strip(), strict=False) for entry in entries if entry and entry.strip()]
+        self.networks = (list(ipaddress.collapse_addresses(n for n in networks if n.version == 4))
+                         + list(ipaddress.collapse_addresses(n for n in networks if n.version == 6)))
+
+        self._hosts = set()
+        prefixes = {4: {}, 6: {}}
+        for network in self.networks:
+            shift = network.max_prefixlen - network.prefixlen
+            if not shift:
+                self._hosts.add(network.network_address.packed)
+            prefixes[network.version].setdefault(shift, set()).add(int(network.network_address) >> shift)
+
+        # (deslocamento, redes) do prefixo mais longo ao mais curto, sem os hosts
+        self._ipv4 = sorted((shift, nets) for shift, nets in prefixes[4].items() if shift)
+        self._ipv6 = sorted((shift, nets) for shift, nets in prefixes[6].items() if shift)
+        # Versão vetorizada (IPv4, inclui hosts): redes ordenadas para searchsorted
+        self._ipv4_arrays = [(np.uint64(shift), np.array(sorted(nets), dtype=np.uint64))
+                             for shift, nets in sorted(prefixes[4].items())]
+        # Só hosts: a consulta vira um único `in` no set, sem conversão para inteiro
+        self.contains = self._hosts.__contains__ if not (self._ipv4 or self._ipv6) else self._contains
+
+    def __len__(self):
+        return len(self.networks)
+
+    def __contains__(self, packed):
+        return self.contains(packed)
+
+    def _contains(self, packed):
+        """
+        `packed` é o endereço empacotado (4 ou 16 bytes), como sai do cabeçalho.
+        """
+        if packed in self._hosts:
+            return True
+        prefixes = self._ipv4 if len(packed) == 4 else self._ipv6
+        if not prefixes:
+            return False
+        value = int.from_bytes(packed, "big")
+        for shift, networks in prefixes:
+            if value >> shift in networks:
+                return True
+        return False
+
+    def contains_ipv4_array(self, values):
+        """
+        Versão em lote para endereços IPv4 em uint32; retorna uma máscara booleana.
+        """
+        values = values.astype(np.uint64)
+        mask = np.zeros(len(values), dtype=bool)
+        for shift, networks in self._ipv4_arrays:
+            keys = values >> shift
+            index = np.minimum(np.searchsorted(networks, keys), len(networks) - 1)
+            mask |= networks[index] == keys
+        return mask
+
+    def expressions(self):
+        """
+        Endereços e prefixos em texto, no formato aceito por build_bpf_filter.
+        """
+        return [str(n.network_address) if n.prefixlen == n.max_prefixlen else str(n) for n in self.networks]
@@ -0,0 +1,413 @@
+import bisect
+import heapq
+import multiprocessing
+import queue
+import threading
+from collections import defaultdict
+from time import perf_counter
+from app import metrics
+from app.config import FLOW_TRACKING, TRAFFIC_SKETCH, METRICS_ENABLED, REALTIME_TOP_MAX
+from app.services.flow_table import FlowTable
+from app.services.heavy_hitters import HeavyHitters, SketchSnapshot, merge_snapshots
+
+# Intervalo máximo (s) que um worker ocioso leva para atender um pedido de troca
+WORKER_TICK = 0.2
+# Em processos, o pedido é verificado a cada N pacotes (além de a cada tick)
+PROCESS_CHECK_EVERY = 256
+
+
+def new_traffic_table():
+    return defaultdict(lambda: {"Entrada": 0, "Saída": 0, "protocolos": defaultdict(int)})
+
+
+def freeze_traffic(table):
+    """
+    Converte a tabela de um shard em dicts simples (serializáveis entre processos).
+    """
+    return {
+        ip: {"Entrada": data["Entrada"], "Saída": data["Saída"], "protocolos": dict(data["protocolos"])}
+        for ip, data in list(table.items())
+    }
+
+
+def merge_traffic(target, source):
+    """
+    Soma os contadores de `source` em `target` (ambos no formato de traffic_data).
+    """
+    for ip, data in source.items():
+        entry = target[ip]
+        entry["Entrada"] += data["Entrada"]
+        entry["Saída"] += data["Saída"]
+        protocols = entry["protocolos"]
+        for protocol, size in data["protocolos"].items():
+            protocols[protocol] += size
+    return target
+
+
+def merge_frozen(snapshots):
+    """
+    Soma os dados congelados de vários shards (tabelas exatas ou sketches) e
+    devolve no formato de traffic_data.
+    """
+    if snapshots and isinstance(snapshots[0], SketchSnapshot):
+        return merge_snapshots(snapshots).traffic()
+    merged = new_traffic_table()
+    for data in snapshots:
+        merge_traffic(merged, data)
+    return freeze_traffic(merged)
+
+
+def effective_sampling_rate(counters_list):
+    """
+    Taxa de amostragem efetiva de uma janela: pacotes vistos / pacotes contabilizados.
+    """
+    seen = sum(counters.get("window_seen", 0) for counters in counters_list)
+    sampled = sum(counters.get("window_sampled", 0) for counters in counters_list)
+    return seen / sampled if sampled else 1.0
+
+
+def _volume(entry):
+    return entry[1]["Entrada"] + entry[1]["Saída"]
+
+
+class RealtimeSnapshot:
+    """
+    Cópia imutável do tráfego da janela em andamento, montada fora do caminho das
+    requisições e trocada inteira (uma atribuição) a cada atualização. `top` já traz
+    os REALTIME_TOP_MAX clientes de maior volume, escolhidos com um heap; a
+    ordenação completa só é feita se alguém pedir mais que isso, uma vez por snapshot.
+    """
+    def __init__(self, traffic=None, sampling_rate=1.0, top_max=REALTIME_TOP_MAX):
+        self.entries = tuple((traffic or {}).items())
+        self.sampling_rate = sampling_rate
+        self.top = tuple(heapq.nlargest(top_max, self.entries, key=_volume))
+        self._ranked = self.top if len(self.top) == len(self.entries) else None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def ranked(self, limit=None):
+        """
+        Entradas ((IP monitorado, IP do cliente), dados) em ordem decrescente de volume.
+        """
+        if limit is not None and limit <= len(self.top):
+            return self.top[:limit]
+        if self._ranked is None:
+            # Corrida inofensiva: duas leituras simultâneas calculam o mesmo resultado
+            self._ranked = tuple(sorted(self.entries, key=_volume, reverse=True))
+        return self._ranked[:limit]
+
+
+class _Flag:
+    """
+    Flag simples para workers em thread (mesma interface de multiprocessing.RawValue).
+    """
+    def __init__(self):
+        self.value = 0
+
+
+class TrafficShard:
+    """
+    Agregação privada de um worker de captura, indexada por (IP monitorado, IP do
+    cliente). Só o worker escreve em `data`, então o caminho por pacote não usa lock:
+    quando o reporter pede uma troca (ou uma cópia), o próprio worker entrega a
+    tabela pela fila de resultados e começa uma nova. Junto com a troca seguem os
+    fluxos que expiraram na FlowTable do worker.
+
+    Workers que acumulam pacotes em lote definem `flush_hook`, chamado antes de
+    atender um pedido para que a tabela entregue inclua o lote pendente.
+
+    Com `sketch`, a tabela é um HeavyHitters (top-K exato + Count-Min), com
+    memória constante independentemente do número de clientes.
+
+    `sampling_rate` (definida pelo worker com set_sampling_rate) faz só 1 a cada N pacotes ser
+    contabilizado: quem chama consulta sample() e multiplica os tamanhos pela taxa
+    devolvida, somando em `packets_sampled` os pacotes efetivamente contabilizados.
+
+    `packet_time` é o histograma (contagens por faixa de PACKET_TIME_BUCKETS) do
+    tempo de processamento por pacote, alimentado pelo worker em amostras.
+    """
+    def __init__(self, swap_flag=None, peek_flag=None, results=None, check_every=1,
+                 track_flows=FLOW_TRACKING, sketch=TRAFFIC_SKETCH):
+        self._new_table = HeavyHitters if sketch else new_traffic_table
+        self.data = self._new_table()
+        self.flows = FlowTable() if track_flows else None
+        self.packets_seen = 0
+        self.packets_matched = 0
+        self.packets_sampled = 0
+        self.packets_dropped = 0
+        self.sampling_rate = 1
+        self._sample_countdown = 1
+        self._window_start = (0, 0)
+        self.packet_time = [0] * (len(metrics.PACKET_TIME_BUCKETS) + 1)
+        self.packet_time_sum = 0.0
+        self._swap_flag = swap_flag if swap_flag is not None else _Flag()
+        self._peek_flag = peek_flag if peek_flag is not None else _Flag()
+        self._results = results if results is not None else queue.SimpleQueue()
+        self.check_every = check_every
+        self._countdown = check_every
+        self.flush_hook = None
+
+    def add(self, server_ip, client_ip, direction, protocol, size):
+        self._countdown -= 1
+        if not self._countdown:
+            self.tick()
+        if self._new_table is HeavyHitters:
+            self.data.add((server_ip, client_ip), direction, protocol, size)
+            return
+        entry = self.data[(server_ip, client_ip)]
+        entry[direction] += size
+        entry["protocolos"][protocol] += size
+
+    def sample(self):
+        """
+        Retorna 0 se o pacote atual fica fora da amostra, ou a taxa pela qual os
+        contadores dele devem ser multiplicados.
+        """
+        self._sample_countdown -= 1
+        if self._sample_countdown:
+            return 0
+        self._sample_countdown = self.sampling_rate
+        return self.sampling_rate
+
+    def set_sampling_rate(self, rate):
+        """
+        Troca a taxa e reinicia a contagem 1-em-N: a contagem que sobrou da taxa
+        anterior deixaria fora (ou dentro) da amostra os primeiros pacotes depois
+        da troca, enviesando a estimativa.
+        """
+        self.sampling_rate = rate
+        self._sample_countdown = rate
+
+    def observe_packet_time(self, seconds, packets=1):
+        """
+        Registra o tempo por pacote medido sobre `packets` pacotes.
+        """
+        self.packet_time[bisect.bisect_left(metrics.PACKET_TIME_BUCKETS, seconds)] += packets
+        self.packet_time_sum += seconds * packets
+
+    def merge(self, table):
+        """
+        Soma uma tabela já agregada (formato de traffic_data) nos dados do shard.
+        """
+        if self._new_table is HeavyHitters:
+            for key, data in table.items():
+                self.data.add_entry(key, data)
+        else:
+            merge_traffic(self.data, table)
+
+    def freeze(self):
+        if self._new_table is HeavyHitters:
+            return self.data.freeze()
+        return freeze_traffic(self.data)
+
+    def tick(self):
+        """
+        Atende pedidos pendentes do reporter. Chamado pelo worker a cada pacote
+        (ou a cada N pacotes) e periodicamente quando não há tráfego.
+        """
+        self._countdown = self.check_every
+        if self.flush_hook is not None and (self._swap_flag.value or self._peek_flag.value):
+            self.flush_hook()
+        if self._swap_flag.value:
+            self._swap_flag.value = 0
+            frozen = self.freeze()
+            self.data = self._new_table()
+            flows = self.flows.drain() if self.flows is not None else []
+            counters = self.reported_counters()
+            self._window_start = (self.packets_seen, self.packets_sampled)
+            self._results.put(("swap", frozen, counters, flows))
+        if self._peek_flag.value:
+            # O valor é o número do pedido: a resposta o leva para o pool descartar respostas atrasadas
+            request = self._peek_flag.value
+            self._peek_flag.value = 0
+            self._results.put(("peek", self.freeze(), self.reported_counters(), request))
+
+    def counters(self):
+        counters = {"packets_seen": self.packets_seen, "packets_matched": self.packets_matched,
+                    "packets_sampled": self.packets_sampled, "packets_dropped": self.packets_dropped,
+                    "sampling_rate": self.sampling_rate,
+                    "window_seen": self.packets_seen - self._window_start[0],
+                    "window_sampled": self.packets_sampled - self._window_start[1],
+                    "flows_active": 0, "flows_dropped": 0}
+        if self.flows is not None:
+            counters["flows_active"] = len(self.flows)
+            counters["flows_dropped"] = self.flows.dropped
+        return counters
+
+    def timings(self):
+        return {"packet_time": list(self.packet_time), "packet_time_sum": self.packet_time_sum}
+
+    def reported_counters(self):
+        """
+        Contadores e histograma de tempo enviados ao reporter a cada troca/cópia.
+        """
+        counters = self.counters()
+        counters.update(self.timings())
+        return counters
+
+
+class _ShardWorker:
+    def __init__(self, target, args, mode):
+        if mode == "process":
+            self.swap_flag = multiprocessing.RawValue("b", 0)
+            self.peek_flag = multiprocessing.RawValue("i", 0)
+            self.results = multiprocessing.Queue()
+            shard_kwargs = {"check_every": PROCESS_CHECK_EVERY}
+            runner = multiprocessing.Process
+        else:
+            self.swap_flag = _Flag()
+            self.peek_flag = _Flag()
+            self.results = queue.Queue()
+            shard_kwargs = {}
+            runner = threading.Thread
+        self.mode = mode
+        self.shard_kwargs = shard_kwargs
+        self.shard = None
+        self.counters = {}
+        self.runner = runner(target=self._run, args=(target, args), daemon=True)
+
+    def _run(self, target, args):
+        shard = TrafficShard(self.swap_flag, self.peek_flag, self.results, **self.shard_kwargs)
+        if self.mode == "thread":
+            # Em thread, leituras de cópia são feitas direto no shard (sem esperar o worker)
+            self.shard = shard
+        target(shard, *args)
+
+    def start(self):
+        self.runner.start()
+
+
+class ShardPool:
+    """
+    Conjunto de workers de captura, cada um com seu TrafficShard (threads ou processos).
+    O reporter chama collect() para trocar e mesclar os shards; o caminho por pacote
+    nunca disputa lock com ele.
+
+    `sampling_rate` guarda a taxa de amostragem efetiva da última coleta.
+
+    `snapshot` é o RealtimeSnapshot mais recente da janela em andamento, atualizado
+    por refresh_snapshot(); quem lê não espera pelos workers nem por lock.
+    """
+    def __init__(self):
+        self.workers = []
+        self._pending = []
+        self._control_lock = threading.Lock()
+        self._peek_request = 0
+        self.sampling_rate = 1.0
+        self.snapshot = RealtimeSnapshot()
+
+    def start(self, target, args_per_worker, mode="thread"):
+        for args in args_per_worker:
+            worker = _ShardWorker(target, args, mode)
+            worker.start()
+            self.workers.append(worker)
+
+    def _gather(self, kind, timeout):
+        """
+        Pede a troca ("swap") ou a cópia ("peek") a todos os workers e espera as
+        respostas. Cada peek leva um número de pedido: a resposta atrasada de um
+        peek anterior (que estourou o timeout) é descartada, e fica só a cópia
+        pedida agora, uma por worker (as cópias são cumulativas desde a última troca).
+        """
+        results = {}
+        waiting = []
+        if kind == "peek":
+            self._peek_request = self._peek_request % 0x7FFFFFFF + 1
+        for worker in self.workers:
+            if kind == "peek" and worker.shard is not None and worker.shard.flush_hook is None:
+                results[worker] = worker.shard.freeze()
+                worker.counters = worker.shard.counters()
+                continue
+            getattr(worker, f"{kind}_flag").value = 1 if kind == "swap" else self._peek_request
+            waiting.append(worker)
+
+        for worker in waiting:
+            block = True
+            while True:
+                try:
+                    item_kind, data, counters, extra = worker.results.get(block, timeout)
+                except queue.Empty:
+                    break
+                if item_kind == "peek" and extra != self._peek_request:
+                    # Resposta de um peek anterior: já está velha
+                    continue
+                worker.counters = counters
+                if item_kind == "swap":
+                    self._pending.append((data, extra, counters))
+                else:
+                    results[worker] = data
+                if item_kind == kind:
+                    # Já recebeu a resposta deste worker; só drena o que restar
+                    block = False
+        return list(results.values())
+
+    def collect(self, timeout=1.0):
+        """
+        Troca os shards de todos os workers e devolve (tráfego somado, fluxos expirados).
+        Um worker que não responder a tempo entrega seus dados na próxima coleta.
+        """
+        start = perf_counter()
+        with self._control_lock:
+            self._gather("swap", timeout)
+            pending, self._pending = self._pending, []
+        if METRICS_ENABLED:
+            metrics.swap_wait_seconds.observe(perf_counter() - start, "swap")
+        flows = []
+        for _data, expired, _counters in pending:
+            flows.extend(expired)
+        self.sampling_rate = effective_sampling_rate([counters for _data, _expired, counters in pending])
+        return merge_frozen([data for data, _expired, _counters in pending]), flows
+
+    def peek(self, timeout=0.5):
+        """
+        Cópia dos dados ainda não coletados, sem trocar os shards.
+        """
+        start = perf_counter()
+        with self._control_lock:
+            results = self._gather("peek", timeout)
+            pending = [data for data, _flows, _counters in self._pending]
+        if METRICS_ENABLED:
+            metrics.swap_wait_seconds.observe(perf_counter() - start, "peek")
+        return merge_frozen(pending + results)
+
+    def refresh_snapshot(self):
+        """
+        Monta um novo RealtimeSnapshot com peek() e o publica no lugar do anterior.
+        """
+        snapshot = RealtimeSnapshot(self.peek(), self.window_sampling_rate())
+        self.snapshot = snapshot
+        return snapshot
+
+    def _worker_counters(self):
+        return [worker.shard.counters() if worker.shard is not None else worker.counters
+                for worker in self.workers]
+
+    def counters(self):
+        totals = {"packets_seen": 0, "packets_matched": 0, "packets_sampled": 0, "packets_dropped": 0,
+                  "flows_active": 0, "flows_dropped": 0}
+        worker_counters = self._worker_counters()
+        for counters in worker_counters:
+            for key in totals:
+                totals[key] += counters.get(key, 0)
+        totals["sampling_rate"] = max([c.get("sampling_rate", 1) for c in worker_counters], default=1)
+        return totals
+
+    def packet_time(self):
+        """
+        Histograma somado do tempo por pacote: (contagens por faixa, soma em segundos).
+        """
+        counts = [0] * (len(metrics.PACKET_TIME_BUCKETS) + 1)
+        total = 0.0
+        for worker in self.workers:
+            counters = worker.shard.timings() if worker.shard is not None else worker.counters
+            for i, count in enumerate(counters.get("packet_time", ())):
+                counts[i] += count
+            total += counters.get("packet_time_sum", 0.0)
+        return counts, total
+
+    def window_sampling_rate(self):
+        """
+        Taxa efetiva dos dados ainda não coletados (os que peek() devolve).
+        """
+        return effective_sampling_rate(self._worker_counters())
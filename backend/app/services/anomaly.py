@@ -0,0 +1,127 @@
+"""
+Detecção de anomalia do tráfego de entrada por cliente: o valor mais recente é
+"suspeito" se passar de média + 3 desvios-padrão das últimas BASELINE_SAMPLES
+amostras (incluindo ele). O score é a sigmoide do z-score.
+
+A mesma função atende /api/prediction/run (um IP) e o lote (/api/prediction/run-batch
+e detect_anomalies.py), então os dois caminhos dão resultados idênticos. Em relação
+à conta antiga com statistics.mean/stdev (exata), a passada em float64 concorda até
+~1e-12 relativo: um valor praticamente em cima de média + 3 desvios pode mudar de rótulo.
+"""
+from datetime import datetime, timedelta
+import numpy as np
+from psycopg2.extras import execute_values
+from app.services.heavy_hitters import OTHERS_CLIENT
+
+# Amostras do baseline, mínimo para avaliar e limiar em desvios-padrão
+BASELINE_SAMPLES = 100
+MIN_SAMPLES = 10
+THRESHOLD_SIGMAS = 3
+# Janela que define os clientes "ativos" avaliados pelo lote
+ACTIVE_PERIODS = {'minute': timedelta(minutes=1), 'hour': timedelta(hours=1), 'day': timedelta(days=1),
+                  'week': timedelta(weeks=1)}
+
+# Últimas amostras de cada cliente numa consulta só: o LATERAL com LIMIT lê só as
+# linhas mais recentes de cada IP pelo índice (client_ip, created_at), sem numerar
+# o histórico inteiro. A ordem por id desempata registros do mesmo flush (mesmo
+# created_at) igual à paginação das rotas
+SAMPLES_QUERY = """
+    SELECT c.client_ip, s.inbound
+    FROM ({clients}) AS c(client_ip)
+    CROSS JOIN LATERAL (
+        SELECT t.inbound, t.created_at, t.id
+        FROM traffic_logs AS t
+        WHERE t.client_ip = c.client_ip
+        ORDER BY t.created_at DESC, t.id DESC
+        LIMIT %s
+    ) AS s
+    ORDER BY c.client_ip, s.created_at DESC, s.id DESC
+"""
+
+
+def fetch_samples(cursor, ips=None, since=None, samples=BASELINE_SAMPLES):
+    """
+    (IPs, contagens, valores): as últimas `samples` amostras de inbound de cada
+    cliente, da mais recente para a mais antiga, concatenadas em `valores`.
+    Clientes: `ips` ou, sem eles, todos com tráfego desde `since` (nunca a linha
+    "outros" do modo sketch).
+    """
+    if ips is not None:
+        clients_sql, params = "SELECT DISTINCT unnest(%s::text[])", [[ip for ip in ips if ip != OTHERS_CLIENT]]
+    else:
+        # A linha "outros" do modo sketch soma vários clientes: não tem baseline próprio
+        clients_sql = "SELECT DISTINCT client_ip FROM traffic_logs WHERE created_at >= %s AND client_ip <> %s"
+        params = [since, OTHERS_CLIENT]
+    cursor.execute(SAMPLES_QUERY.format(clients=clients_sql), (*params, samples))
+
+    clients, counts, values = [], [], []
+    for client_ip, inbound in cursor.fetchall():
+        if not clients or clients[-1] != client_ip:
+            clients.append(client_ip)
+            counts.append(0)
+        counts[-1] += 1
+        values.append(inbound)
+    return clients, np.array(counts, dtype=np.int64), np.array(values, dtype=np.float64)
+
+
+def score_samples(clients, counts, values, min_samples=MIN_SAMPLES):
+    """
+    Avalia todos os clientes de uma vez. Devolve (resultados, IPs com menos de
+    `min_samples` amostras); cada resultado tem client_ip, prediction e probability.
+    """
+    if not clients:
+        return [], []
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    mean = np.add.reduceat(values, starts) / counts
+    deviations = values - np.repeat(mean, counts)
+    # Desvio-padrão amostral (n - 1), como statistics.stdev; só vale para quem tem min_samples >= 2
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        std = np.sqrt(np.add.reduceat(deviations * deviations, starts) / (counts - 1))
+        current = values[starts]
+        suspicious = current > mean + THRESHOLD_SIGMAS * std
+        z_score = np.where(std > 0, (current - mean) / std, 0.0)
+        score = np.where(std > 0, 1 / (1 + np.exp(-z_score)), 0.0)
+
+    results, skipped = [], []
+    enough = counts >= min_samples
+    for i, client_ip in enumerate(clients):
+        if not enough[i]:
+            skipped.append(client_ip)
+            continue
+        results.append({"client_ip": client_ip, "prediction": "suspeito" if suspicious[i] else "normal",
+                        "probability": float(score[i])})
+    return results, skipped
+
+
+def save_predictions(cursor, results, created_at=None):
+    """
+    Grava as predições num único INSERT de várias linhas.
+    """
+    if not results:
+        return
+    created_at = created_at or datetime.utcnow()
+    execute_values(
+        cursor,
+        "INSERT INTO predictions (client_ip, prediction, probability, created_at) VALUES %s",
+        [(r["client_ip"], r["prediction"], r["probability"], created_at) for r in results],
+        page_size=len(results),
+    )
+
+
+def run_batch(get_connection, client_ips=None, since=None, save=True):
+    """
+    Busca, avalia e (com `save`) grava as predições de vários clientes numa
+    transação. Usado por /api/prediction/run-batch e por detect_anomalies.py.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            clients, counts, values = fetch_samples(cursor, ips=client_ips, since=since)
+            results, skipped = score_samples(clients, counts, values)
+            created_at = datetime.utcnow()
+            if save:
+                save_predictions(cursor, results, created_at)
+                conn.commit()
+    for result in results:
+        result["timestamp"] = created_at.isoformat()
+    return {"predictions": results, "insufficient_data": skipped,
+            "suspicious": sum(result["prediction"] == "suspeito" for result in results)}
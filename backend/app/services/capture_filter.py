@@ -0,0 +1,48 @@
+# Acima disso o filtro passa do limite de instruções do BPF e o descarte fica em Python
+BPF_MAX_ADDRESSES = 64
+
+
+def _address_clause(address):
+    """
+    Converte um endereço (ou prefixo CIDR) na primitiva BPF correspondente.
+    """
+    family = "ip6" if ":" in address else "ip"
+    keyword = "net" if "/" in address else "host"
+    return f"{family} {keyword} {address}"
+
+
+def build_bpf_filter(addresses, extra_filter=None):
+    """
+    Monta a expressão BPF que deixa passar apenas o tráfego dos endereços monitorados.
+    Quadros com tag VLAN são incluídos, pois o processamento em Python também os conta.
+    Um filtro extra do usuário (ex.: "not port 22") é combinado com AND.
+    """
+    clauses = " or ".join(_address_clause(a) for a in addresses if a)
+    if not clauses:
+        return extra_filter or None
+    expression = f"({clauses}) or (vlan and ({clauses}))"
+    if extra_filter:
+        expression = f"({expression}) and ({extra_filter})"
+    return expression
+
+
+def read_interface_packets(iface=None):
+    """
+    Soma os pacotes recebidos e enviados pela interface (ou por todas) segundo o kernel.
+    Serve de referência para o caminho antigo, em que todo pacote chegava ao Python.
+    Retorna None fora do Linux.
+    """
+    try:
+        with open("/proc/net/dev") as f:
+            lines = f.readlines()[2:]
+    except OSError:
+        return None
+
+    total = 0
+    for line in lines:
+        name, _, counters = line.partition(":")
+        if iface and name.strip() != iface:
+            continue
+        fields = counters.split()
+        total += int(fields[1]) + int(fields[9])
+    return total
@@ -0,0 +1,186 @@
+import json
+import threading
+from collections import deque
+from datetime import datetime
+from time import perf_counter, sleep
+import psycopg2
+from app import metrics
+from app.config import (
+    WRITER_QUEUE_SIZE, WRITER_SPILL_DIR, WRITER_SEGMENT_BYTES, WRITER_RETRY_INTERVAL, METRICS_ENABLED,
+)
+from app.db import PoolTimeout, get_connection
+from app.models.traffic_model import TrafficLog
+from app.models.flow_model import FlowLog
+from app.services.spill_log import SpillLog
+from app.services.response_cache import TRAFFIC, response_cache
+from app.services.rollup import save_rollups
+
+# Erros de conexão: o lote é tentado de novo. Qualquer outro erro é do próprio lote
+TRANSIENT_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError, PoolTimeout)
+
+
+def encode_batch(logs, flows):
+    """
+    Lote do reporter em tipos JSON (para a fila em disco).
+    """
+    now = datetime.utcnow()
+    return {
+        "traffic": [[log.client_ip, log.inbound, log.outbound, log.protocols, log.server_ip, log.sampling_rate,
+                     (log.created_at or now).isoformat()] for log in logs],
+        "flows": [[f.src_ip, f.dst_ip, f.src_port, f.dst_port, f.protocol, f.bytes, f.packets,
+                   f.first_seen.isoformat(), f.last_seen.isoformat(), f.end_reason] for f in flows],
+    }
+
+
+def decode_batch(batch):
+    logs = [TrafficLog(ip, inbound, outbound, protocols, server_ip, sampling_rate=rate,
+                       created_at=datetime.fromisoformat(created_at))
+            for ip, inbound, outbound, protocols, server_ip, rate, created_at in batch["traffic"]]
+    flows = [FlowLog(*row[:7], datetime.fromisoformat(row[7]), datetime.fromisoformat(row[8]), row[9])
+             for row in batch["flows"]]
+    return logs, flows
+
+
+def write_batch(batch):
+    """
+    Grava um lote (tráfego, rollups e fluxos) numa única transação.
+    """
+    logs, flows = decode_batch(batch)
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            TrafficLog.save_many(cursor, logs)
+            save_rollups(cursor, logs)
+            if flows:
+                FlowLog.save_many(cursor, flows)
+    # Histórico, protocolos e fluxos em cache ficaram velhos
+    response_cache.invalidate(TRAFFIC)
+
+
+class DbWriter:
+    """
+    Estágio de gravação do reporter: o flush só enfileira o lote e segue para a
+    emissão, e uma thread própria grava no banco. A ordem é sempre: o lote em
+    gravação (`_head`), depois o disco, depois a fila.
+
+    - com o banco fora do ar (erro transitório), o lote em gravação fica em
+      memória e é tentado de novo; os seguintes esperam na fila;
+    - com a fila cheia (banco lento ou fora do ar), a fila inteira vai para a
+      SpillLog em disco, seguida do lote novo, sem bloquear o reporter;
+    - um lote que o banco rejeita de vez (DataError, protocolo inválido...) vai
+      para a dead-letter, e os seguintes continuam sendo gravados.
+
+    Cada linha leva seu created_at, então um lote relido mais tarde mantém o
+    horário da janela em que foi capturado.
+    """
+    def __init__(self, write=write_batch, spill_dir=WRITER_SPILL_DIR, queue_size=WRITER_QUEUE_SIZE,
+                 segment_bytes=WRITER_SEGMENT_BYTES, retry_interval=WRITER_RETRY_INTERVAL):
+        self._write = write
+        self.spill = SpillLog(spill_dir, segment_bytes)
+        self.queue_size = queue_size
+        self.retry_interval = retry_interval
+        self.spilled_batches = 0
+        self.written_batches = 0
+        self._head = None
+        self._queue = deque()
+        # Lotes já tirados da fila, a caminho do disco (gravados fora do _condition)
+        self._to_spill = deque()
+        self._condition = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def submit(self, logs, flows=()):
+        batch = encode_batch(logs, flows)
+        with self._condition:
+            if len(self._queue) >= self.queue_size:
+                # Fila cheia: ela vai para o disco, em ordem, seguida do lote novo
+                self._to_spill.extend(self._queue)
+                self._to_spill.append(batch)
+                self._queue.clear()
+            else:
+                self._queue.append(batch)
+            self._condition.notify()
+        self._flush_spill()
+
+    def _flush_spill(self):
+        """
+        Grava `_to_spill` no disco sem segurar o _condition (o fsync não trava o
+        reporter nem a thread de gravação). Cada lote só sai de `_to_spill` depois
+        de estar no disco, então quem olha os dois nunca o perde de vista.
+        """
+        with self._spill_lock:
+            while True:
+                with self._condition:
+                    if not self._to_spill:
+                        return
+                    batch = self._to_spill[0]
+                self.spill.append(batch)
+                with self._condition:
+                    self._to_spill.popleft()
+                    self.spilled_batches += 1
+
+    def _write_timed(self, batch):
+        start = perf_counter()
+        self._write(batch)
+        self.written_batches += 1
+        if METRICS_ENABLED:
+            metrics.db_insert_seconds.observe(perf_counter() - start)
+
+    def drain(self):
+        """
+        Grava o que estiver em disco e na fila. Retorna False se o banco estiver fora do ar.
+        """
+        while True:
+            with self._condition:
+                spilling = bool(self._to_spill)
+                if self._head is None and not spilling and not self.spill.pending():
+                    if not self._queue:
+                        return True
+                    # Disco vazio: o lote mais antigo é o primeiro da fila
+                    self._head = self._queue.popleft()
+                batch = self._head
+            if batch is None:
+                if spilling:
+                    self._flush_spill()
+                    continue
+                try:
+                    # Lotes em disco são sempre mais antigos que os da fila
+                    self.spill.replay(self._write_timed, TRANSIENT_ERRORS)
+                except TRANSIENT_ERRORS as e:
+                    print("Banco indisponível, lotes mantidos em disco:", e)
+                    return False
+                continue
+            try:
+                self._write_timed(batch)
+            except TRANSIENT_ERRORS as e:
+                # Fica em _head: nada mais novo é gravado antes dele
+                print("Banco indisponível, lote mantido para nova tentativa:", e)
+                return False
+            except Exception as e:
+                print("Lote rejeitado pelo banco, enviado para a dead-letter:", e)
+                self.spill.dead_letter(json.dumps(batch, separators=(",", ":")), e)
+            with self._condition:
+                self._head = None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._head is None and not self._queue and not self._to_spill and not self.spill.pending():
+                    self._condition.wait(self.retry_interval)
+            if not self.drain():
+                sleep(self.retry_interval)
+
+    def stats(self):
+        return {"queue_depth": len(self._queue) + (self._head is not None), "spill_bytes": self.spill.size(),
+                "spilled_batches": self.spilled_batches, "written_batches": self.written_batches,
+                "dead_letter_batches": self.spill.dead_lettered}
+
+
+db_writer = DbWriter()
+
+if METRICS_ENABLED:
+    metrics.registry.collectors.append(metrics.writer_collector(db_writer))
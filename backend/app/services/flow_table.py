@@ -0,0 +1,145 @@
+import socket
+import struct
+from array import array
+from collections import OrderedDict
+import numpy as np
+from app.config import FLOW_TABLE_SIZE, FLOW_IDLE_TIMEOUT, FLOW_ACTIVE_TIMEOUT, FLOW_EXPORT_LIMIT
+
+# Intervalo (s) entre varreduras de expiração
+SWEEP_INTERVAL = 1.0
+
+_pack_ports = struct.Struct("!HHB").pack
+_unpack_ports = struct.Struct("!HHB").unpack_from
+
+
+def pack_flow_key(ip_src, ip_dst, sport, dport, proto):
+    """
+    Chave compacta do fluxo: endereços empacotados + portas + protocolo (13 bytes em IPv4).
+    """
+    return ip_src + ip_dst + _pack_ports(sport, dport, proto)
+
+
+def unpack_flow_key(key):
+    size = (len(key) - 5) // 2
+    family = socket.AF_INET if size == 4 else socket.AF_INET6
+    sport, dport, proto = _unpack_ports(key, 2 * size)
+    return (socket.inet_ntop(family, key[:size]), socket.inet_ntop(family, key[size:2 * size]),
+            sport, dport, proto)
+
+
+class FlowTable:
+    """
+    Tabela de fluxos (src, dst, sport, dport, proto) com capacidade fixa.
+
+    Os contadores ficam em arrays pré-alocados, indexados por slot; por fluxo existe
+    apenas a chave em bytes e uma entrada no índice (OrderedDict mantido em ordem de
+    último pacote, do mais antigo ao mais recente). Fluxos saem da tabela por
+    inatividade (idle), por duração (active) ou, com a tabela cheia, pelo critério
+    LRU (capacity). Os fluxos expirados aguardam em `expired` até o reporter
+    drená-los; acima de `export_limit` eles são descartados e contados em `dropped`.
+    """
+    def __init__(self, capacity=FLOW_TABLE_SIZE, idle_timeout=FLOW_IDLE_TIMEOUT,
+                 active_timeout=FLOW_ACTIVE_TIMEOUT, export_limit=FLOW_EXPORT_LIMIT):
+        self.capacity = capacity
+        self.idle_timeout = idle_timeout
+        self.active_timeout = active_timeout
+        self.export_limit = export_limit
+
+        self.bytes = array("Q", bytes(8 * capacity))
+        self.packets = array("Q", bytes(8 * capacity))
+        self.first_seen = array("d", bytes(8 * capacity))
+        self.last_seen = array("d", bytes(8 * capacity))
+        self._keys = [None] * capacity
+        self._index = OrderedDict()
+        self._free = list(range(capacity - 1, -1, -1))
+        self._first_seen_view = np.frombuffer(self.first_seen, dtype=np.float64)
+        self._packets_view = np.frombuffer(self.packets, dtype=np.uint64)
+        self._next_sweep = 0.0
+
+        self.expired = []
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._index)
+
+    def update(self, key, size, now):
+        if now >= self._next_sweep:
+            self.sweep(now)
+        slot = self._index.get(key)
+        if slot is None:
+            if not self._free:
+                self._expire(next(iter(self._index)), "capacity")
+            slot = self._free.pop()
+            self._index[key] = slot
+            self._keys[slot] = key
+            self.bytes[slot] = size
+            self.packets[slot] = 1
+            self.first_seen[slot] = now
+        else:
+            self._index.move_to_end(key)
+            self.bytes[slot] += size
+            self.packets[slot] += 1
+        self.last_seen[slot] = now
+
+    def add(self, key, nbytes, packets, first, last):
+        """
+        Igual a update, mas com os totais já agregados de um lote de pacotes do fluxo.
+        """
+        if last >= self._next_sweep:
+            self.sweep(last)
+        slot = self._index.get(key)
+        if slot is None:
+            if not self._free:
+                self._expire(next(iter(self._index)), "capacity")
+            slot = self._free.pop()
+            self._index[key] = slot
+            self._keys[slot] = key
+            self.bytes[slot] = nbytes
+            self.packets[slot] = packets
+            self.first_seen[slot] = first
+        else:
+            self._index.move_to_end(key)
+            self.bytes[slot] += nbytes
+            self.packets[slot] += packets
+        self.last_seen[slot] = last
+
+    def sweep(self, now):
+        """
+        Expira fluxos ociosos (varrendo o início do índice) e fluxos ativos há mais de
+        active_timeout (varredura vetorizada sobre first_seen).
+        """
+        self._next_sweep = now + SWEEP_INTERVAL
+        idle_cutoff = now - self.idle_timeout
+        while self._index:
+            key = next(iter(self._index))
+            if self.last_seen[self._index[key]] >= idle_cutoff:
+                break
+            self._expire(key, "idle")
+
+        active_cutoff = now - self.active_timeout
+        stale = np.nonzero((self._first_seen_view < active_cutoff) & (self._packets_view > 0))[0]
+        for slot in stale.tolist():
+            self._expire(self._keys[slot], "active")
+
+    def expire_all(self, reason="flush"):
+        for key in list(self._index):
+            self._expire(key, reason)
+
+    def _expire(self, key, reason):
+        slot = self._index.pop(key)
+        if len(self.expired) < self.export_limit:
+            self.expired.append((key, self.bytes[slot], self.packets[slot],
+                                 self.first_seen[slot], self.last_seen[slot], reason))
+        else:
+            self.dropped += 1
+        self.packets[slot] = 0
+        self._keys[slot] = None
+        self._free.append(slot)
+
+    def drain(self):
+        """
+        Entrega os fluxos expirados já decodificados e esvazia a fila de exportação.
+        """
+        expired, self.expired = self.expired, []
+        return [unpack_flow_key(key) + (nbytes, packets, first, last, reason)
+                for key, nbytes, packets, first, last, reason in expired]
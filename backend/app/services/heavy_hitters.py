@@ -0,0 +1,213 @@
+import heapq
+import math
+import random
+import zlib
+from collections import defaultdict
+from app.config import SKETCH_TOP_K, SKETCH_WIDTH, SKETCH_DEPTH
+
+# Chave da linha que soma todo o tráfego fora do top-K. OTHERS_CLIENT vai para
+# traffic_logs.client_ip, mas não é um cliente: quem lista IPs de clientes o exclui
+OTHERS_CLIENT = "outros"
+OTHERS_KEY = (None, OTHERS_CLIENT)
+
+# Primo de Mersenne 2^61 - 1 e coeficientes fixos das funções de hash das linhas do
+# sketch: precisam ser iguais em todos os workers (threads ou processos) para que
+# os sketches possam ser somados
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)
+_HASH_COEFFICIENTS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(64)]
+
+
+def _new_entry():
+    return {"Entrada": 0, "Saída": 0, "protocolos": defaultdict(int), "erro": 0}
+
+
+def _entry_total(entry):
+    return entry["Entrada"] + entry["Saída"]
+
+
+def _add_entry(target, source):
+    target["Entrada"] += source["Entrada"]
+    target["Saída"] += source["Saída"]
+    protocols = target["protocolos"]
+    for protocol, size in source["protocolos"].items():
+        protocols[protocol] += size
+
+
+def _freeze_entry(entry):
+    return {"Entrada": entry["Entrada"], "Saída": entry["Saída"], "protocolos": dict(entry["protocolos"]),
+            "erro": entry.get("erro", 0)}
+
+
+def sketch_summary(top_k=SKETCH_TOP_K, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+    """
+    Parâmetros do modo sketch. Garantia do Count-Min: o "erro" de cada cliente
+    excede os bytes dele que ficaram em "outros" em no máximo epsilon x (bytes em
+    "outros"), com probabilidade 1 - delta.
+    """
+    return {"top_k": top_k, "width": width, "depth": depth,
+            "epsilon": math.e / width, "delta": math.exp(-depth), "others_client": OTHERS_CLIENT}
+
+
+class SketchSnapshot:
+    """
+    Cópia congelada (serializável entre processos) de um HeavyHitters.
+    """
+    def __init__(self, entries, others, counts, total, top_k, width, depth):
+        self.entries = entries
+        self.others = others
+        self.counts = counts
+        self.total = total
+        self.top_k = top_k
+        self.width = width
+        self.depth = depth
+
+    def cells(self, key):
+        return _cells(key, self.width, self.depth)
+
+    def estimate(self, key):
+        counts = self.counts
+        return min(counts[cell] for cell in self.cells(key))
+
+    def traffic(self):
+        """
+        Formato de traffic_data: o top-K (com "erro") e a linha OTHERS_KEY.
+        """
+        traffic = dict(self.entries)
+        if self.others["Entrada"] or self.others["Saída"]:
+            traffic[OTHERS_KEY] = self.others
+        return traffic
+
+
+def _cells(key, width, depth):
+    digest = zlib.crc32(f"{key[0]}|{key[1]}".encode())
+    return [row * width + (a * digest + b) % _PRIME % width
+            for row, (a, b) in enumerate(_HASH_COEFFICIENTS[:depth])]
+
+
+class HeavyHitters:
+    """
+    Tabela de tráfego com memória constante para fontes em massa (ex.: flood com
+    origem forjada). Até `top_k` clientes têm contadores exatos; o resto vai para
+    uma linha "outros" e para um sketch Count-Min com os bytes de cada chave que
+    ficaram fora do top-K.
+
+    Um cliente novo só entra no top-K quando a estimativa do sketch (bytes já
+    vistos fora do top-K + o pacote atual) supera o menor total do top-K, que sai
+    para "outros". O "erro" de cada entrada é a estimativa no momento da entrada:
+    o total real do cliente fica entre os bytes contados e contados + erro.
+    """
+    def __init__(self, top_k=SKETCH_TOP_K, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+        self.top_k = top_k
+        self.width = width
+        self.depth = depth
+        self.entries = {}
+        self.others = _new_entry()
+        self.counts = [0] * (width * depth)
+        self.total = 0
+        # Min-heap (total quando empilhado, chave); entradas só crescem, então o topo
+        # é um limite inferior do menor total e é corrigido só quando há despejo
+        self._heap = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, key, direction, protocol, size):
+        self.total += size
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self._admit(key, size)
+        entry[direction] += size
+        entry["protocolos"][protocol] += size
+
+    def add_entry(self, key, data):
+        """
+        Soma os totais já agregados de um cliente (contabilidade em lote).
+        """
+        size = _entry_total(data)
+        self.total += size
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self._admit(key, size)
+        _add_entry(entry, data)
+
+    def _admit(self, key, size):
+        """
+        Decide se a chave entra no top-K. Retorna a entrada onde somar os bytes
+        (a própria ou a linha "outros").
+        """
+        cells = _cells(key, self.width, self.depth)
+        counts = self.counts
+        prior = min(counts[cell] for cell in cells)
+        if len(self.entries) >= self.top_k and not self._evict_below(prior + size):
+            for cell in cells:
+                counts[cell] += size
+            return self.others
+        entry = self.entries[key] = _new_entry()
+        entry["erro"] = prior
+        heapq.heappush(self._heap, (0, key))
+        return entry
+
+    def _evict_below(self, candidate):
+        """
+        Tira do top-K a entrada de menor total se ele for menor que `candidate`.
+        """
+        heap = self._heap
+        while heap and candidate > heap[0][0]:
+            pushed, key = heap[0]
+            entry = self.entries[key]
+            total = _entry_total(entry)
+            if total != pushed:
+                heapq.heapreplace(heap, (total, key))
+                continue
+            heapq.heappop(heap)
+            del self.entries[key]
+            _add_entry(self.others, entry)
+            for cell in _cells(key, self.width, self.depth):
+                self.counts[cell] += total
+            return True
+        return False
+
+    def freeze(self):
+        return SketchSnapshot(
+            {key: _freeze_entry(entry) for key, entry in list(self.entries.items())},
+            _freeze_entry(self.others), list(self.counts), self.total, self.top_k, self.width, self.depth,
+        )
+
+
+def merge_snapshots(snapshots):
+    """
+    Junta os sketches de vários workers. Os contadores do Count-Min são somados;
+    uma chave ausente do top-K de um worker recebe, como erro, a estimativa desse
+    worker para ela. O excesso acima de top_k vai para "outros".
+    """
+    first = snapshots[0]
+    width, depth, top_k = first.width, first.depth, first.top_k
+    counts = [sum(column) for column in zip(*(s.counts for s in snapshots))]
+    others = _new_entry()
+    entries = {}
+    for snapshot in snapshots:
+        _add_entry(others, snapshot.others)
+        for key, data in snapshot.entries.items():
+            entry = entries.get(key)
+            if entry is None:
+                entry = entries[key] = _new_entry()
+            _add_entry(entry, data)
+            entry["erro"] += data["erro"]
+    for key, entry in entries.items():
+        for snapshot in snapshots:
+            if key not in snapshot.entries:
+                entry["erro"] += snapshot.estimate(key)
+
+    if len(entries) > top_k:
+        ranked = sorted(entries, key=lambda k: _entry_total(entries[k]), reverse=True)
+        for key in ranked[top_k:]:
+            entry = entries.pop(key)
+            _add_entry(others, entry)
+            for cell in _cells(key, width, depth):
+                counts[cell] += _entry_total(entry)
+
+    return SketchSnapshot(
+        {key: _freeze_entry(entry) for key, entry in entries.items()}, _freeze_entry(others),
+        counts, sum(s.total for s in snapshots), top_k, width, depth,
+    )
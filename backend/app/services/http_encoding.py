@@ -0,0 +1,100 @@
+import gzip
+import hashlib
+from flask import Response, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from app.config import RESPONSE_COMPRESSION, COMPRESS_MIN_BYTES
+
+# Opcionais: sem eles as respostas saem em JSON e só com gzip
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def response_format():
+    """
+    "msgpack" se o cliente pediu application/msgpack no Accept (e o pacote existe), senão "json".
+    """
+    if msgpack is not None and request.accept_mimetypes.best_match([JSON, MSGPACK]) == MSGPACK:
+        return "msgpack"
+    return "json"
+
+
+def content_coding(size):
+    """
+    Codificação da resposta pelo Accept-Encoding: br (se disponível), gzip ou nenhuma.
+    """
+    if not RESPONSE_COMPRESSION or size < COMPRESS_MIN_BYTES:
+        return None
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return request.accept_encodings.best_match(offered)
+
+
+def not_modified(etag):
+    """
+    True se o If-None-Match do cliente já tem esta representação (em qualquer codificação).
+    """
+    if not request.if_none_match:
+        return False
+    return any(request.if_none_match.contains_weak(tag) for tag in (etag, f"{etag}-gzip", f"{etag}-br"))
+
+
+def not_modified_response(etag):
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.vary.update(("Accept", "Accept-Encoding"))
+    return response
+
+
+class NegotiatingJSONProvider(DefaultJSONProvider):
+    """
+    jsonify() das rotas: com Accept: application/msgpack o mesmo objeto sai em
+    MessagePack, serializado direto (sem passar por JSON).
+    """
+    def response(self, *args, **kwargs):
+        if has_request_context() and response_format() == "msgpack":
+            data = msgpack.packb(self._prepare_response_obj(args, kwargs), default=self.default)
+            return self._app.response_class(data, mimetype=MSGPACK)
+        return super().response(*args, **kwargs)
+
+
+def install(app):
+    """
+    ETag e 304 em todo GET que responde JSON/MessagePack (pelo conteúdo, se a rota
+    não definiu uma versão) e compressão negociada pelo Accept-Encoding.
+    """
+    app.json = NegotiatingJSONProvider(app)
+
+    @app.after_request
+    def encode_response(response):
+        if (request.method != "GET" or response.status_code != 200 or response.is_streamed
+                or response.mimetype not in (JSON, MSGPACK)):
+            return response
+        response.vary.update(("Accept", "Accept-Encoding"))
+        data = response.get_data()
+        etag = response.get_etag()[0]
+        if etag is None:
+            etag = hashlib.blake2b(data, digest_size=12).hexdigest()
+            response.set_etag(etag)
+        if not_modified(etag):
+            return not_modified_response(etag)
+
+        coding = content_coding(len(data))
+        if coding == "br":
+            response.set_data(brotli.compress(data, quality=BROTLI_QUALITY))
+        elif coding == "gzip":
+            response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+        if coding:
+            response.headers["Content-Encoding"] = coding
+            # Cada codificação é uma representação diferente, com sua própria ETag
+            response.set_etag(f"{etag}-{coding}")
+        return response
@@ -0,0 +1,231 @@
+import heapq
+import ipaddress
+import threading
+import time
+from functools import partial
+from app import metrics
+from app.config import LIVE_TOP_MAX, LIVE_MAX_ROOMS, LIVE_ACK_TIMEOUT, METRICS_ENABLED
+
+# Opcional: sem ele as assinaturas com binary=true recebem JSON
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Sala do evento traffic_update completo: quem conecta entra nela e sai ao assinar salas
+FULL_ROOM = "traffic_full"
+
+
+def parse_room(room):
+    """
+    Nome canônico de uma sala: "all", "ip:<endereço do cliente>" ou "top:<n>"
+    (os n clientes com mais bytes no último flush). Levanta ValueError.
+    """
+    room = str(room)
+    if room == "all":
+        return room
+    kind, _, value = room.partition(":")
+    if kind == "ip":
+        try:
+            return "ip:" + str(ipaddress.ip_address(value))
+        except ValueError:
+            raise ValueError(f"Endereço inválido na sala: {room}") from None
+    if kind == "top" and value.isdigit() and 1 <= int(value) <= LIVE_TOP_MAX:
+        return f"top:{int(value)}"
+    raise ValueError(f"Sala inválida: {room} (use all, ip:<endereço> ou top:<1..{LIVE_TOP_MAX}>)")
+
+
+def _key(item):
+    return item["server_ip"], item["client_ip"]
+
+
+class _Frame:
+    """
+    Itens de um flush, indexados uma vez para montar qualquer sala.
+    """
+    def __init__(self, items):
+        self.items = items
+        self._by_client = None
+        self._ranked = None
+
+    def room(self, room):
+        if room == "all":
+            selected = self.items
+        elif room.startswith("ip:"):
+            if self._by_client is None:
+                self._by_client = {}
+                for item in self.items:
+                    self._by_client.setdefault(item["client_ip"], []).append(item)
+            selected = self._by_client.get(room[3:], ())
+        else:
+            # Um ranking só (dos LIVE_TOP_MAX maiores) atende todas as salas top:<n>
+            if self._ranked is None:
+                self._ranked = heapq.nlargest(LIVE_TOP_MAX, self.items,
+                                              key=lambda i: (i["inbound"] + i["outbound"], _key(i)))
+            selected = self._ranked[:int(room[4:])]
+        return {_key(item): item for item in selected}
+
+
+class _Subscriber:
+    def __init__(self, rooms, binary):
+        self.rooms = rooms
+        self.binary = binary
+        # Mensagem enviada e ainda sem ack do cliente
+        self.in_flight = False
+        self.sent_at = 0.0
+        # Perdeu deltas enquanto a anterior estava em voo: recebe um snapshot no lugar deles
+        self.behind = False
+
+
+class LiveUpdates:
+    """
+    Atualizações do websocket por sala. Cada flush do reporter vira, por sala
+    assinada, um delta (itens novos/alterados e chaves removidas) com o número de
+    sequência da sala; cada cliente recebe num único `traffic_delta` só as salas
+    que assina e mudaram, codificado uma vez por combinação de salas e formato.
+
+    Um cliente tem no máximo uma mensagem em voo (confirmada pelo ack do evento).
+    Deltas que chegam enquanto ela não é confirmada não se acumulam: o cliente é
+    marcado como atrasado e, no ack, recebe um único `traffic_snapshot` com o
+    estado atual. Sem ack em LIVE_ACK_TIMEOUT segundos a mensagem é dada como
+    perdida e o próximo flush manda o snapshot.
+    """
+    def __init__(self, emit, ack_timeout=LIVE_ACK_TIMEOUT, clock=time.monotonic):
+        self._emit = emit
+        self.ack_timeout = ack_timeout
+        self._clock = clock
+        self._frame = _Frame([])
+        self.sampling_rate = 1
+        self._rooms = {}
+        self._seq = {}
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, sid, rooms, binary=False):
+        """
+        Assina as salas (substitui as anteriores) e devolve o snapshot delas.
+        Levanta ValueError para salas inválidas.
+        """
+        if not isinstance(rooms, (list, tuple)):
+            raise ValueError("rooms deve ser uma lista de salas")
+        if len(rooms) > LIVE_MAX_ROOMS:
+            raise ValueError(f"No máximo {LIVE_MAX_ROOMS} salas por cliente")
+        rooms = {parse_room(room) for room in rooms}
+        binary = bool(binary) and msgpack is not None
+        with self._lock:
+            subscriber = self._subscribers[sid] = _Subscriber(rooms, binary)
+            return self._snapshot(subscriber)
+
+    def unsubscribe(self, sid):
+        with self._lock:
+            self._subscribers.pop(sid, None)
+
+    def snapshot(self, sid):
+        """
+        Estado atual das salas do cliente (ex.: depois de um buraco na sequência).
+        """
+        with self._lock:
+            subscriber = self._subscribers.get(sid)
+            if subscriber is None:
+                return None
+            subscriber.behind = False
+            return self._snapshot(subscriber)
+
+    def publish(self, items, sampling_rate=1):
+        """
+        Chamado pelo reporter a cada flush com os itens do traffic_update.
+        """
+        outbox = []
+        with self._lock:
+            self._frame = _Frame(items)
+            self.sampling_rate = sampling_rate
+            watched = set()
+            for subscriber in self._subscribers.values():
+                watched |= subscriber.rooms
+
+            deltas = {}
+            for room in watched:
+                current = self._frame.room(room)
+                previous = self._rooms.get(room, {})
+                upsert = [item for key, item in current.items() if previous.get(key) != item]
+                remove = [list(key) for key in previous if key not in current]
+                self._rooms[room] = current
+                if upsert or remove:
+                    self._seq[room] = self._seq.get(room, 0) + 1
+                    deltas[room] = {"seq": self._seq[room], "upsert": upsert, "remove": remove}
+            # Salas sem assinantes deixam de ser mantidas
+            for room in [room for room in self._rooms if room not in watched]:
+                del self._rooms[room]
+                self._seq.pop(room, None)
+
+            now = self._clock()
+            encoded = {}
+            for sid, subscriber in self._subscribers.items():
+                changed = sorted(room for room in subscriber.rooms if room in deltas)
+                if subscriber.in_flight and now - subscriber.sent_at < self.ack_timeout:
+                    if changed:
+                        subscriber.behind = True
+                        self._count("coalesced")
+                    continue
+                if subscriber.behind or subscriber.in_flight:
+                    outbox.append(self._send(sid, subscriber, "traffic_snapshot", self._snapshot(subscriber)))
+                elif changed:
+                    cache_key = (tuple(changed), subscriber.binary)
+                    if cache_key not in encoded:
+                        encoded[cache_key] = self._encode(
+                            {"rooms": {room: deltas[room] for room in changed}, "sampling_rate": sampling_rate},
+                            subscriber.binary)
+                    outbox.append(self._send(sid, subscriber, "traffic_delta", encoded[cache_key], "delta"))
+        self._deliver(outbox)
+
+    def ack(self, sid, *args):
+        """
+        Ack de uma mensagem: libera o cliente e, se ele ficou para trás, manda o snapshot.
+        """
+        outbox = []
+        with self._lock:
+            subscriber = self._subscribers.get(sid)
+            if subscriber is None:
+                return
+            subscriber.in_flight = False
+            if subscriber.behind:
+                outbox.append(self._send(sid, subscriber, "traffic_snapshot", self._snapshot(subscriber)))
+        self._deliver(outbox)
+
+    def _snapshot(self, subscriber):
+        rooms = {}
+        for room in sorted(subscriber.rooms):
+            if room not in self._rooms:
+                self._rooms[room] = self._frame.room(room)
+                self._seq.setdefault(room, 0)
+            rooms[room] = {"seq": self._seq[room], "items": list(self._rooms[room].values())}
+        return self._encode({"rooms": rooms, "sampling_rate": self.sampling_rate}, subscriber.binary)
+
+    def _send(self, sid, subscriber, event, data, kind="snapshot"):
+        subscriber.in_flight = True
+        subscriber.behind = False
+        subscriber.sent_at = self._clock()
+        self._count(kind)
+        return event, data, sid
+
+    def _deliver(self, outbox):
+        # Fora do lock: o ack pode chegar (e publicar de novo) antes do emit retornar
+        for event, data, sid in outbox:
+            self._emit(event, data, to=sid, callback=partial(self.ack, sid))
+
+    @staticmethod
+    def _encode(message, binary):
+        return msgpack.packb(message) if binary else message
+
+    @staticmethod
+    def _count(kind):
+        if METRICS_ENABLED:
+            metrics.live_messages.inc(1, kind)
+
+
+def _socketio_emit(event, data, **kwargs):
+    from app import socketio
+    socketio.emit(event, data, **kwargs)
+
+
+live_updates = LiveUpdates(_socketio_emit)
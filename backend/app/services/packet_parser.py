@@ -0,0 +1,235 @@
+import struct
+import numpy as np
+
+# EtherTypes e números de protocolo IP usados na classificação
+ETH_TYPE_IPV4 = 0x0800
+ETH_TYPE_ARP = 0x0806
+ETH_TYPE_IPV6 = 0x86DD
+ETH_TYPES_VLAN = (0x8100, 0x88A8, 0x9100)
+
+IP_PROTO_ICMP = 1
+IP_PROTO_IPIP = 4
+IP_PROTO_TCP = 6
+IP_PROTO_UDP = 17
+IP_PROTO_IPV6 = 41
+
+# Cabeçalhos de extensão IPv6 que apenas encadeiam o próximo cabeçalho
+IPV6_EXT_HEADERS = (0, 43, 60)
+
+# Tamanho mínimo de cabeçalho para o Scapy reconhecer a camada
+MIN_HEADER = {IP_PROTO_TCP: 20, IP_PROTO_UDP: 8, IP_PROTO_ICMP: 8}
+
+_unpack_ipv4 = struct.Struct("!BBHHHBBH4s4s").unpack_from
+
+# Códigos numéricos de protocolo usados no processamento em lote:
+# 0-255 = IP_PROTO_n; os nomes de get_protocol vêm em seguida
+NAMED_PROTOCOLS = ("TCP", "UDP", "ICMP", "IPv6")
+PROTOCOL_CODE = {name: 256 + i for i, name in enumerate(NAMED_PROTOCOLS)}
+PROTOCOL_CODE.update({f"IP_PROTO_{n}": n for n in range(256)})
+PROTOCOL_NAME = {code: name for name, code in PROTOCOL_CODE.items()}
+
+
+def _ipv4_payload_bounds(frame, offset, end):
+    """
+    Retorna (proto, início, fim, frag_offset) do payload IPv4, seguindo as mesmas regras
+    de corte do Scapy (campo len, com fallback para o tamanho capturado).
+    """
+    ihl = (frame[offset] & 0x0F) * 4
+    total_len = (frame[offset + 2] << 8) | frame[offset + 3]
+    frag = ((frame[offset + 6] & 0x1F) << 8) | frame[offset + 7]
+    proto = frame[offset + 9]
+    start = offset + ihl
+    payload_len = total_len - ihl
+    stop = end if payload_len < 0 else min(end, start + payload_len)
+    return proto, start, stop, frag
+
+
+def _classify_ipv4_payload(frame, proto, start, stop, frag):
+    """
+    Descobre quais camadas o Scapy encontraria dentro do payload IPv4.
+    Retorna um conjunto com "TCP", "UDP", "ICMP" e/ou "IPv6".
+    """
+    if frag:
+        # Fragmentos não iniciais não são dissecados (viram Raw)
+        return ()
+    size = stop - start
+    if proto in MIN_HEADER:
+        if size < MIN_HEADER[proto]:
+            return ()
+        return ("TCP",) if proto == IP_PROTO_TCP else ("UDP",) if proto == IP_PROTO_UDP else ("ICMP",)
+    if proto == IP_PROTO_IPV6:
+        return ("IPv6",) if size >= 40 else ()
+    if proto == IP_PROTO_IPIP and size >= 20:
+        inner = _ipv4_payload_bounds(frame, start, stop)
+        return _classify_ipv4_payload(frame, *inner)
+    return ()
+
+
+def _protocol_name(layers, proto):
+    """
+    Mesma precedência de get_protocol: IPv6 > TCP > UDP > ICMP > IP_PROTO_n.
+    """
+    for name in ("IPv6", "TCP", "UDP", "ICMP"):
+        if name in layers:
+            return name
+    return f"IP_PROTO_{proto}"
+
+
+def _skip_vlan(frame, end):
+    """
+    Retorna (EtherType, offset do cabeçalho L3) após as tags VLAN, ou (None, None).
+    """
+    if end < 14:
+        return None, None
+    eth_type = (frame[12] << 8) | frame[13]
+    offset = 14
+    while eth_type in ETH_TYPES_VLAN:
+        if end < offset + 4:
+            return None, None
+        eth_type = (frame[offset + 2] << 8) | frame[offset + 3]
+        offset += 4
+    return eth_type, offset
+
+
+def _find_ipv4(frame, end):
+    """
+    Percorre Ethernet/VLAN/IPv6 até o primeiro cabeçalho IPv4.
+    Retorna (offset do IPv4, camadas já vistas) ou (None, None).
+    """
+    eth_type, offset = _skip_vlan(frame, end)
+
+    if eth_type == ETH_TYPE_IPV4:
+        return offset, ()
+
+    if eth_type == ETH_TYPE_IPV6:
+        # IPv4 encapsulado em IPv6 (4in6), eventualmente após cabeçalhos de extensão
+        if end < offset + 40:
+            return None, None
+        next_header = frame[offset + 6]
+        offset += 40
+        while next_header in IPV6_EXT_HEADERS:
+            if end < offset + 8:
+                return None, None
+            next_header, ext_len = frame[offset], frame[offset + 1]
+            offset += (ext_len + 1) * 8
+        if next_header == IP_PROTO_IPIP:
+            return offset, ("IPv6",)
+
+    return None, None
+
+
+def _parse_ipv6(frame, end):
+    """
+    Cabeçalho IPv6 de um quadro sem IPv4: (ip_src, ip_dst, "IPv6", next_header, sport, dport),
+    com endereços de 16 bytes. As portas só são lidas quando TCP/UDP vem logo após
+    o cabeçalho fixo (como o Scapy, que não pula os cabeçalhos de extensão no payload).
+    """
+    eth_type, offset = _skip_vlan(frame, end)
+    if eth_type != ETH_TYPE_IPV6 or end < offset + 40:
+        return None
+    payload_len = (frame[offset + 4] << 8) | frame[offset + 5]
+    next_header = frame[offset + 6]
+    start = offset + 40
+    stop = min(end, start + payload_len) if payload_len else end
+    sport = dport = 0
+    if next_header in (IP_PROTO_TCP, IP_PROTO_UDP) and stop - start >= MIN_HEADER[next_header]:
+        sport = (frame[start] << 8) | frame[start + 1]
+        dport = (frame[start + 2] << 8) | frame[start + 3]
+    return (bytes(frame[offset + 8:offset + 24]), bytes(frame[offset + 24:offset + 40]),
+            "IPv6", next_header, sport, dport)
+
+
+def parse_frame(frame):
+    """
+    Lê um quadro Ethernet cru (bytes, bytearray ou memoryview) e retorna
+    (ip_src, ip_dst, protocolo, ip_proto, sport, dport) do primeiro cabeçalho IPv4,
+    com os endereços ainda empacotados em 4 bytes. Sem IPv4, usa o cabeçalho IPv6
+    (endereços de 16 bytes). As portas são 0 quando o payload não é um cabeçalho
+    TCP/UDP completo. Retorna None se o quadro não tiver IP.
+
+    O protocolo segue a mesma classificação de get_protocol. Túneis como GRE,
+    VXLAN ou GTP são classificados pelo cabeçalho externo.
+    """
+    end = len(frame)
+    offset, outer_layers = _find_ipv4(frame, end)
+    if offset is None:
+        return _parse_ipv6(frame, end)
+    if end < offset + 20:
+        return None
+
+    fields = _unpack_ipv4(frame, offset)
+    proto, start, stop, frag = _ipv4_payload_bounds(frame, offset, end)
+    if fields[0] & 0x0F < 5:
+        layers = ()
+    else:
+        layers = _classify_ipv4_payload(frame, proto, start, stop, frag)
+
+    sport = dport = 0
+    if layers and proto in (IP_PROTO_TCP, IP_PROTO_UDP):
+        sport = (frame[start] << 8) | frame[start + 1]
+        dport = (frame[start + 2] << 8) | frame[start + 3]
+    return fields[8], fields[9], _protocol_name(outer_layers + tuple(layers), proto), proto, sport, dport
+
+
+def parse_batch(frames, lengths):
+    """
+    Versão vetorizada de parse_frame. `frames` é uma matriz (n x snaplen) de uint8 com
+    o início de cada quadro e `lengths` o tamanho real de cada um. O caso comum
+    (Ethernet + IPv4 simples) é resolvido em NumPy; VLAN, 4in6 e IP-in-IP caem em
+    parse_frame linha a linha.
+
+    Retorna um dict de arrays: valid, src, dst (uint32), code (código do protocolo),
+    proto, sport e dport. Quadros só com IPv6 ficam de fora (valid falso) e são
+    marcados em `ipv6`, para o chamador tratá-los com parse_frame.
+    """
+    n = len(lengths)
+    lengths = lengths.astype(np.int64)
+    frames = frames[:n]
+    eth_type = (frames[:, 12].astype(np.int64) << 8) | frames[:, 13]
+    ipv4 = (eth_type == ETH_TYPE_IPV4) & (lengths >= 34)
+
+    ihl = (frames[:, 14] & 0x0F).astype(np.int64) * 4
+    total_len = (frames[:, 16].astype(np.int64) << 8) | frames[:, 17]
+    frag = ((frames[:, 20].astype(np.int64) & 0x1F) << 8) | frames[:, 21]
+    proto = frames[:, 23].astype(np.int64)
+    src = np.zeros(n, dtype=np.uint32)
+    dst = np.zeros(n, dtype=np.uint32)
+    for i in range(4):
+        src |= frames[:, 26 + i].astype(np.uint32) << (24 - 8 * i)
+        dst |= frames[:, 30 + i].astype(np.uint32) << (24 - 8 * i)
+
+    start = 14 + ihl
+    payload_len = total_len - ihl
+    stop = np.where(payload_len < 0, lengths, np.minimum(lengths, start + payload_len))
+    size = stop - start
+    parsed_header = (ihl >= 20) & (frag == 0)
+
+    code = proto.copy()
+    for number, name, minimum in ((IP_PROTO_TCP, "TCP", 20), (IP_PROTO_UDP, "UDP", 8),
+                                  (IP_PROTO_ICMP, "ICMP", 8), (IP_PROTO_IPV6, "IPv6", 40)):
+        code[parsed_header & (proto == number) & (size >= minimum)] = PROTOCOL_CODE[name]
+
+    has_ports = (code == PROTOCOL_CODE["TCP"]) | (code == PROTOCOL_CODE["UDP"])
+    rows = np.arange(n)
+    port_start = np.where(has_ports, start, 0)
+    sport = np.where(has_ports, (frames[rows, port_start].astype(np.int64) << 8) | frames[rows, port_start + 1], 0)
+    dport = np.where(has_ports, (frames[rows, port_start + 2].astype(np.int64) << 8) | frames[rows, port_start + 3], 0)
+
+    valid = ipv4.copy()
+    ipv6 = np.zeros(n, dtype=bool)
+    fallback = (ipv4 & parsed_header & (proto == IP_PROTO_IPIP)) | np.isin(eth_type, ETH_TYPES_VLAN + (ETH_TYPE_IPV6,))
+    snaplen = frames.shape[1]
+    for row in np.nonzero(fallback)[0].tolist():
+        parsed = parse_frame(frames[row, :min(int(lengths[row]), snaplen)].tobytes())
+        if parsed is None or len(parsed[0]) != 4:
+            valid[row] = False
+            ipv6[row] = parsed is not None
+            continue
+        ip_src, ip_dst, protocol, proto[row], sport[row], dport[row] = parsed
+        src[row] = int.from_bytes(ip_src, "big")
+        dst[row] = int.from_bytes(ip_dst, "big")
+        code[row] = PROTOCOL_CODE[protocol]
+        valid[row] = True
+
+    return {"valid": valid, "src": src, "dst": dst, "code": code, "proto": proto,
+            "sport": sport, "dport": dport, "ipv6": ipv6}
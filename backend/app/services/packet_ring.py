@@ -0,0 +1,56 @@
+import socket
+from array import array
+from time import time
+import numpy as np
+
+# Bytes iniciais guardados de cada quadro (cabeçalhos Ethernet/VLAN/IP/L4)
+SNAP_LEN = 128
+
+
+class PacketRing:
+    """
+    Buffer pré-alocado de registros de tamanho fixo: os SNAP_LEN primeiros bytes do
+    quadro, o tamanho real e o horário de chegada. No caminho por pacote há só uma
+    cópia para o slot seguinte; a dissecação e a contabilidade acontecem em lote
+    (parse_batch + bincount) quando o buffer enche ou o reporter pede os dados.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.frames = np.zeros((capacity, SNAP_LEN), dtype=np.uint8)
+        # array.array aceita atribuição escalar mais barata; o NumPy lê a mesma memória
+        self._lengths = array("I", bytes(4 * capacity))
+        self._timestamps = array("d", bytes(8 * capacity))
+        self.lengths = np.frombuffer(self._lengths, dtype=np.uint32)
+        self.timestamps = np.frombuffer(self._timestamps, dtype=np.float64)
+        self.count = 0
+        self._view = memoryview(self.frames.reshape(-1))
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def recv(self, sock):
+        """
+        Lê um quadro do socket direto para o próximo slot. Com MSG_TRUNC o kernel
+        informa o tamanho real mesmo quando o quadro excede SNAP_LEN.
+        """
+        i = self.count
+        offset = i * SNAP_LEN
+        self._lengths[i] = sock.recv_into(self._view[offset:offset + SNAP_LEN], SNAP_LEN, socket.MSG_TRUNC)
+        self._timestamps[i] = time()
+        self.count = i + 1
+
+    def append(self, frame, ts=None):
+        i = self.count
+        size = min(len(frame), SNAP_LEN)
+        offset = i * SNAP_LEN
+        self._view[offset:offset + size] = frame[:size]
+        self._lengths[i] = len(frame)
+        self._timestamps[i] = time() if ts is None else ts
+        self.count = i + 1
+
+    def clear(self):
+        self.count = 0
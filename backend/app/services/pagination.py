@@ -0,0 +1,74 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from app.config import STREAM_FETCH_SIZE
+
+STREAM_FORMATS = ("ndjson", "json")
+
+
+def encode_cursor(values):
+    """
+    Token opaco com a chave (created_at, id, ...) da última linha de uma página.
+    """
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, size):
+    """
+    Lê um token de encode_cursor com `size` valores, o primeiro um horário.
+    Levanta ValueError se ele não for válido.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError
+        return [datetime.fromisoformat(values[0])] + values[1:]
+    except (ValueError, TypeError):
+        raise ValueError("Cursor inválido") from None
+
+
+def iter_query(get_connection, query, params, fetch_size=STREAM_FETCH_SIZE):
+    """
+    Linhas de `query` lidas por um cursor nomeado (do lado do servidor), `fetch_size`
+    por vez: a memória não cresce com o tamanho do resultado. A conexão fica
+    emprestada até o fim da iteração.
+    """
+    with get_connection() as conn:
+        with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cursor:
+            cursor.itersize = fetch_size
+            cursor.execute(query, params)
+            yield from cursor
+
+
+def stream_ndjson(items):
+    """
+    Um objeto JSON por linha, enviado à medida que as linhas chegam.
+    """
+    try:
+        for item in items:
+            yield json.dumps(item) + "\n"
+    except Exception as e:
+        # O status 200 já foi enviado: o erro vai como a última linha
+        print("Erro no stream:", e)
+        yield json.dumps({"error": str(e)}) + "\n"
+
+
+def stream_json(items, key, extra):
+    """
+    O mesmo corpo da resposta sem stream ({**extra, key: [...]}), enviado em pedaços.
+    """
+    head = json.dumps(extra)
+    yield head[:-1] + (", " if extra else "") + json.dumps(key) + ": ["
+    separator = ""
+    try:
+        for item in items:
+            yield separator + json.dumps(item)
+            separator = ", "
+    except Exception as e:
+        # O status 200 já foi enviado: o corpo fecha como JSON válido, com o erro ao lado da lista
+        print("Erro no stream:", e)
+        yield "], " + json.dumps("error") + ": " + json.dumps(str(e)) + "}"
+        return
+    yield "]}"
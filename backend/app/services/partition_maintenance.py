@@ -0,0 +1,185 @@
+import re
+from datetime import datetime, timedelta
+from threading import Thread
+from time import sleep
+from app.config import TRAFFIC_RETENTION_DAYS, PARTITION_PREMAKE_DAYS, PARTITION_MAINTENANCE_INTERVAL
+from app.db import get_connection
+from app.services.rollup import rebuild_rollups
+
+PARENT = "traffic_logs"
+PARTITION_PREFIX = "traffic_logs_p"
+DEFAULT_PARTITION = "traffic_logs_default"
+
+LIST_PARTITIONS_SQL = """
+    SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+    FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = %s::regclass
+"""
+_BOUND = re.compile(r"FROM \((MINVALUE|'[^']*')\) TO \((MAXVALUE|'[^']*')\)")
+
+
+def _parse_value(value):
+    return None if value.endswith("VALUE") else datetime.fromisoformat(value.strip("'"))
+
+
+def parse_bound(expression):
+    """
+    (início, fim) de "FOR VALUES FROM (...) TO (...)"; None no lado MINVALUE/MAXVALUE.
+    A partição DEFAULT devolve None.
+    """
+    match = _BOUND.search(expression)
+    if not match:
+        return None
+    return _parse_value(match.group(1)), _parse_value(match.group(2))
+
+
+def list_partitions(cursor):
+    """
+    [(nome, início, fim)] das partições de faixa de traffic_logs, da mais antiga à mais nova.
+    """
+    cursor.execute(LIST_PARTITIONS_SQL, (PARENT,))
+    partitions = []
+    for name, expression in cursor.fetchall():
+        bound = parse_bound(expression)
+        if bound is not None:
+            partitions.append((name, *bound))
+    return sorted(partitions, key=lambda p: (p[1] is not None, p[1] or datetime.min))
+
+
+def partition_name(day):
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def missing_partitions(partitions, now, days_ahead=PARTITION_PREMAKE_DAYS):
+    """
+    [(nome, início, fim)] das partições diárias de hoje até `days_ahead` dias à
+    frente que ainda não existem (e não se sobrepõem a uma existente, como a
+    traffic_logs_legacy).
+    """
+    today = datetime(now.year, now.month, now.day)
+    missing = []
+    for offset in range(days_ahead + 1):
+        lower, upper = today + timedelta(days=offset), today + timedelta(days=offset + 1)
+        if any((start is None or start < upper) and (end is None or end > lower) for _n, start, end in partitions):
+            continue
+        missing.append((partition_name(lower), lower, upper))
+    return missing
+
+
+def create_partition(cursor, name, lower, upper):
+    """
+    Cria a partição [lower, upper). Se a traffic_logs_default já tem linhas do
+    intervalo, o CREATE falharia: a DEFAULT é destacada, as linhas são movidas
+    para a partição nova e a DEFAULT volta, tudo na mesma transação.
+    """
+    create = f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT} FOR VALUES FROM (%s) TO (%s)"
+    cursor.execute(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s)",
+        (lower, upper)
+    )
+    if not cursor.fetchone()[0]:
+        cursor.execute(create, (lower, upper))
+        return
+    cursor.execute(f"ALTER TABLE {PARENT} DETACH PARTITION {DEFAULT_PARTITION}")
+    cursor.execute(create, (lower, upper))
+    cursor.execute(
+        f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+        """,
+        (lower, upper)
+    )
+    cursor.execute(f"ALTER TABLE {PARENT} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT")
+
+
+def ensure_partitions(cursor, now, days_ahead=PARTITION_PREMAKE_DAYS):
+    """
+    Cria, com o cursor dado, as partições que faltam (missing_partitions).
+    Retorna os nomes criados.
+    """
+    created = []
+    for name, lower, upper in missing_partitions(list_partitions(cursor), now, days_ahead):
+        create_partition(cursor, name, lower, upper)
+        created.append(name)
+    return created
+
+
+def expired_partitions(partitions, now, retention_days=TRAFFIC_RETENTION_DAYS):
+    """
+    Partições que terminam antes do limite de retenção (nenhuma com retention_days = 0).
+    """
+    if retention_days <= 0:
+        return []
+    cutoff = now - timedelta(days=retention_days)
+    return [p for p in partitions if p[2] is not None and p[2] <= cutoff]
+
+
+def drop_partition(cursor, name, lower, upper):
+    """
+    Resume a partição nos rollups (refazendo os baldes do intervalo a partir das
+    linhas brutas) e a remove com DROP TABLE, sem DELETE linha a linha.
+    """
+    rebuild_rollups(cursor, name, lower, upper)
+    cursor.execute(f"DROP TABLE {name}")
+
+
+def prune_default(cursor, now, retention_days=TRAFFIC_RETENTION_DAYS):
+    """
+    Apaga da traffic_logs_default as linhas mais velhas que a retenção (a DEFAULT
+    nunca é removida inteira). Retorna quantas linhas saíram.
+    """
+    if retention_days <= 0:
+        return 0
+    cursor.execute(f"DELETE FROM {DEFAULT_PARTITION} WHERE created_at < %s", (now - timedelta(days=retention_days),))
+    return cursor.rowcount
+
+
+def run_maintenance(now=None, retention_days=TRAFFIC_RETENTION_DAYS, days_ahead=PARTITION_PREMAKE_DAYS):
+    """
+    Uma rodada do job: cria as partições futuras, descarta as vencidas e poda a
+    DEFAULT. Cada partição criada ou removida tem sua transação, e uma falha só
+    é registrada: as outras seguem. Retorna (criadas, removidas, linhas podadas).
+    """
+    now = now or datetime.utcnow()
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            partitions = list_partitions(cursor)
+    created = []
+    for name, lower, upper in missing_partitions(partitions, now, days_ahead):
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cursor:
+                    create_partition(cursor, name, lower, upper)
+            created.append(name)
+        except Exception as e:
+            print(f"Erro ao criar a partição {name}:", e)
+    dropped = []
+    for name, lower, upper in expired_partitions(partitions, now, retention_days):
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cursor:
+                    drop_partition(cursor, name, lower, upper)
+            dropped.append(name)
+        except Exception as e:
+            print(f"Erro ao remover a partição {name}:", e)
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            pruned = prune_default(cursor, now, retention_days)
+    return created, dropped, pruned
+
+
+def start_maintenance_thread(interval=PARTITION_MAINTENANCE_INTERVAL):
+    def maintain():
+        while True:
+            try:
+                created, dropped, pruned = run_maintenance()
+                if created or dropped or pruned:
+                    print(f"Partições de traffic_logs criadas: {created}; removidas: {dropped}; "
+                          f"linhas antigas apagadas da {DEFAULT_PARTITION}: {pruned}")
+            except Exception as e:
+                print("Erro na manutenção das partições de traffic_logs:", e)
+            sleep(interval)
+
+    Thread(target=maintain, daemon=True).start()
@@ -0,0 +1,140 @@
+import struct
+
+PCAP_MAGIC_MICRO = 0xA1B2C3D4
+PCAP_MAGIC_NANO = 0xA1B23C4D
+LINKTYPE_ETHERNET = 1
+READ_BUFFER_SIZE = 1 << 20
+
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+PCAPNG_IDB = 1
+PCAPNG_OPB = 2
+PCAPNG_SPB = 3
+PCAPNG_EPB = 6
+PCAPNG_OPT_TSRESOL = 9
+PCAPNG_OPT_TSOFFSET = 14
+
+
+def iter_pcap(path):
+    """
+    Lê um arquivo pcap sem dissecar os pacotes.
+    Gera tuplas (timestamp, quadro) com o timestamp em segundos (float).
+    """
+    with open(path, "rb", buffering=READ_BUFFER_SIZE) as f:
+        header = f.read(24)
+        if len(header) < 24:
+            raise ValueError(f"Arquivo pcap inválido: {path}")
+
+        for endian in ("<", ">"):
+            magic = struct.unpack(endian + "I", header[:4])[0]
+            if magic in (PCAP_MAGIC_MICRO, PCAP_MAGIC_NANO):
+                break
+        else:
+            raise ValueError(f"Formato de captura não suportado: {path}")
+
+        linktype = struct.unpack(endian + "I", header[20:24])[0] & 0x0FFFFFFF
+        if linktype != LINKTYPE_ETHERNET:
+            raise ValueError(f"Linktype {linktype} não suportado (apenas Ethernet)")
+
+        divisor = 1e9 if magic == PCAP_MAGIC_NANO else 1e6
+        record = struct.Struct(endian + "IIII")
+        while True:
+            rec_header = f.read(16)
+            if len(rec_header) < 16:
+                return
+            ts_sec, ts_frac, incl_len, _orig_len = record.unpack(rec_header)
+            frame = f.read(incl_len)
+            if len(frame) < incl_len:
+                return
+            yield ts_sec + ts_frac / divisor, frame
+
+
+def _pcapng_options(body, endian):
+    """
+    Lê as opções (código, valor) de um bloco pcapng.
+    """
+    options = {}
+    offset = 0
+    while offset + 4 <= len(body):
+        code, length = struct.unpack_from(endian + "HH", body, offset)
+        if code == 0:
+            break
+        options[code] = body[offset + 4:offset + 4 + length]
+        offset += 4 + ((length + 3) & ~3)
+    return options
+
+
+def _pcapng_interface(body, endian):
+    """
+    Retorna (linktype, divisor do timestamp, offset em segundos) de um bloco IDB.
+    """
+    linktype = struct.unpack_from(endian + "H", body, 0)[0]
+    options = _pcapng_options(body[8:], endian)
+    divisor = 1e6
+    if PCAPNG_OPT_TSRESOL in options:
+        resol = options[PCAPNG_OPT_TSRESOL][0]
+        divisor = float(2 ** (resol & 0x7F)) if resol & 0x80 else float(10 ** resol)
+    offset = 0
+    if PCAPNG_OPT_TSOFFSET in options:
+        offset = struct.unpack(endian + "q", options[PCAPNG_OPT_TSOFFSET][:8])[0]
+    return linktype, divisor, offset
+
+
+def iter_pcapng(path):
+    """
+    Lê um arquivo pcapng bloco a bloco, sem carregar o arquivo na memória.
+    Gera tuplas (timestamp, quadro); pacotes de blocos SPB (sem timestamp)
+    herdam o último timestamp visto.
+    """
+    with open(path, "rb", buffering=READ_BUFFER_SIZE) as f:
+        endian = "<"
+        interfaces = []
+        last_ts = 0.0
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return
+            block_type = struct.unpack("<I", header[:4])[0]
+            if block_type == PCAPNG_SHB:
+                magic = f.read(4)
+                endian = "<" if struct.unpack("<I", magic)[0] == PCAPNG_BYTE_ORDER_MAGIC else ">"
+                block_len = struct.unpack(endian + "I", header[4:])[0]
+                f.seek(block_len - 12, 1)
+                interfaces = []
+                continue
+
+            block_type, block_len = struct.unpack(endian + "II", header)
+            if block_len < 12:
+                raise ValueError(f"Bloco pcapng inválido em {path}")
+            body = f.read(block_len - 8)
+            if len(body) < block_len - 8:
+                return
+            body = body[:-4]  # remove o tamanho repetido no fim do bloco
+
+            if block_type == PCAPNG_IDB:
+                interfaces.append(_pcapng_interface(body, endian))
+            elif block_type in (PCAPNG_EPB, PCAPNG_OPB):
+                if block_type == PCAPNG_EPB:
+                    if_id, ts_high, ts_low, cap_len = struct.unpack_from(endian + "IIII", body, 0)
+                else:
+                    if_id, _drops, ts_high, ts_low, cap_len = struct.unpack_from(endian + "HHIII", body, 0)
+                linktype, divisor, ts_offset = interfaces[if_id]
+                if linktype != LINKTYPE_ETHERNET:
+                    continue
+                last_ts = ts_offset + ((ts_high << 32) | ts_low) / divisor
+                yield last_ts, body[20:20 + cap_len]
+            elif block_type == PCAPNG_SPB:
+                if interfaces and interfaces[0][0] == LINKTYPE_ETHERNET:
+                    orig_len = struct.unpack_from(endian + "I", body, 0)[0]
+                    yield last_ts, body[4:4 + orig_len]
+
+
+def iter_capture(path):
+    """
+    Detecta o formato (pcap ou pcapng) pelo número mágico e itera os quadros.
+    """
+    with open(path, "rb") as f:
+        magic = f.read(4)
+    if len(magic) == 4 and struct.unpack("<I", magic)[0] == PCAPNG_SHB:
+        return iter_pcapng(path)
+    return iter_pcap(path)
@@ -0,0 +1,87 @@
+import time
+from datetime import datetime
+from psycopg2.extras import execute_values
+from app.config import REPORT_INTERVAL
+from app.models.traffic_model import TrafficLog, encode_protocols
+from app.services.aggregation import TrafficShard, freeze_traffic
+from app.services.pcap_reader import iter_capture
+from app.services.rollup import save_rollups
+from app.services.sniffing_service import process_frame
+
+# Janelas anteriores à atual que continuam abertas, para tolerar pacotes fora de ordem
+REORDER_WINDOWS = 2
+# Linhas acumuladas antes de cada INSERT em lote
+INSERT_BATCH_SIZE = 5000
+
+
+def _window_rows(window, shard, interval):
+    """
+    Converte o shard de uma janela em (created_at, TrafficLog). Assim como no reporter,
+    a linha recebe o horário do fim da janela (UTC).
+    """
+    created_at = datetime.utcfromtimestamp((window + 1) * interval)
+    return [
+        (created_at, TrafficLog(ip, data["Entrada"], data["Saída"], data["protocolos"], server_ip,
+                                created_at=created_at))
+        for (server_ip, ip), data in freeze_traffic(shard.data).items()
+    ]
+
+
+def replay_captures(paths, write_rows, interval=REPORT_INTERVAL, progress=None):
+    """
+    Processa arquivos pcap/pcapng com a mesma contabilidade da captura ao vivo,
+    agrupando os pacotes em janelas de `interval` segundos pelo timestamp da captura.
+    Apenas as janelas recentes ficam em memória; as demais são entregues a
+    `write_rows` assim que fecham. Retorna as estatísticas da execução.
+    """
+    stats = {"packets": 0, "packets_matched": 0, "rows": 0, "windows": 0}
+    windows = {}
+    newest = None
+    started = time.perf_counter()
+
+    def flush(window):
+        shard = windows.pop(window)
+        stats["packets_matched"] += shard.packets_matched
+        rows = _window_rows(window, shard, interval)
+        if rows:
+            write_rows(rows)
+            stats["rows"] += len(rows)
+            stats["windows"] += 1
+
+    for path in paths:
+        for ts, frame in iter_capture(path):
+            window = int(ts // interval)
+            shard = windows.get(window)
+            if shard is None:
+                shard = windows[window] = TrafficShard(track_flows=False, sketch=False)
+                if newest is None or window > newest:
+                    newest = window
+                    for old in [w for w in windows if w < newest - REORDER_WINDOWS]:
+                        flush(old)
+            process_frame(frame, shard, ts)
+            stats["packets"] += 1
+            if progress and stats["packets"] % 100000 == 0:
+                progress(stats, time.perf_counter() - started)
+
+    for window in sorted(windows):
+        flush(window)
+
+    stats["elapsed"] = time.perf_counter() - started
+    stats["packets_per_second"] = stats["packets"] / stats["elapsed"] if stats["elapsed"] else 0.0
+    return stats
+
+
+def insert_rows(cursor, rows):
+    """
+    Insere (created_at, TrafficLog) em traffic_logs com INSERTs de várias linhas
+    e soma as linhas nos rollups.
+    """
+    execute_values(
+        cursor,
+        "INSERT INTO traffic_logs (client_ip, inbound, outbound, proto_ids, proto_bytes, created_at, server_ip) "
+        "VALUES %s",
+        [(log.client_ip, log.inbound, log.outbound, *encode_protocols(log.protocols), created_at, log.server_ip)
+         for created_at, log in rows],
+        page_size=INSERT_BATCH_SIZE,
+    )
+    save_rollups(cursor, [log for _created_at, log in rows])
@@ -1,40 +1,63 @@
+import json
+from datetime import datetime
 from threading import Thread
-from time import sleep
-from app.services.sniffing_service import traffic_data, data_lock
+from time import sleep, perf_counter
+from app.services.sniffing_service import capture_pool
 from app.models.traffic_model import TrafficLog
-from app import socketio
-from app.db import get_connection
+from app.models.flow_model import FlowLog
+from app import socketio, metrics
+from app.services.db_writer import db_writer
+from app.config import REPORT_INTERVAL, TRAFFIC_SKETCH, METRICS_ENABLED
+from app.green import run_blocking
+from app.services.heavy_hitters import sketch_summary
+from app.services.live_updates import live_updates, FULL_ROOM
 
 def start_reporting_thread():
+    # Grava também os lotes que ficaram em disco numa execução anterior
+    db_writer.start()
+
     def report():
         while True:
-            sleep(5)
-
-            # Faz uma cópia segura dos dados e limpa o buffer
-            with data_lock:
-                if not traffic_data:
-                    continue
-                data_copy = dict(traffic_data)
-                traffic_data.clear()
-
-            report_list = []
-
-            # Insere dados no banco
-            try:
-                with get_connection() as conn:
-                    with conn.cursor() as cursor:
-                        for ip, data in data_copy.items():
-                            log = TrafficLog(ip, data["Entrada"], data["Saída"], dict(data["protocolos"]))
-                            log.save(cursor, log)  # use cursor local
-                            report_list.append(log)
-            except Exception as e:
-                print("Erro ao salvar tráfego no banco:", e)
+            sleep(REPORT_INTERVAL)
+
+            # Troca os shards dos workers de captura e mescla o resultado
+            flush_start = perf_counter()
+            # A espera pelos processos de captura não pode prender o loop nos modos cooperativos
+            data_copy, expired_flows = run_blocking(capture_pool.collect)
+            if not data_copy and not expired_flows:
+                continue
+            sampling_rate = capture_pool.sampling_rate
+            if METRICS_ENABLED:
+                metrics.flush_rows.observe(len(data_copy))
+
+            created_at = datetime.utcnow()
+            report_list = [
+                TrafficLog(ip, data["Entrada"], data["Saída"], data["protocolos"], server_ip,
+                           data.get("erro"), sampling_rate, created_at)
+                for (server_ip, ip), data in data_copy.items()
+            ]
+
+            # A gravação no banco fica com o db_writer (fila + disco); o flush não espera por ela
+            db_writer.submit(report_list, [FlowLog.from_expired(f) for f in expired_flows])
+
+            if not report_list:
                 continue
 
             # Emite os dados via SocketIO
-            socketio.emit('traffic_update', {'traffic': [
-                {"client_ip": l.client_ip, "inbound": l.inbound, "outbound": l.outbound, "protocols": l.protocols}
+            payload = {'traffic': [
+                {"client_ip": l.client_ip, "server_ip": l.server_ip, "inbound": l.inbound, "outbound": l.outbound,
+                 "protocols": l.protocols}
                 for l in report_list
-            ]})
+            ], 'sampling_rate': sampling_rate}
+            if TRAFFIC_SKETCH:
+                for item, log in zip(payload['traffic'], report_list):
+                    item["error"] = log.error
+                payload['sketch'] = sketch_summary()
+            # Lista completa para quem não assinou salas; os assinantes recebem só os deltas delas
+            socketio.emit('traffic_update', payload, to=FULL_ROOM)
+            live_updates.publish(payload['traffic'], sampling_rate)
+            if METRICS_ENABLED:
+                metrics.emit_bytes.observe(len(json.dumps(payload)))
+                metrics.flush_duration_seconds.observe(perf_counter() - flush_start)
 
     Thread(target=report, daemon=True).start()
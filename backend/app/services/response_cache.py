@@ -0,0 +1,179 @@
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, make_response, request
+from app import metrics
+from app.config import RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, METRICS_ENABLED
+from app.services.http_encoding import not_modified, not_modified_response, response_format
+
+# Namespaces invalidados pelas gravações: tráfego/fluxos (DbWriter) e previsões (prediction_routes)
+TRAFFIC = "traffic"
+PREDICTION = "prediction"
+
+# Entra nas ETags: as gerações recomeçam do zero quando o processo reinicia
+_BOOT = uuid.uuid4().hex[:8]
+
+
+class CacheBackend(ABC):
+    """
+    Onde o ResponseCache guarda as respostas. Um backend compartilhado entre
+    processos (ex.: Redis) só precisa implementar estes métodos; faltando algum,
+    a falha é já na criação do backend.
+    """
+    @abstractmethod
+    def get(self, namespace, key):
+        ...
+
+    @abstractmethod
+    def set(self, namespace, key, value, ttl):
+        ...
+
+    @abstractmethod
+    def invalidate(self, namespace):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    def stats(self):
+        return {}
+
+
+class MemoryBackend(CacheBackend):
+    """
+    Cache do processo: TTL por entrada e, cheio, descarta a menos usada (LRU).
+    """
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, clock=time.monotonic):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, namespace, key):
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= self._clock():
+                del self._entries[(namespace, key)]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end((namespace, key))
+            return value
+
+    def set(self, namespace, key, value, ttl):
+        with self._lock:
+            self._entries[(namespace, key)] = (self._clock() + ttl, value)
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, namespace):
+        with self._lock:
+            for entry in [entry for entry in self._entries if entry[0] == namespace]:
+                del self._entries[entry]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {"entries": len(self._entries), "evictions": self.evictions, "expirations": self.expirations}
+
+
+class ResponseCache:
+    """
+    Cache de leitura das rotas GET: `@response_cache.cached(TRAFFIC)` abaixo do
+    @bp.route guarda as respostas 200 por rota e argumentos. invalidate() é chamado
+    depois de cada gravação no banco; uma resposta calculada enquanto isso acontecia
+    não é guardada (pode ter lido o banco antes da gravação).
+
+    A ETag dessas rotas é a versão do namespace (gerações de invalidate() e a janela
+    do TTL, já que os períodos "última hora" andam com o relógio): um If-None-Match
+    igual recebe 304 sem consultar o cache nem o banco.
+    """
+    def __init__(self, backend, ttl=RESPONSE_CACHE_TTL, enabled=RESPONSE_CACHE_ENABLED):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.not_modified = 0
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def cached(self, namespace, ttl=None):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                # Respostas em stream não cabem no cache
+                if not self.enabled or "stream" in request.args:
+                    return view(*args, **kwargs)
+                fmt = response_format()
+                etag = f"{self.version(namespace)}-{fmt}"
+                if not_modified(etag):
+                    self._count("not_modified")
+                    return not_modified_response(etag)
+
+                key = fmt + ":" + request.path + "?" + "&".join(
+                    f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+                value = self.backend.get(namespace, key)
+                if value is not None:
+                    self._count("hits")
+                    body, status, mimetype = value
+                    response = Response(body, status, mimetype=mimetype)
+                    response.set_etag(etag)
+                    response.headers["X-Cache"] = "HIT"
+                    return response
+
+                self._count("misses")
+                generation = self._generations.get(namespace, 0)
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    response.set_etag(etag)
+                    with self._lock:
+                        if self._generations.get(namespace, 0) == generation:
+                            self.backend.set(namespace, key, (response.get_data(), response.status_code,
+                                                              response.mimetype), ttl or self.ttl)
+                response.headers["X-Cache"] = "MISS"
+                return response
+            return wrapper
+        return decorator
+
+    def version(self, namespace):
+        window = int(time.time() // self.ttl) if self.ttl > 0 else 0
+        return f"{_BOOT}-{namespace}-{self._generations.get(namespace, 0)}-{window}"
+
+    def invalidate(self, namespace):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self.invalidations += 1
+            self.backend.invalidate(namespace)
+
+    def clear(self):
+        self.backend.clear()
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"enabled": self.enabled, "hits": self.hits, "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0, "invalidations": self.invalidations,
+                "not_modified": self.not_modified, **self.backend.stats()}
+
+
+response_cache = ResponseCache(MemoryBackend())
+
+if METRICS_ENABLED:
+    metrics.registry.collectors.append(metrics.cache_collector(response_cache))
@@ -0,0 +1,118 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from psycopg2.extras import Json, execute_values
+
+# (resolução, tabela, largura do balde) da mais fina para a mais grossa; "raw" é a
+# própria traffic_logs, com uma linha por cliente a cada flush do reporter
+ROLLUPS = [
+    ("minute", "traffic_logs_1m", timedelta(minutes=1)),
+    ("hour", "traffic_logs_1h", timedelta(hours=1)),
+    ("day", "traffic_logs_1d", timedelta(days=1)),
+]
+RESOLUTIONS = ["raw"] + [name for name, _table, _width in ROLLUPS]
+
+UPSERT_SQL = """
+    INSERT INTO {table} AS t (bucket, server_ip, client_ip, inbound, outbound, protocols, samples, sampling_rate)
+    VALUES %s
+    ON CONFLICT (bucket, server_ip, client_ip) DO UPDATE SET
+        inbound = t.inbound + EXCLUDED.inbound,
+        outbound = t.outbound + EXCLUDED.outbound,
+        protocols = jsonb_sum(t.protocols, EXCLUDED.protocols),
+        samples = t.samples + EXCLUDED.samples,
+        sampling_rate = GREATEST(t.sampling_rate, EXCLUDED.sampling_rate)
+"""
+
+
+# Recalcula os baldes de um rollup a partir das linhas brutas de `source` (ex.: uma partição)
+REBUILD_SQL = """
+    INSERT INTO {table} (bucket, server_ip, client_ip, inbound, outbound, protocols, samples, sampling_rate)
+    SELECT t.bucket, t.server_ip, t.client_ip, t.inbound, t.outbound,
+           COALESCE(p.protocols, '{{}}'::jsonb), t.samples, t.sampling_rate
+    FROM (
+        SELECT date_trunc('{unit}', created_at) AS bucket, COALESCE(server_ip, '') AS server_ip, client_ip,
+               SUM(inbound) AS inbound, SUM(outbound) AS outbound, COUNT(*) AS samples,
+               MAX(sampling_rate) AS sampling_rate
+        FROM {source} GROUP BY 1, 2, 3
+    ) AS t
+    LEFT JOIN (
+        SELECT bucket, server_ip, client_ip, jsonb_object_agg(key, total) AS protocols
+        FROM (
+            SELECT date_trunc('{unit}', created_at) AS bucket, COALESCE(server_ip, '') AS server_ip,
+                   client_ip, p.name AS key, SUM(u.size) AS total
+            FROM {source} CROSS JOIN LATERAL unnest(proto_ids, proto_bytes) AS u(id, size)
+            JOIN protocols AS p ON p.id = u.id
+            GROUP BY 1, 2, 3, 4
+        ) AS items
+        GROUP BY 1, 2, 3
+    ) AS p USING (bucket, server_ip, client_ip)
+"""
+
+
+def bucket_start(moment, width):
+    """
+    Início do balde de `width` que contém `moment` (mesmo corte do date_trunc).
+    """
+    seconds = int(width.total_seconds())
+    epoch = datetime(1970, 1, 1)
+    return epoch + timedelta(seconds=int((moment - epoch).total_seconds()) // seconds * seconds)
+
+
+def rollup_rows(logs, width):
+    """
+    Soma os logs por (balde, IP monitorado, cliente), juntando os mapas de protocolos.
+    Um upsert não pode tocar a mesma linha duas vezes, então cada chave sai uma vez só.
+    """
+    totals = {}
+    for log in logs:
+        key = (bucket_start(log.created_at, width), log.server_ip or "", log.client_ip)
+        entry = totals.get(key)
+        if entry is None:
+            entry = totals[key] = {"inbound": 0, "outbound": 0, "protocols": defaultdict(int),
+                                   "samples": 0, "sampling_rate": 1.0}
+        entry["inbound"] += log.inbound
+        entry["outbound"] += log.outbound
+        for protocol, size in log.protocols.items():
+            entry["protocols"][protocol] += size
+        entry["samples"] += 1
+        entry["sampling_rate"] = max(entry["sampling_rate"], log.sampling_rate)
+    return [(bucket, server_ip, client_ip, e["inbound"], e["outbound"], Json(dict(e["protocols"])),
+             e["samples"], e["sampling_rate"])
+            for (bucket, server_ip, client_ip), e in totals.items()]
+
+
+def save_rollups(cursor, logs):
+    """
+    Atualiza traffic_logs_1m/_1h/_1d com os logs de um flush (na mesma transação
+    da gravação em traffic_logs). Os logs precisam de created_at.
+    """
+    if not logs:
+        return
+    for _name, table, width in ROLLUPS:
+        rows = rollup_rows(logs, width)
+        execute_values(cursor, UPSERT_SQL.format(table=table), rows, page_size=len(rows))
+
+
+def rebuild_rollups(cursor, source, lower, upper):
+    """
+    Refaz os baldes em [lower, upper) de todos os rollups a partir de `source`, que
+    precisa conter todas as linhas brutas desse intervalo (lower None = sem limite).
+    """
+    for name, table, _width in ROLLUPS:
+        if lower is None:
+            cursor.execute(f"DELETE FROM {table} WHERE bucket < %s", (upper,))
+        else:
+            cursor.execute(f"DELETE FROM {table} WHERE bucket >= %s AND bucket < %s", (lower, upper))
+        cursor.execute(REBUILD_SQL.format(table=table, unit=name, source=source))
+
+
+def choose_source(resolution):
+    """
+    Tabela (e largura do balde) de onde ler a resolução pedida: o rollup mais
+    grosso cujo balde não passa dela.
+    """
+    if resolution == "raw":
+        return "traffic_logs", None
+    for name, table, width in ROLLUPS:
+        if name == resolution:
+            return table, width
+    raise ValueError(f"Resolução inválida: {resolution}")
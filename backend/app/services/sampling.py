@@ -0,0 +1,42 @@
+from app.config import SAMPLING_MAX_RATE, SAMPLING_LAG_THRESHOLD, SAMPLING_INTERVAL
+
+
+class AdaptiveSampler:
+    """
+    Controla a taxa de amostragem 1-em-N de um worker de captura a partir de
+    sinais de sobrecarga: atraso entre a chegada do pacote e o processamento
+    (lag) e pacotes descartados pelo kernel por falta de espaço no socket.
+
+    A cada `interval` segundos a taxa dobra se houve sobrecarga (até `max_rate`)
+    e cai pela metade quando o atraso fica bem abaixo do limite, de modo que os
+    contadores só são estimados enquanto o worker não dá conta do tráfego.
+    """
+    def __init__(self, max_rate=SAMPLING_MAX_RATE, lag_threshold=SAMPLING_LAG_THRESHOLD,
+                 interval=SAMPLING_INTERVAL):
+        self.max_rate = max(1, max_rate)
+        self.lag_threshold = lag_threshold
+        self.interval = interval
+        self.rate = 1
+        self._lag = 0.0
+        self._drops = 0
+        self._next_adjust = 0.0
+
+    def observe(self, lag=0.0, drops=0):
+        if lag > self._lag:
+            self._lag = lag
+        self._drops += drops
+
+    def adjust(self, now):
+        """
+        Reavalia a taxa (no máximo uma vez por intervalo) e retorna a taxa atual.
+        """
+        if now < self._next_adjust:
+            return self.rate
+        self._next_adjust = now + self.interval
+        if self._drops or self._lag > self.lag_threshold:
+            self.rate = min(self.rate * 2, self.max_rate)
+        elif self._lag < self.lag_threshold / 4:
+            self.rate = max(self.rate // 2, 1)
+        self._lag = 0.0
+        self._drops = 0
+        return self.rate
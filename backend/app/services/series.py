@@ -0,0 +1,102 @@
+import re
+from datetime import timedelta
+from app.services.rollup import ROLLUPS, bucket_start
+
+GROUPS = ("none", "ip", "protocol")
+# Pontos por série: limita período / bucket (ex.: uma semana em baldes de 10s não passa)
+MAX_SERIES_POINTS = 5000
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_ORIGIN = "TIMESTAMP '1970-01-01'"
+
+
+def parse_bucket(value):
+    """
+    "10s", "1m", "1h", "1d" (ou segundos) -> timedelta. ValueError se inválido.
+    """
+    match = re.fullmatch(r"(\d+)([smhd]?)", value or "")
+    if not match or int(match.group(1)) < 1:
+        raise ValueError("Bucket inválido")
+    return timedelta(seconds=int(match.group(1)) * _UNITS[match.group(2) or "s"])
+
+
+def choose_series_source(width):
+    """
+    Rollup mais grosso cujo balde divide `width` (os baldes pedidos são somas
+    exatas dos dele); "raw" se nenhum servir.
+    """
+    name, table = "raw", "traffic_logs"
+    for rollup, rollup_table, rollup_width in ROLLUPS:
+        if rollup_width <= width and width % rollup_width == timedelta(0):
+            name, table = rollup, rollup_table
+    return name, table
+
+
+def series_query(table, group_by, start, end, width, ip=None, top=10):
+    """
+    SQL (e parâmetros) que soma `table` em baldes de `width` entre [start, end),
+    agrupando por cliente, por protocolo ou em uma única série. Com agrupamento,
+    só entram as `top` chaves com mais bytes no período. Cada linha: (chave,
+    início do balde, valores...).
+    """
+    raw = table == "traffic_logs"
+    time = "t.created_at" if raw else "t.bucket"
+    source = f"{table} AS t"
+    if group_by == "protocol":
+        if raw:
+            source += (" CROSS JOIN LATERAL unnest(t.proto_ids, t.proto_bytes) AS u(id, size)"
+                       " JOIN protocols AS p ON p.id = u.id")
+            key, total = "p.name", "u.size"
+        else:
+            source += " CROSS JOIN LATERAL jsonb_each_text(t.protocols) AS u(name, size)"
+            key, total = "u.name", "u.size::numeric"
+        values = [f"SUM({total})::bigint"]
+    else:
+        key = "t.client_ip" if group_by == "ip" else "NULL"
+        total = "t.inbound + t.outbound"
+        values = ["SUM(t.inbound)::bigint", "SUM(t.outbound)::bigint"]
+
+    where = f"{time} >= %s AND {time} < %s"
+    filters = [start, end]
+    if ip:
+        where += " AND t.client_ip = %s"
+        filters.append(ip)
+
+    select = (f"SELECT {key}, date_bin(%s, {time}, {_ORIGIN}), {', '.join(values)} "
+              f"FROM {source} WHERE {where}")
+    if group_by == "none":
+        return select + " GROUP BY 2 ORDER BY 2", [width] + filters
+    return (
+        f"WITH top AS (SELECT {key} AS top_key FROM {source} WHERE {where} "
+        f"GROUP BY 1 ORDER BY SUM({total}) DESC, 1 LIMIT %s) "
+        f"{select} AND {key} IN (SELECT top_key FROM top) GROUP BY 1, 2 ORDER BY 1, 2",
+        filters + [top, width] + filters,
+    )
+
+
+def series_points(start, end, width):
+    """
+    Quantidade de baldes de `width` de start (já alinhado) até end.
+    """
+    return int((bucket_start(end, width) - start) / width) + 1
+
+
+def build_series(rows, start, width, points, fields):
+    """
+    Monta as séries densas (zeros nos baldes sem dados) a partir das linhas de
+    series_query, da chave com mais bytes para a com menos.
+    """
+    series = {}
+    for key, bucket, *values in rows:
+        entry = series.get(key)
+        if entry is None:
+            entry = series[key] = {"key": key, **{field: [0] * points for field in fields}}
+        index = int((bucket - start) / width)
+        if 0 <= index < points:
+            for field, value in zip(fields, values):
+                entry[field][index] = value
+    return sorted(series.values(), key=lambda s: -sum(sum(s[field]) for field in fields))
+
+
+def series_timestamps(start, width, points):
+    return [(start + i * width).isoformat() for i in range(points)]
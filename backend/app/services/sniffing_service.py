@@ -1,11 +1,58 @@
-from scapy.all import sniff, IP, TCP, UDP, ICMP, ARP, Ether, IPv6
-from threading import Lock
-from collections import defaultdict
-from app.config import SERVER_IP
+import os
+import socket
+import struct
+from threading import Thread
+from time import time, perf_counter, sleep
+import numpy as np
+from scapy.all import conf, sniff, IP, TCP, UDP, ICMP, ARP, Ether, IPv6
+from scapy.sessions import DefaultSession
+# SERVER_IP não é usado aqui (a captura segue MONITORED_ADDRESSES), mas continua
+# exportado: os testes montam pacotes para sniffing_service.SERVER_IP
+from app.config import SERVER_IP  # noqa: F401
+from app.config import (
+    MONITORED_ADDRESSES, CAPTURE_ENGINE, CAPTURE_INTERFACE, CAPTURE_FILTER,
+    CAPTURE_KERNEL_FILTER, CAPTURE_WORKERS, CAPTURE_WORKER_MODE, CAPTURE_BATCH_SIZE, CAPTURE_SAMPLING,
+    METRICS_ENABLED, METRICS_SAMPLE_EVERY, REALTIME_REFRESH_INTERVAL,
+)
+from app import metrics
+from app.green import run_blocking
+from app.services.aggregation import ShardPool, WORKER_TICK
+from app.services.packet_parser import parse_frame, parse_batch, PROTOCOL_NAME
+from app.services.packet_ring import PacketRing, SNAP_LEN
+from app.services.address_set import AddressSet
+from app.services.sampling import AdaptiveSampler
+from app.services.capture_filter import build_bpf_filter, read_interface_packets, BPF_MAX_ADDRESSES
+from app.services.flow_table import pack_flow_key
 
-# Estrutura para armazenar dados
-traffic_data = defaultdict(lambda: {"Entrada": 0, "Saída": 0, "protocolos": defaultdict(int)})
-data_lock = Lock()
+ETH_P_ALL = 0x0003
+RAW_BUFFER_SIZE = 65536
+SOL_PACKET = 263
+PACKET_FANOUT = 18
+PACKET_FANOUT_HASH = 0
+PACKET_FANOUT_FLAG_DEFRAG = 0x8000
+PACKET_STATISTICS = 6
+# Pacotes entre verificações de sobrecarga (além de a cada WORKER_TICK ocioso)
+SAMPLING_CHECK_EVERY = 1024
+
+# Workers de captura; cada um agrega o tráfego no próprio shard (sem lock global).
+# Os contadores de pacotes (vistos após o filtro do kernel x que envolvem um
+# endereço monitorado) também ficam nos shards.
+capture_pool = ShardPool()
+if METRICS_ENABLED:
+    metrics.registry.collectors.append(metrics.capture_collector(capture_pool))
+capture_info = {"engine": CAPTURE_ENGINE, "filter": None, "kernel_filter": False, "interface_baseline": None}
+
+# Endereços/prefixos monitorados, consultados direto com os bytes do cabeçalho
+monitored_addresses = AddressSet(MONITORED_ADDRESSES)
+
+def _pack_ip(ip):
+    return socket.inet_pton(socket.AF_INET6 if ":" in ip else socket.AF_INET, ip)
+
+def _unpack_ip(packed):
+    return socket.inet_ntoa(packed) if len(packed) == 4 else socket.inet_ntop(socket.AF_INET6, packed)
+
+# Faixa de códigos de protocolo de parse_batch (0-255 + nomes)
+_PROTOCOL_CODES = max(PROTOCOL_NAME) + 1
 
 def get_protocol(packet):
     """
@@ -36,17 +83,389 @@ def get_protocol(packet):
             return f"ETH_TYPE_{hex(eth_type)}"
     return "OUTRO"
 
-def process_packet(packet):
-    ip_src = getattr(packet.getlayer(IP), 'src', None)
-    ip_dst = getattr(packet.getlayer(IP), 'dst', None)
-    if ip_src == SERVER_IP or ip_dst == SERVER_IP:
-        direction = "Entrada" if ip_dst == SERVER_IP else "Saída"
-        client_ip = ip_src if ip_dst == SERVER_IP else ip_dst
-        protocol = get_protocol(packet)
-        packet_size = len(packet)
-        with data_lock:
-            traffic_data[client_ip][direction] += packet_size
-            traffic_data[client_ip]["protocolos"][protocol] += packet_size
+def process_packet(packet, shard, ts=None):
+    shard.packets_seen += 1
+    rate = shard.sample()
+    if not rate:
+        return
+    _account_packet(packet, shard, rate, ts)
+
+def _account_packet(packet, shard, rate, ts=None):
+    """
+    Contabiliza um pacote do scapy já amostrado, com os tamanhos multiplicados por `rate`.
+    """
+    shard.packets_sampled += 1
+    ip_layer = packet.getlayer(IP) or packet.getlayer(IPv6)
+    if ip_layer is None:
+        return
+    packed_src, packed_dst = _pack_ip(ip_layer.src), _pack_ip(ip_layer.dst)
+    if packed_dst in monitored_addresses:
+        direction, server_ip, client_ip = "Entrada", ip_layer.dst, ip_layer.src
+    elif packed_src in monitored_addresses:
+        direction, server_ip, client_ip = "Saída", ip_layer.src, ip_layer.dst
+    else:
+        return
+    protocol = get_protocol(packet)
+    packet_size = len(packet) * rate
+    shard.packets_matched += 1
+    shard.add(server_ip, client_ip, direction, protocol, packet_size)
+    if shard.flows is not None:
+        l4 = ip_layer.payload
+        sport, dport = (l4.sport, l4.dport) if isinstance(l4, (TCP, UDP)) else (0, 0)
+        proto = ip_layer.proto if isinstance(ip_layer, IP) else ip_layer.nh
+        key = pack_flow_key(packed_src, packed_dst, sport, dport, proto)
+        now = ts or time()
+        shard.flows.add(key, packet_size, rate, now, now)
+
+def process_frame(frame, shard, ts=None, size=None):
+    """
+    Equivalente a process_packet para quadros crus (motor "raw"): os cabeçalhos
+    são lidos direto dos bytes e os IPs só são convertidos em texto quando o
+    pacote envolve um endereço monitorado. `size` substitui len(frame) quando o
+    quadro chega truncado (ex.: só os cabeçalhos guardados no PacketRing).
+    """
+    shard.packets_seen += 1
+    rate = shard.sample()
+    if not rate:
+        return
+    shard.packets_sampled += 1
+    _account_frame(frame, shard, rate, ts, size)
+
+def _account_frame(frame, shard, rate, ts=None, size=None):
+    """
+    Contabiliza um quadro já amostrado, com os tamanhos multiplicados por `rate`.
+    """
+    parsed = parse_frame(frame)
+    if parsed is None:
+        return
+    ip_src, ip_dst, protocol, proto, sport, dport = parsed
+    contains = monitored_addresses.contains
+    if contains(ip_dst):
+        direction, server_ip, client_ip = "Entrada", ip_dst, ip_src
+    elif contains(ip_src):
+        direction, server_ip, client_ip = "Saída", ip_src, ip_dst
+    else:
+        return
+    packet_size = (len(frame) if size is None else size) * rate
+    shard.packets_matched += 1
+    shard.add(_unpack_ip(server_ip), _unpack_ip(client_ip), direction, protocol, packet_size)
+    if shard.flows is not None:
+        now = ts or time()
+        shard.flows.add(pack_flow_key(ip_src, ip_dst, sport, dport, proto), packet_size, rate, now, now)
+
+def _int_to_ip(value):
+    return socket.inet_ntoa(int(value).to_bytes(4, "big"))
+
+def _account_batch(shard, server, client, inbound, code, sizes):
+    """
+    Reduz os pacotes casados de um lote a um total por (servidor, cliente),
+    direção e protocolo (np.unique + bincount) e soma o resultado no shard.
+    """
+    keys = (server.astype(np.uint64) << np.uint64(32)) | client
+    pairs_ip, index = np.unique(keys, return_inverse=True)
+    entrada = np.bincount(index, weights=np.where(inbound, sizes, 0), minlength=len(pairs_ip))
+    saida = np.bincount(index, weights=np.where(inbound, 0, sizes), minlength=len(pairs_ip))
+    pairs, pair_sizes = np.unique(index * _PROTOCOL_CODES + code, return_inverse=True)
+    pair_totals = np.bincount(pair_sizes, weights=sizes)
+
+    table = {}
+    for i, value in enumerate(pairs_ip.tolist()):
+        table[(_int_to_ip(value >> 32), _int_to_ip(value & 0xFFFFFFFF))] = {
+            "Entrada": int(entrada[i]), "Saída": int(saida[i]), "protocolos": {}}
+    names = list(table)
+    for pair, total in zip(pairs.tolist(), pair_totals.tolist()):
+        table[names[pair // _PROTOCOL_CODES]]["protocolos"][PROTOCOL_NAME[pair % _PROTOCOL_CODES]] = int(total)
+    shard.merge(table)
+
+def _account_flows(flows, src, dst, sport, dport, proto, sizes, timestamps, rate=1):
+    """
+    Agrupa os pacotes do lote por 5-tupla e atualiza a FlowTable uma vez por fluxo.
+    """
+    addresses = (src.astype(np.uint64) << 32) | dst
+    ports = (sport.astype(np.uint64) << 24) | (dport.astype(np.uint64) << 8) | proto.astype(np.uint64)
+    keys, index = np.unique(np.stack([addresses, ports], axis=1), axis=0, return_inverse=True)
+    index = index.reshape(-1)
+    totals = np.bincount(index, weights=sizes, minlength=len(keys))
+    packets = np.bincount(index, minlength=len(keys)) * rate
+    first = np.full(len(keys), np.inf)
+    last = np.full(len(keys), -np.inf)
+    np.minimum.at(first, index, timestamps)
+    np.maximum.at(last, index, timestamps)
+    # Ordem do último pacote, para a LRU da tabela seguir a ordem de chegada
+    for i in np.argsort(last, kind="stable").tolist():
+        address, port = keys[i].tolist()
+        key = pack_flow_key(int(address >> 32).to_bytes(4, "big"), int(address & 0xFFFFFFFF).to_bytes(4, "big"),
+                            port >> 24, (port >> 8) & 0xFFFF, port & 0xFF)
+        flows.add(key, int(totals[i]), int(packets[i]), float(first[i]), float(last[i]))
+
+def process_ring(ring, shard):
+    """
+    Contabilidade em lote dos quadros acumulados em `ring`, com o mesmo resultado
+    de chamar process_frame para cada um. Todos os quadros do buffer já são da
+    amostra (a taxa vigente é aplicada a eles). Esvazia o buffer ao final.
+    """
+    n = ring.count
+    if not n:
+        return
+    start = perf_counter()
+    rate = shard.sampling_rate
+    shard.packets_seen += n
+    shard.packets_sampled += n
+    lengths = ring.lengths[:n].astype(np.int64)
+    parsed = parse_batch(ring.frames[:n], lengths)
+    valid = parsed["valid"]
+    inbound = valid & monitored_addresses.contains_ipv4_array(parsed["dst"])
+    matched = inbound | (valid & monitored_addresses.contains_ipv4_array(parsed["src"]))
+
+    # Quadros IPv6 seguem pelo caminho por pacote (parse_batch só vetoriza IPv4)
+    ipv6_rows = np.nonzero(parsed["ipv6"])[0].tolist()
+    for row in ipv6_rows:
+        snapshot = ring.frames[row, :min(int(lengths[row]), SNAP_LEN)].tobytes()
+        _account_frame(snapshot, shard, rate, float(ring.timestamps[row]), int(lengths[row]))
+
+    count = int(np.count_nonzero(matched))
+    if count:
+        shard.packets_matched += count
+        src, dst = parsed["src"][matched], parsed["dst"][matched]
+        inbound = inbound[matched]
+        sizes = lengths[matched] * rate
+        _account_batch(shard, np.where(inbound, dst, src), np.where(inbound, src, dst), inbound,
+                       parsed["code"][matched], sizes)
+        if shard.flows is not None:
+            _account_flows(shard.flows, src, dst, parsed["sport"][matched], parsed["dport"][matched],
+                           parsed["proto"][matched], sizes, ring.timestamps[:n][matched], rate)
+    ring.clear()
+    if METRICS_ENABLED:
+        shard.observe_packet_time((perf_counter() - start) / n, n)
+
+def open_raw_socket(iface=None, bpf_filter=None, fanout_group=None):
+    """
+    Abre um socket AF_PACKET (Linux) que entrega os quadros sem dissecação.
+    Se houver filtro BPF, ele é compilado (libpcap) e anexado ao socket; sem
+    libpcap a captura segue sem filtro e o descarte acontece em Python.
+    Com fanout_group, o kernel distribui os fluxos entre os sockets do grupo.
+    """
+    if not hasattr(socket, "AF_PACKET"):
+        raise RuntimeError("O motor de captura 'raw' requer Linux (AF_PACKET)")
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+    if iface:
+        sock.bind((iface, 0))
+    if bpf_filter:
+        from scapy.arch.linux import attach_filter
+        try:
+            attach_filter(sock, bpf_filter, iface)
+        except (ImportError, OSError) as e:
+            capture_info["kernel_filter"] = False
+            print(f"Não foi possível anexar o filtro BPF, capturando sem filtro: {e}")
+    if fanout_group is not None:
+        fanout = fanout_group | ((PACKET_FANOUT_HASH | PACKET_FANOUT_FLAG_DEFRAG) << 16)
+        sock.setsockopt(SOL_PACKET, PACKET_FANOUT, fanout)
+    return sock
+
+def read_socket_drops(sock):
+    """
+    Pacotes descartados pelo kernel no socket AF_PACKET desde a última leitura
+    (PACKET_STATISTICS zera os contadores a cada consulta). 0 fora do Linux.
+    """
+    try:
+        _packets, drops = struct.unpack("II", sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, 8))
+    except (OSError, AttributeError):
+        return 0
+    return drops
+
+def _check_overload(shard, sampler, sock=None, before_change=None):
+    """
+    Soma os descartes do kernel no shard e, com amostragem adaptativa, ajusta a
+    taxa do worker. `before_change` roda antes de a taxa mudar (ex.: processar o
+    lote pendente com a taxa antiga).
+    """
+    drops = read_socket_drops(sock) if sock is not None else 0
+    shard.packets_dropped += drops
+    if sampler is None:
+        return
+    sampler.observe(drops=drops)
+    rate = sampler.adjust(time())
+    if rate != shard.sampling_rate:
+        if before_change is not None:
+            before_change()
+        shard.set_sampling_rate(rate)
+
+def raw_capture_loop(shard, iface=None, bpf_filter=None, fanout_group=None):
+    sock = open_raw_socket(iface, bpf_filter, fanout_group)
+    sock.settimeout(WORKER_TICK)
+    sampler = AdaptiveSampler() if CAPTURE_SAMPLING else None
+    if CAPTURE_BATCH_SIZE:
+        return _raw_batch_loop(sock, shard, CAPTURE_BATCH_SIZE, sampler)
+    buffer = bytearray(RAW_BUFFER_SIZE)
+    view = memoryview(buffer)
+    countdown = SAMPLING_CHECK_EVERY
+    metrics_countdown = METRICS_SAMPLE_EVERY if METRICS_ENABLED else 0
+    while True:
+        try:
+            size = sock.recv_into(buffer)
+        except socket.timeout:
+            shard.tick()
+            _check_overload(shard, sampler, sock)
+            continue
+        metrics_countdown -= 1
+        if not metrics_countdown:
+            metrics_countdown = METRICS_SAMPLE_EVERY
+            start = perf_counter()
+            process_frame(view[:size], shard)
+            shard.observe_packet_time(perf_counter() - start)
+        else:
+            process_frame(view[:size], shard)
+        countdown -= 1
+        if not countdown:
+            countdown = SAMPLING_CHECK_EVERY
+            _check_overload(shard, sampler, sock)
+
+def _raw_batch_loop(sock, shard, batch_size, sampler=None):
+    """
+    Caminho em lote do motor raw: cada quadro só é copiado (cabeçalhos) para o
+    buffer; a contabilidade roda quando ele enche ou quando o reporter pede os dados.
+    Com amostragem, os quadros fora da amostra nem chegam ao buffer.
+    """
+    ring = PacketRing(batch_size)
+    discard = bytearray(SNAP_LEN)
+    def flush():
+        process_ring(ring, shard)
+    shard.flush_hook = flush
+    countdown = shard.check_every
+    overload_countdown = SAMPLING_CHECK_EVERY
+    while True:
+        try:
+            if shard.sample():
+                ring.recv(sock)
+            else:
+                sock.recv_into(discard, SNAP_LEN)
+                shard.packets_seen += 1
+        except socket.timeout:
+            shard.tick()
+            _check_overload(shard, sampler, sock, flush)
+            continue
+        if ring.full:
+            process_ring(ring, shard)
+        countdown -= 1
+        if not countdown:
+            countdown = shard.check_every
+            shard.tick()
+        overload_countdown -= 1
+        if not overload_countdown:
+            overload_countdown = SAMPLING_CHECK_EVERY
+            _check_overload(shard, sampler, sock, flush)
+
+class SampledSession(DefaultSession):
+    """
+    Sessão do sniff() que amostra antes da dissecação: os pacotes fora da amostra
+    são só contados, sem virar objetos do scapy. `rate` é a taxa do último
+    pacote entregue.
+    """
+    def __init__(self, shard):
+        super().__init__()
+        self.shard = shard
+        self.rate = 1
+
+    def recv(self, sock):
+        cls, raw, ts = sock.recv_raw()
+        if not raw or not cls:
+            return
+        self.shard.packets_seen += 1
+        rate = self.shard.sample()
+        if not rate:
+            return
+        self.rate = rate
+        try:
+            packet = cls(raw)
+        except Exception:
+            packet = conf.raw_layer(raw)
+        if ts:
+            packet.time = ts
+        yield packet
+
+def scapy_capture_loop(shard, iface=None, bpf_filter=None):
+    # O socket fica aberto entre as fatias de sniff(), então nada se perde entre elas
+    sock = conf.L2listen(iface=iface, filter=bpf_filter)
+    sampler = AdaptiveSampler() if CAPTURE_SAMPLING else None
+    session = SampledSession(shard)
+    metrics_countdown = [METRICS_SAMPLE_EVERY if METRICS_ENABLED else 0]
+    def handle(packet):
+        if sampler is not None:
+            # packet.time vem do timestamp do kernel: a diferença é o atraso da fila
+            sampler.observe(lag=time() - float(packet.time))
+        metrics_countdown[0] -= 1
+        if not metrics_countdown[0]:
+            metrics_countdown[0] = METRICS_SAMPLE_EVERY
+            start = perf_counter()
+            _account_packet(packet, shard, session.rate)
+            shard.observe_packet_time(perf_counter() - start)
+        else:
+            _account_packet(packet, shard, session.rate)
+
+    while True:
+        sniff(opened_socket=sock, prn=handle, store=False, timeout=WORKER_TICK, session=session)
+        shard.tick()
+        _check_overload(shard, sampler, getattr(sock, "ins", None))
+
+def get_capture_filter():
+    if not CAPTURE_KERNEL_FILTER:
+        return CAPTURE_FILTER
+    addresses = monitored_addresses.expressions()
+    if len(addresses) > BPF_MAX_ADDRESSES:
+        # Um filtro com milhares de prefixos estoura o limite de instruções do BPF
+        print(f"{len(addresses)} prefixos monitorados (máximo {BPF_MAX_ADDRESSES} no filtro do kernel); "
+              "o descarte por endereço fica só em Python")
+        return CAPTURE_FILTER
+    return build_bpf_filter(addresses, CAPTURE_FILTER)
+
+def get_capture_stats():
+    """
+    Compara o que o filtro deixou passar com o total visto pela interface
+    desde o início da captura (o que o caminho antigo copiaria para o Python).
+    """
+    stats = capture_pool.counters()
+    stats.update(engine=capture_info["engine"], filter=capture_info["filter"],
+                 kernel_filter=capture_info["kernel_filter"], workers=len(capture_pool.workers),
+                 monitored=len(monitored_addresses),
+                 interface_packets=None, filtered_out=None)
+    baseline = capture_info["interface_baseline"]
+    current = read_interface_packets(CAPTURE_INTERFACE)
+    if baseline is not None and current is not None:
+        stats["interface_packets"] = current - baseline
+        stats["filtered_out"] = max(0, stats["interface_packets"] - stats["packets_seen"])
+    return stats
 
 def start_sniffing():
-    sniff(prn=process_packet, store=False)
+    """
+    Inicia os workers de captura, cada um agregando no próprio shard.
+    Com o motor "raw" e CAPTURE_WORKERS > 1, os sockets entram num grupo
+    PACKET_FANOUT e o kernel reparte os fluxos entre eles.
+    """
+    bpf_filter = get_capture_filter()
+    capture_info["filter"] = bpf_filter
+    capture_info["kernel_filter"] = bpf_filter is not None
+    capture_info["interface_baseline"] = read_interface_packets(CAPTURE_INTERFACE)
+    if CAPTURE_ENGINE == "raw":
+        fanout_group = (os.getpid() & 0xFFFF) if CAPTURE_WORKERS > 1 else None
+        args = [(CAPTURE_INTERFACE, bpf_filter, fanout_group)] * CAPTURE_WORKERS
+        capture_pool.start(raw_capture_loop, args, CAPTURE_WORKER_MODE)
+    else:
+        if CAPTURE_WORKERS > 1:
+            print("O motor 'scapy' não reparte pacotes entre workers; usando apenas 1")
+        capture_pool.start(scapy_capture_loop, [(CAPTURE_INTERFACE, bpf_filter)], CAPTURE_WORKER_MODE)
+    start_snapshot_thread()
+
+
+def start_snapshot_thread(interval=REALTIME_REFRESH_INTERVAL):
+    """
+    Atualiza o snapshot lido por /api/traffic; a espera pelos workers fica nesta thread.
+    """
+    def refresh():
+        while True:
+            try:
+                run_blocking(capture_pool.refresh_snapshot)
+            except Exception as e:
+                print("Erro ao atualizar o snapshot em tempo real:", e)
+            sleep(interval)
+
+    Thread(target=refresh, daemon=True).start()
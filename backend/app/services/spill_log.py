@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+
+SEGMENT_PREFIX = "spill-"
+SEGMENT_SUFFIX = ".jsonl"
+CURSOR_FILE = "cursor"
+DEAD_LETTER_FILE = "dead-letter.jsonl"
+
+
+class SpillLog:
+    """
+    Fila em disco, só de acréscimo, para os lotes que não puderam ir para o banco.
+    Cada lote é uma linha JSON num segmento (`spill-000001.jsonl`, ...); um segmento
+    novo começa quando o atual passa de `segment_bytes`. A releitura segue a ordem
+    de gravação e o ponto já gravado no banco fica em `cursor`, então reiniciar o
+    processo no meio da releitura não perde lotes (a entrega é "pelo menos uma
+    vez": uma queda entre o commit e a gravação do cursor relê aquele lote).
+
+    Lotes que nunca vão entrar (linha corrompida, dado rejeitado pelo banco) vão
+    para `dead-letter.jsonl` com o erro, e a releitura segue para os próximos.
+    """
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.dead_lettered = 0
+        self._lock = threading.Lock()
+
+    def _segments(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory)
+                      if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX))
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _read_cursor(self):
+        try:
+            with open(self._path(CURSOR_FILE)) as f:
+                name, offset = f.read().split()
+            return name, int(offset)
+        except (OSError, ValueError):
+            return None, 0
+
+    def _write_cursor(self, name, offset):
+        temp = self._path(CURSOR_FILE + ".tmp")
+        with open(temp, "w") as f:
+            f.write(f"{name} {offset}")
+        os.replace(temp, self._path(CURSOR_FILE))
+
+    def pending(self):
+        with self._lock:
+            return bool(self._segments())
+
+    def size(self):
+        """
+        Bytes ainda não relidos.
+        """
+        with self._lock:
+            segments = self._segments()
+            total = sum(os.path.getsize(self._path(name)) for name in segments)
+            name, offset = self._read_cursor()
+            return total - offset if name in segments else total
+
+    def _truncate_torn_line(self, path):
+        """
+        Corta uma linha incompleta no fim do segmento (queda no meio de uma
+        gravação), para o próximo lote não ser colado nela.
+        """
+        with open(path, "rb+") as f:
+            end = f.seek(0, os.SEEK_END)
+            if not end:
+                return
+            f.seek(end - 1)
+            if f.read(1) == b"\n":
+                return
+            position = end
+            while position > 0:
+                start = max(0, position - 65536)
+                f.seek(start)
+                chunk = f.read(position - start)
+                newline = chunk.rfind(b"\n")
+                if newline >= 0:
+                    position = start + newline + 1
+                    break
+                position = start
+            f.truncate(position)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def append(self, batch):
+        line = json.dumps(batch, separators=(",", ":")) + "\n"
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            segments = self._segments()
+            if segments and os.path.getsize(self._path(segments[-1])) < self.segment_bytes:
+                name = segments[-1]
+                self._truncate_torn_line(self._path(name))
+            else:
+                number = int(segments[-1][len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]) + 1 if segments else 1
+                name = f"{SEGMENT_PREFIX}{number:06d}{SEGMENT_SUFFIX}"
+            with open(self._path(name), "a") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def dead_letter(self, line, error):
+        """
+        Guarda um lote que não pôde ser gravado, com o erro, fora da releitura.
+        """
+        record = json.dumps({"error": f"{type(error).__name__}: {error}", "line": line.rstrip("\n")},
+                            separators=(",", ":")) + "\n"
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(DEAD_LETTER_FILE), "a") as f:
+                f.write(record)
+                f.flush()
+                os.fsync(f.fileno())
+            self.dead_lettered += 1
+
+    def replay(self, write, transient=(Exception,)):
+        """
+        Chama `write(lote)` para cada lote pendente, do mais antigo ao mais novo,
+        avançando o cursor após cada lote. Uma exceção de `transient` interrompe a
+        releitura (o lote fica para a próxima tentativa) e sobe para quem chamou;
+        qualquer outra, ou uma linha que não é JSON válido, manda o lote para a
+        dead-letter e a releitura continua.
+        """
+        while True:
+            with self._lock:
+                segments = self._segments()
+                if not segments:
+                    return
+                name = segments[0]
+                cursor_name, offset = self._read_cursor()
+                if cursor_name != name:
+                    offset = 0
+                with open(self._path(name)) as f:
+                    f.seek(offset)
+                    lines = f.readlines()
+                if not lines or not lines[-1].endswith("\n"):
+                    # Linha incompleta (gravação interrompida): fica de fora
+                    lines = [line for line in lines if line.endswith("\n")]
+                if not lines:
+                    # Segmento todo relido: o mais antigo é apagado
+                    os.remove(self._path(name))
+                    if cursor_name is not None:
+                        os.remove(self._path(CURSOR_FILE))
+                    continue
+
+            for line in lines:
+                try:
+                    batch = json.loads(line)
+                except ValueError as e:
+                    self.dead_letter(line, e)
+                else:
+                    try:
+                        write(batch)
+                    except transient:
+                        raise
+                    except Exception as e:
+                        self.dead_letter(line, e)
+                offset += len(line.encode())
+                with self._lock:
+                    self._write_cursor(name, offset)
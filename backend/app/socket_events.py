@@ -0,0 +1,43 @@
+from flask import request
+from flask_socketio import join_room, leave_room
+from app import socketio
+from app.services.live_updates import live_updates, FULL_ROOM
+
+# Eco com ack: o teste de carga (benchmarks/load_test.py) mede a ida e volta pelo websocket
+@socketio.on('latency_probe')
+def latency_probe(data):
+    return data
+
+# Sem assinatura o cliente recebe o traffic_update completo, como antes
+@socketio.on('connect')
+def connect(auth=None):
+    join_room(FULL_ROOM)
+
+@socketio.on('disconnect')
+def disconnect(*args):
+    live_updates.unsubscribe(request.sid)
+
+# {"rooms": ["ip:10.0.0.2", "top:10"], "binary": false}; rooms vazio volta ao traffic_update completo.
+# O ack traz o snapshot das salas; depois chegam traffic_delta/traffic_snapshot, que o cliente confirma pelo ack
+@socketio.on('traffic_subscribe')
+def traffic_subscribe(data=None):
+    data = data or {}
+    rooms = data.get("rooms") or []
+    if not rooms:
+        live_updates.unsubscribe(request.sid)
+        join_room(FULL_ROOM)
+        return {"rooms": {}}
+    try:
+        snapshot = live_updates.subscribe(request.sid, rooms, data.get("binary", False))
+    except ValueError as e:
+        return {"error": str(e)}
+    leave_room(FULL_ROOM)
+    return snapshot
+
+# Snapshot das salas assinadas, pedido pelo cliente ao encontrar um buraco na sequência
+@socketio.on('traffic_snapshot')
+def traffic_snapshot(*args):
+    snapshot = live_updates.snapshot(request.sid)
+    if snapshot is None:
+        return {"error": "Nenhuma sala assinada"}
+    return snapshot
@@ -0,0 +1,72 @@
+"""
+Benchmark: contabilidade por pacote x em lote (buffer de cabeçalhos + NumPy).
+
+Mede pacotes/s de process_frame (um dict atualizado por pacote) contra o caminho
+do motor raw com CAPTURE_BATCH_SIZE: cópia do quadro para o PacketRing e
+process_ring quando o buffer enche. Confere que os dois chegam aos mesmos totais.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_accounting --packets 400000 --batch 65536 --clients 2000
+"""
+import argparse
+import os
+import struct
+import time
+
+os.environ.setdefault("SERVER_IP", "10.0.0.1")
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/benchmark")
+
+from app.services import sniffing_service  # noqa: E402
+from app.services.aggregation import TrafficShard, freeze_traffic  # noqa: E402
+from app.services.packet_ring import PacketRing  # noqa: E402
+from benchmarks.bench_capture_workers import synthetic_frame  # noqa: E402
+
+
+def build_frames(packets, clients):
+    return [
+        synthetic_frame(struct.pack("!I", 0x0A640000 + i % clients), i % 3 != 0, 64 + (i % 1400))
+        for i in range(packets)
+    ]
+
+
+def run_per_packet(frames, flows):
+    shard = TrafficShard(track_flows=flows)
+    start = time.perf_counter()
+    for frame in frames:
+        sniffing_service.process_frame(frame, shard, 1.0)
+    return time.perf_counter() - start, shard
+
+
+def run_batched(frames, batch, flows):
+    shard = TrafficShard(track_flows=flows)
+    ring = PacketRing(batch)
+    start = time.perf_counter()
+    for frame in frames:
+        ring.append(frame, 1.0)
+        if ring.full:
+            sniffing_service.process_ring(ring, shard)
+    sniffing_service.process_ring(ring, shard)
+    return time.perf_counter() - start, shard
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--packets", type=int, default=200000)
+    parser.add_argument("--batch", type=int, default=65536)
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--flows", action="store_true", help="inclui a tabela de fluxos")
+    args = parser.parse_args()
+
+    frames = build_frames(args.packets, args.clients)
+    single_elapsed, single = run_per_packet(frames, args.flows)
+    batch_elapsed, batched = run_batched(frames, args.batch, args.flows)
+    assert freeze_traffic(single.data) == freeze_traffic(batched.data), "totais divergentes"
+
+    print(f"{args.packets} pacotes, {args.clients} clientes, lote de {args.batch}, fluxos={args.flows}")
+    print(f"{'por pacote (pps)':>18} {'em lote (pps)':>14} {'speedup':>8}")
+    print(f"{args.packets / single_elapsed:>18,.0f} {args.packets / batch_elapsed:>14,.0f} "
+          f"{single_elapsed / batch_elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: custo da consulta de endereços monitorados conforme o número de prefixos.
+
+Para 1 a 10k prefixos IPv4 aleatórios mede ns por consulta do AddressSet (por
+pacote e em lote, com NumPy) e, como referência, da busca linear com o módulo
+ipaddress. O custo do AddressSet depende só dos tamanhos de prefixo distintos.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_address_lookup --sizes 1 10 100 1000 10000 --lengths 24 32
+"""
+import argparse
+import ipaddress
+import os
+import random
+import time
+import numpy as np
+
+os.environ.setdefault("SERVER_IP", "10.0.0.1")
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/benchmark")
+
+from app.services.address_set import AddressSet  # noqa: E402
+
+
+def random_prefixes(count, lengths, rng):
+    prefixes = []
+    for _ in range(count):
+        length = rng.choice(lengths)
+        address = ipaddress.IPv4Address(rng.getrandbits(32))
+        prefixes.append(str(ipaddress.ip_network(f"{address}/{length}", strict=False)))
+    return prefixes
+
+
+def time_per_lookup(function, values, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(values)
+        best = min(best, time.perf_counter() - start)
+    return best / len(values) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[24, 32],
+                        help="tamanhos de prefixo sorteados")
+    parser.add_argument("--lookups", type=int, default=200000)
+    parser.add_argument("--linear-max", type=int, default=1000,
+                        help="maior quantidade de prefixos medida na busca linear")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    values = np.array([rng.getrandbits(32) for _ in range(args.lookups)], dtype=np.uint32)
+    packed = [int(v).to_bytes(4, "big") for v in values.tolist()]
+
+    print(f"{args.lookups} consultas, prefixos /{' /'.join(map(str, args.lengths))}")
+    print(f"{'prefixos':>9} {'por pacote (ns)':>16} {'em lote (ns)':>13} {'linear (ns)':>12}")
+    for size in args.sizes:
+        prefixes = random_prefixes(size, args.lengths, rng)
+        addresses = AddressSet(prefixes)
+        contains = addresses.contains
+        # Metade das consultas cai dentro de algum prefixo monitorado
+        sample = packed[:]
+        for i in range(0, len(sample), 2):
+            sample[i] = addresses.networks[i % len(addresses)].network_address.packed
+
+        scalar = time_per_lookup(lambda items: [contains(p) for p in items], sample)
+        batch = time_per_lookup(addresses.contains_ipv4_array, values)
+        linear = "-"
+        if size <= args.linear_max:
+            networks = [ipaddress.ip_network(p) for p in prefixes]
+            subset = [ipaddress.IPv4Address(p) for p in sample[:2000]]
+            linear = f"{time_per_lookup(lambda items: [any(a in n for n in networks) for a in items], subset, 1):,.0f}"
+        print(f"{size:>9} {scalar:>16,.0f} {batch:>13,.1f} {linear:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark: detecção de anomalia de muitos clientes, um por vez x em lote.
+
+Mede só a conta (sem banco): o algoritmo antigo de /api/prediction/run com
+statistics.mean/stdev, cliente a cliente, contra score_samples, que avalia todos
+numa passada NumPy sobre as amostras concatenadas (o formato de fetch_samples).
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_anomaly --clients 5000 --samples 100
+"""
+import argparse
+import os
+import statistics
+import time
+import numpy as np
+
+os.environ.setdefault("SERVER_IP", "10.0.0.1")
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/benchmark")
+
+from app.services.anomaly import score_samples  # noqa: E402
+
+
+def per_client(history):
+    results = []
+    for client_ip, values in history.items():
+        mean, std = statistics.mean(values), statistics.stdev(values)
+        score = 1 / (1 + np.exp(-(values[0] - mean) / std)) if std > 0 else 0.0
+        results.append((client_ip, values[0] > mean + 3 * std, float(score)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--samples", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    history = {f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}": rng.integers(0, 10 ** 7, args.samples).tolist()
+               for i in range(args.clients)}
+
+    start = time.perf_counter()
+    per_client(history)
+    old = time.perf_counter() - start
+
+    start = time.perf_counter()
+    clients = list(history)
+    counts = np.full(len(clients), args.samples)
+    values = np.concatenate([history[ip] for ip in clients]).astype(np.float64)
+    score_samples(clients, counts, values)
+    batch = time.perf_counter() - start
+
+    print(f"{args.clients} clientes x {args.samples} amostras")
+    print(f"um por vez (statistics) {old * 1000:10.1f} ms")
+    print(f"lote (NumPy)            {batch * 1000:10.1f} ms  ({old / batch:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
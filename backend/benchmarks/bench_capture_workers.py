@@ -0,0 +1,123 @@
+"""
+Benchmark: vazão do caminho de captura conforme o número de workers.
+
+Gera quadros sintéticos, reparte os fluxos entre N workers (como o PACKET_FANOUT
+faria) e mede pacotes/s até todos os shards serem coletados pelo reporter.
+Para comparação, mede também o caminho antigo (dict global + threading.Lock).
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_capture_workers --packets 400000 --workers 1 2 4
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import struct
+import threading
+import time
+from collections import defaultdict
+
+os.environ.setdefault("SERVER_IP", "10.0.0.1")
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/benchmark")
+
+from app.services import sniffing_service  # noqa: E402
+from app.services.aggregation import ShardPool  # noqa: E402
+from app.services.packet_parser import parse_frame  # noqa: E402
+
+ETH_HEADER = b"\x00" * 12 + b"\x08\x00"
+SERVER = socket.inet_aton(os.environ["SERVER_IP"])
+
+
+def synthetic_frame(client, inbound, size):
+    server = SERVER
+    src, dst = (client, server) if inbound else (server, client)
+    ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, size - 14, 0, 0, 64, 6, 0, src, dst)
+    tcp = struct.pack("!HHIIBBHHH", 40000, 443, 0, 0, 0x50, 0x10, 1024, 0, 0)
+    return ETH_HEADER + ip + tcp + b"x" * (size - 54)
+
+
+def build_partitions(packets, workers, clients=2000):
+    partitions = [[] for _ in range(workers)]
+    for i in range(packets):
+        client_id = i % clients
+        client = struct.pack("!I", 0x0A640000 + client_id)
+        frame = synthetic_frame(client, i % 3 != 0, 64 + (i % 1400))
+        partitions[client_id % workers].append(frame)
+    return partitions
+
+
+def _replay(shard, frames, go, done):
+    go.wait()
+    for frame in frames:
+        sniffing_service.process_frame(frame, shard)
+    done.set()
+    while True:
+        time.sleep(0.01)
+        shard.tick()
+
+
+def run_sharded(partitions, mode):
+    pool = ShardPool()
+    event_factory = multiprocessing.Event if mode == "process" else threading.Event
+    events = [event_factory() for _ in partitions]
+    go = event_factory()
+    pool.start(_replay, [(frames, go, done) for frames, done in zip(partitions, events)], mode)
+    time.sleep(0.5)  # deixa os workers subirem antes de medir
+    start = time.perf_counter()
+    go.set()
+    for event in events:
+        event.wait()
+    report, _flows = pool.collect(timeout=5)
+    elapsed = time.perf_counter() - start
+    if mode == "process":
+        for worker in pool.workers:
+            worker.runner.terminate()
+    return elapsed, report
+
+
+def run_global_lock(partitions):
+    traffic_data = defaultdict(lambda: {"Entrada": 0, "Saída": 0, "protocolos": defaultdict(int)})
+    data_lock = threading.Lock()
+    server = SERVER
+
+    def worker(frames):
+        for frame in frames:
+            ip_src, ip_dst, protocol = parse_frame(frame)[:3]
+            direction = "Entrada" if ip_dst == server else "Saída"
+            client = socket.inet_ntoa(ip_src if ip_dst == server else ip_dst)
+            with data_lock:
+                traffic_data[client][direction] += len(frame)
+                traffic_data[client]["protocolos"][protocol] += len(frame)
+
+    threads = [threading.Thread(target=worker, args=(frames,)) for frames in partitions]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--packets", type=int, default=200000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--mode", choices=("process", "thread"), default="process")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.packets} pacotes, workers em {args.mode}")
+    print(f"{'workers':>8} {'lock global (pps)':>18} {'shards (pps)':>14} {'speedup':>8}")
+    base = None
+    for workers in args.workers:
+        partitions = build_partitions(args.packets, workers)
+        lock_elapsed = run_global_lock(partitions)
+        elapsed, report = run_sharded(partitions, args.mode)
+        total = sum(d["Entrada"] + d["Saída"] for d in report.values())
+        assert total == sum(len(f) for p in partitions for f in p), "bytes perdidos na coleta"
+        pps = args.packets / elapsed
+        base = base or pps
+        print(f"{workers:>8} {args.packets / lock_elapsed:>18,.0f} {pps:>14,.0f} {pps / base:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
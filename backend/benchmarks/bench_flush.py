@@ -0,0 +1,70 @@
+"""
+Benchmark: gravação do flush do reporter em traffic_logs, linha a linha x em lote.
+
+Contra um Postgres local (DATABASE_URL, com as migrações aplicadas) mede linhas/s
+de TrafficLog.save (um INSERT por cliente, o caminho antigo) e de
+TrafficLog.save_many com INSERT de várias linhas e com COPY FROM STDIN. Cada
+rodada grava numa transação que é desfeita no final, então a tabela não muda.
+
+Uso (a partir de backend/):
+    DATABASE_URL=postgresql://localhost/traffic DB_SSLMODE=disable python -m benchmarks.bench_flush --rows 1000 10000
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("SERVER_IP", "10.0.0.1")
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/benchmark")
+os.environ.setdefault("DB_SSLMODE", "disable")
+
+from app.db import connect  # noqa: E402
+from app.models.traffic_model import TrafficLog  # noqa: E402
+
+
+def build_logs(rows):
+    return [
+        TrafficLog(f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", 1000 + i, 500 + i,
+                   {"TCP": 1200 + i, "UDP": 300}, os.environ["SERVER_IP"])
+        for i in range(rows)
+    ]
+
+
+def save_per_row(cursor, logs):
+    for log in logs:
+        log.save(cursor, log)
+
+
+def run(conn, function, logs, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        with conn.cursor() as cursor:
+            start = time.perf_counter()
+            function(cursor, logs)
+            elapsed = time.perf_counter() - start
+        conn.rollback()
+        best = min(best, elapsed)
+    return len(logs) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    conn = connect()
+    paths = [
+        ("por linha", save_per_row),
+        ("values", lambda cursor, logs: TrafficLog.save_many(cursor, logs, "values")),
+        ("copy", lambda cursor, logs: TrafficLog.save_many(cursor, logs, "copy")),
+    ]
+    print(f"{'linhas':>7} " + " ".join(f"{name + ' (linhas/s)':>20}" for name, _ in paths))
+    for rows in args.rows:
+        logs = build_logs(rows)
+        rates = [run(conn, function, logs, args.repeat) for _name, function in paths]
+        print(f"{rows:>7} " + " ".join(f"{rate:>20,.0f}" for rate in rates))
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
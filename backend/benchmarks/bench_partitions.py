@@ -0,0 +1,115 @@
+"""
+Benchmark: poda de partições e retenção em traffic_logs particionada x tabela comum.
+
+Num schema descartável de um Postgres local gera o mesmo conjunto sintético
+(padrão: 100M linhas, 30 dias, uma linha por cliente a cada 5 s) numa tabela comum
+e numa particionada por dia, ambas com índice em created_at. Compara:
+  - a consulta da rota de histórico (última hora), com EXPLAIN (ANALYZE) mostrando
+    quantas partições são lidas;
+  - a retenção de um dia: DELETE na tabela comum x DROP da partição.
+
+Uso (a partir de backend/):
+    DATABASE_URL=postgresql://localhost/traffic DB_SSLMODE=disable \\
+        python -m benchmarks.bench_partitions --rows 100000000 --days 30
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("SERVER_IP", "10.0.0.1")
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/benchmark")
+os.environ.setdefault("DB_SSLMODE", "disable")
+
+from app.db import connect  # noqa: E402
+
+SCHEMA = "bench_partitions"
+COLUMNS = """
+    id bigint NOT NULL, client_ip varchar(50) NOT NULL, inbound integer NOT NULL, outbound integer NOT NULL,
+    protocols jsonb NOT NULL, created_at timestamp NOT NULL, server_ip varchar(45),
+    sampling_rate double precision NOT NULL DEFAULT 1
+"""
+# Linhas sintéticas: `clients` clientes, um flush a cada `step` segundos a partir de `start`
+GENERATE_SQL = """
+    INSERT INTO {table}
+    SELECT n, '10.' || (n %% %(clients)s / 65536) || '.' || (n %% %(clients)s / 256 %% 256)
+              || '.' || (n %% %(clients)s %% 256),
+           (n %% 1500)::int, (n %% 700)::int, jsonb_build_object('TCP', n %% 1500, 'UDP', n %% 700),
+           %(start)s::timestamp + (n / %(clients)s) * %(step)s * interval '1 second', '10.0.0.1', 1
+    FROM generate_series(0, %(rows)s - 1) AS n
+"""
+HISTORY_SQL = "SELECT client_ip, inbound, outbound, protocols, created_at FROM {table} WHERE created_at >= %s"
+
+
+def timed(cursor, sql, params=None):
+    start = time.perf_counter()
+    cursor.execute(sql, params)
+    return time.perf_counter() - start
+
+
+def explain(cursor, sql, params):
+    cursor.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, params)
+    plan = cursor.fetchone()[0][0]
+    scanned = set()
+
+    def walk(node):
+        if "Relation Name" in node:
+            scanned.add(node["Relation Name"])
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan["Plan"])
+    return plan["Execution Time"] / 1000, len(scanned)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100_000_000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--keep", action="store_true", help="mantém o schema ao final")
+    args = parser.parse_args()
+
+    step = 5
+    windows = args.days * 86400 // step
+    clients = max(1, args.rows // windows)
+    start = datetime(2024, 1, 1)
+    end = start + timedelta(days=args.days)
+    params = {"rows": args.rows, "clients": clients, "start": start, "step": step}
+
+    conn = connect()
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+        cursor.execute(f"CREATE TABLE {SCHEMA}.plain ({COLUMNS})")
+        cursor.execute(f"CREATE TABLE {SCHEMA}.parted ({COLUMNS}) PARTITION BY RANGE (created_at)")
+        day = start
+        while day < end + timedelta(days=1):
+            cursor.execute(f"CREATE TABLE {SCHEMA}.parted_{day:%Y%m%d} PARTITION OF {SCHEMA}.parted "
+                           "FOR VALUES FROM (%s) TO (%s)", (day, day + timedelta(days=1)))
+            day += timedelta(days=1)
+
+        print(f"Gerando {args.rows:,} linhas ({clients} clientes x {windows:,} janelas de {step}s)...")
+        for table in ("plain", "parted"):
+            elapsed = timed(cursor, GENERATE_SQL.format(table=f"{SCHEMA}.{table}"), params)
+            timed(cursor, f"CREATE INDEX ON {SCHEMA}.{table} (created_at)")
+            timed(cursor, f"ANALYZE {SCHEMA}.{table}")
+            print(f"  {table}: {elapsed:,.0f}s")
+
+        since = end - timedelta(hours=1)
+        print(f"\n{'consulta (última hora)':<26} {'tempo (ms)':>11} {'tabelas lidas':>14}")
+        for table in ("plain", "parted"):
+            elapsed, scanned = explain(cursor, HISTORY_SQL.format(table=f"{SCHEMA}.{table}"), (since,))
+            print(f"{table:<26} {elapsed * 1000:>11,.1f} {scanned:>14}")
+
+        first = start + timedelta(days=1)
+        delete = timed(cursor, f"DELETE FROM {SCHEMA}.plain WHERE created_at < %s", (first,))
+        drop = timed(cursor, f"DROP TABLE {SCHEMA}.parted_{start:%Y%m%d}")
+        print(f"\nretenção de 1 dia: DELETE {delete:,.2f}s x DROP {drop:,.3f}s")
+
+        if not args.keep:
+            cursor.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
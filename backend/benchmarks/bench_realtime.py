@@ -0,0 +1,71 @@
+"""
+Benchmark: leitura de /api/traffic com muitos clientes ativos.
+
+Compara, por requisição, o caminho antigo (cópia dos shards, um TrafficLog por
+cliente e ordenação completa) com a leitura do RealtimeSnapshot (já montado pela
+thread de atualização) com e sem ?limit=. Também mede quanto custa montar o
+snapshot, que fica fora do caminho das requisições.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_realtime --clients 1000 10000 100000 --limit 20
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("SERVER_IP", "10.0.0.1")
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/benchmark")
+
+from app.models.traffic_model import TrafficLog  # noqa: E402
+from app.services.aggregation import RealtimeSnapshot, merge_frozen  # noqa: E402
+
+
+def build_traffic(clients):
+    return {
+        ("10.0.0.1", f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"): {
+            "Entrada": (i * 7919) % 100003, "Saída": (i * 104729) % 50021, "protocolos": {"TCP": 1200, "UDP": 300}}
+        for i in range(clients)
+    }
+
+
+def old_request(traffic):
+    report = [TrafficLog(ip, data["Entrada"], data["Saída"], data["protocolos"], server_ip)
+              for (server_ip, ip), data in merge_frozen([traffic]).items()]
+    report.sort(key=lambda x: x.inbound + x.outbound, reverse=True)
+    return report
+
+
+def snapshot_request(snapshot, limit):
+    return [TrafficLog(ip, data["Entrada"], data["Saída"], data["protocolos"], server_ip)
+            for (server_ip, ip), data in snapshot.ranked(limit)]
+
+
+def best_of(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'clientes':>9} {'antigo':>10} {'snapshot':>10} {'limit=' + str(args.limit):>10} {'montagem':>10}")
+    for clients in args.clients:
+        traffic = build_traffic(clients)
+        snapshot = RealtimeSnapshot(traffic)
+        old = best_of(lambda: old_request(traffic), args.repeat)
+        full = best_of(lambda: snapshot_request(snapshot, None), args.repeat)
+        limited = best_of(lambda: snapshot_request(snapshot, args.limit), args.repeat)
+        build = best_of(lambda: RealtimeSnapshot(traffic), args.repeat)
+        print(f"{clients:>9} {old * 1000:>8.2f}ms {full * 1000:>8.2f}ms {limited * 1000:>8.3f}ms {build * 1000:>8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Teste de carga: vazão de requisições concorrentes e latência do websocket.
+
+Contra um servidor já rodando (python run.py), N clientes fazem GETs nas rotas de
+histórico e previsões, com um POST em /api/prediction/forecast-arima a cada
+--arima-every requisições, enquanto um cliente Socket.IO mede a ida e volta do
+evento `latency_probe`. Rode uma vez com SERVER_MODE=threading e outra com
+SERVER_MODE=gevent (ou eventlet) para comparar.
+
+Requer o cliente Socket.IO: pip install "python-socketio[client]"
+
+Uso (a partir de backend/):
+    python -m benchmarks.load_test --url http://localhost:5000 --concurrency 50 --duration 30 --ip 10.0.0.2
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+import numpy as np
+import socketio
+
+PATHS = [
+    "/api/traffic/aggregate?period=hour",
+    "/api/traffic/aggregate?period=day&bucket=1h&group_by=ip&top=10",
+    "/api/traffic/protocols/{ip}",
+    "/api/traffic/captures/{ip}?limit=50",
+    "/api/prediction?limit=50",
+    "/api/prediction/{ip}",
+]
+
+
+def request(url, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=60) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def http_worker(args, index, deadline, latencies, errors):
+    count = index
+    while time.perf_counter() < deadline:
+        count += 1
+        start = time.perf_counter()
+        try:
+            if args.arima_every and count % args.arima_every == 0:
+                status = request(args.url + "/api/prediction/forecast-arima", {"client_ip": args.ip})
+            else:
+                status = request(args.url + PATHS[count % len(PATHS)].format(ip=args.ip))
+        except OSError:
+            status = None
+        latencies.append(time.perf_counter() - start)
+        if status is None or status >= 500:
+            errors.append(status)
+
+
+def websocket_probe(args, deadline, latencies):
+    client = socketio.Client()
+    client.connect(args.url, transports=["websocket"])
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            client.call("latency_probe", start, timeout=30)
+            latencies.append(time.perf_counter() - start)
+            time.sleep(args.probe_interval)
+    finally:
+        client.disconnect()
+
+
+def summary(values):
+    values = np.array(values) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return f"p50 {p50:8.1f} ms  p95 {p95:8.1f} ms  p99 {p99:8.1f} ms  máx {values.max():8.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--ip", default="10.0.0.2", help="IP de cliente com dados no banco")
+    parser.add_argument("--arima-every", type=int, default=20, help="0 = sem POSTs de ARIMA")
+    parser.add_argument("--probe-interval", type=float, default=0.1)
+    args = parser.parse_args()
+
+    deadline = time.perf_counter() + args.duration
+    http_latencies, errors, ws_latencies = [], [], []
+    threads = [threading.Thread(target=http_worker, args=(args, i, deadline, http_latencies, errors))
+               for i in range(args.concurrency)]
+    threads.append(threading.Thread(target=websocket_probe, args=(args, deadline, ws_latencies)))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.concurrency} clientes por {elapsed:.1f}s contra {args.url}")
+    print(f"HTTP       {len(http_latencies) / elapsed:10.1f} req/s  erros {len(errors)}")
+    print(f"  latência {summary(http_latencies)}")
+    if ws_latencies:
+        print(f"websocket  {len(ws_latencies)} sondas")
+        print(f"  latência {summary(ws_latencies)}")
+
+
+if __name__ == "__main__":
+    main()
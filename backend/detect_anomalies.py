@@ -0,0 +1,51 @@
+"""
+Detecção de anomalia em lote: avalia de uma vez todos os clientes com tráfego no
+período (ou os IPs informados) e grava as predições, com o mesmo resultado de
+/api/prediction/run para cada IP.
+
+Exemplos:
+    python detect_anomalies.py
+    python detect_anomalies.py --period day
+    python detect_anomalies.py --ip 10.0.0.2 --ip 10.0.0.3 --dry-run
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Detecção de anomalia em lote sobre traffic_logs")
+    parser.add_argument("--period", choices=("minute", "hour", "day", "week"), default="hour",
+                        help="Avalia os clientes com tráfego neste período (padrão: hour)")
+    parser.add_argument("--ip", action="append", dest="ips", help="Avalia só este IP (pode repetir)")
+    parser.add_argument("--dry-run", action="store_true", help="Calcula sem gravar em predictions")
+    parser.add_argument("--show", choices=("suspeito", "todos"), default="suspeito",
+                        help="Quais predições listar na saída (padrão: suspeito)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    from app.db import get_connection
+    from app.services.anomaly import ACTIVE_PERIODS, run_batch
+
+    since = datetime.utcnow() - ACTIVE_PERIODS[args.period] if args.ips is None else None
+    start = time.perf_counter()
+    result = run_batch(get_connection, args.ips, since, save=not args.dry_run)
+    elapsed = time.perf_counter() - start
+
+    for prediction in result["predictions"]:
+        if args.show == "todos" or prediction["prediction"] == "suspeito":
+            print(f"{prediction['client_ip']}\t{prediction['prediction']}\t{prediction['probability']:.4f}")
+    print(
+        f"{len(result['predictions'])} clientes avaliados em {elapsed:.2f}s, {result['suspicious']} suspeitos, "
+        f"{len(result['insufficient_data'])} sem histórico suficiente"
+        + (" (dry-run: nada gravado)" if args.dry_run else ""),
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""partition traffic_logs by created_at
+
+Revision ID: 0a9d5e3f7c21
+Revises: f2b6c4d8a913
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a9d5e3f7c21'
+down_revision: Union[str, Sequence[str], None] = 'f2b6c4d8a913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Troca traffic_logs por uma tabela particionada por faixa de created_at. A tabela
+    atual vira a partição traffic_logs_legacy (de MINVALUE até o fim do dia de hoje),
+    sem copiar linhas; as partições diárias seguintes e o descarte das antigas ficam
+    com app/services/partition_maintenance.py. traffic_logs_default recebe o que cair
+    fora de qualquer partição.
+    """
+    bind = op.get_bind()
+    op.execute("UPDATE traffic_logs SET created_at = now() WHERE created_at IS NULL")
+    upper = bind.execute(sa.text(
+        "SELECT date_trunc('day', GREATEST(COALESCE(MAX(created_at), now()), now())) + interval '1 day' "
+        "FROM traffic_logs"
+    )).scalar()
+
+    op.execute("ALTER TABLE traffic_logs RENAME TO traffic_logs_legacy")
+    op.execute("ALTER TABLE traffic_logs_legacy DROP CONSTRAINT traffic_logs_pkey")
+    op.execute("ALTER TABLE traffic_logs_legacy ALTER COLUMN created_at SET NOT NULL")
+    # Com a restrição já validada, o ATTACH não precisa varrer a tabela de novo
+    op.execute(sa.text(
+        "ALTER TABLE traffic_logs_legacy ADD CONSTRAINT traffic_logs_legacy_range CHECK (created_at < :upper)"
+    ).bindparams(upper=upper))
+
+    op.execute("""
+        CREATE TABLE traffic_logs (
+            id integer NOT NULL DEFAULT nextval('traffic_logs_id_seq'),
+            client_ip varchar(50) NOT NULL,
+            inbound integer NOT NULL,
+            outbound integer NOT NULL,
+            protocols jsonb NOT NULL,
+            created_at timestamp NOT NULL DEFAULT now(),
+            server_ip varchar(45),
+            sampling_rate double precision NOT NULL DEFAULT 1,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("ALTER SEQUENCE traffic_logs_id_seq OWNED BY traffic_logs.id")
+    op.execute(sa.text(
+        "ALTER TABLE traffic_logs ATTACH PARTITION traffic_logs_legacy FOR VALUES FROM (MINVALUE) TO (:upper)"
+    ).bindparams(upper=upper))
+    op.execute("ALTER TABLE traffic_logs_legacy DROP CONSTRAINT traffic_logs_legacy_range")
+    op.execute("CREATE TABLE traffic_logs_default PARTITION OF traffic_logs DEFAULT")
+
+
+def downgrade() -> None:
+    """
+    Reverte a migration: copia todas as partições para uma tabela comum.
+    """
+    op.execute("CREATE TABLE traffic_logs_plain (LIKE traffic_logs INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO traffic_logs_plain SELECT * FROM traffic_logs")
+    op.execute("ALTER SEQUENCE traffic_logs_id_seq OWNED BY NONE")
+    op.execute("DROP TABLE traffic_logs")
+    op.execute("ALTER TABLE traffic_logs_plain RENAME TO traffic_logs")
+    op.execute("ALTER TABLE traffic_logs ADD PRIMARY KEY (id)")
+    op.execute("ALTER TABLE traffic_logs ALTER COLUMN created_at DROP NOT NULL")
+    op.execute("ALTER SEQUENCE traffic_logs_id_seq OWNED BY traffic_logs.id")
@@ -0,0 +1,32 @@
+"""add unknown protocol code
+
+Revision ID: 3f9a7c2e6b18
+Revises: b7e2a9c4d513
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a7c2e6b18'
+down_revision: Union[str, Sequence[str], None] = 'b7e2a9c4d513'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Reserva o código 999 ("OUTROS") no dicionário `protocols`: é onde
+    encode_protocols soma os bytes de nomes que ainda não têm código.
+    """
+    op.execute("INSERT INTO protocols (id, name) VALUES (999, 'OUTROS') ON CONFLICT DO NOTHING")
+
+
+def downgrade() -> None:
+    """
+    Reverte a migration: remove o código reservado.
+    """
+    op.execute("DELETE FROM protocols WHERE id = 999")
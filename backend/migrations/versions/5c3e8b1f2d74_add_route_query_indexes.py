@@ -0,0 +1,52 @@
+"""add route query indexes
+
+Revision ID: 5c3e8b1f2d74
+Revises: 0a9d5e3f7c21
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c3e8b1f2d74'
+down_revision: Union[str, Sequence[str], None] = '0a9d5e3f7c21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Índices das consultas das rotas (verificados por tests/test_query_plans.py).
+    Em traffic_logs, criados na tabela particionada, valem para todas as partições.
+    """
+    # Último registro / série de um cliente (/api/traffic/protocols, /captures, previsões);
+    # inbound e outbound no índice evitam ler a tabela nas consultas das previsões
+    op.create_index('ix_traffic_logs_client_created', 'traffic_logs', ['client_ip', 'created_at'],
+                    postgresql_include=['inbound', 'outbound'])
+    # Histórico bruto por período (/api/traffic/aggregate?resolution=raw)
+    op.create_index('ix_traffic_logs_created', 'traffic_logs', ['created_at'])
+
+    op.create_index('ix_predictions_created', 'predictions', ['created_at'])
+    op.create_index('ix_predictions_client_created', 'predictions', ['client_ip', 'created_at'],
+                    postgresql_include=['prediction', 'probability'])
+
+    # /api/traffic/flows: janela por last_seen, com ou sem filtro de IP (origem OU destino)
+    op.create_index('ix_flows_last_seen', 'flows', ['last_seen'])
+    op.create_index('ix_flows_src_last_seen', 'flows', ['src_ip', 'last_seen'])
+    op.create_index('ix_flows_dst_last_seen', 'flows', ['dst_ip', 'last_seen'])
+
+
+def downgrade() -> None:
+    """
+    Reverte a migration: remove os índices.
+    """
+    op.drop_index('ix_flows_dst_last_seen', table_name='flows')
+    op.drop_index('ix_flows_src_last_seen', table_name='flows')
+    op.drop_index('ix_flows_last_seen', table_name='flows')
+    op.drop_index('ix_predictions_client_created', table_name='predictions')
+    op.drop_index('ix_predictions_created', table_name='predictions')
+    op.drop_index('ix_traffic_logs_created', table_name='traffic_logs')
+    op.drop_index('ix_traffic_logs_client_created', table_name='traffic_logs')
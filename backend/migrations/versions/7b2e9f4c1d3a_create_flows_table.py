@@ -0,0 +1,45 @@
+"""create flows table
+
+Revision ID: 7b2e9f4c1d3a
+Revises: 6444c1efdd9b
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b2e9f4c1d3a'
+down_revision: Union[str, Sequence[str], None] = '6444c1efdd9b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Cria a tabela 'flows', que recebe os fluxos (5-tupla) expirados da captura.
+    """
+    op.create_table(
+        'flows',
+        sa.Column('id', sa.BigInteger, primary_key=True),
+        sa.Column('src_ip', sa.String(45), nullable=False),
+        sa.Column('dst_ip', sa.String(45), nullable=False),
+        sa.Column('src_port', sa.Integer, nullable=False),
+        sa.Column('dst_port', sa.Integer, nullable=False),
+        sa.Column('protocol', sa.SmallInteger, nullable=False),
+        sa.Column('bytes', sa.BigInteger, nullable=False),
+        sa.Column('packets', sa.BigInteger, nullable=False),
+        sa.Column('first_seen', sa.DateTime, nullable=False),
+        sa.Column('last_seen', sa.DateTime, nullable=False),
+        sa.Column('end_reason', sa.String(10), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """
+    Reverte a migration: apaga a tabela 'flows'.
+    """
+    op.drop_table('flows')
@@ -0,0 +1,82 @@
+"""store traffic protocols as int arrays
+
+Revision ID: 8d41f6a2c0b9
+Revises: 5c3e8b1f2d74
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d41f6a2c0b9'
+down_revision: Union[str, Sequence[str], None] = '5c3e8b1f2d74'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Troca o JSONB `protocols` de traffic_logs por dois arrays paralelos: proto_ids
+    (códigos do dicionário `protocols`) e proto_bytes. Os códigos são os de
+    PROTOCOL_CODE em app/services/packet_parser.py: 0-255 = IP_PROTO_n e, em
+    seguida, TCP, UDP, ICMP e IPv6. Nomes antigos fora dessa lista ganham códigos
+    a partir de 1000. protocol_map() remonta o JSON para as rotas.
+    """
+    op.execute("""
+        CREATE TABLE protocols (
+            id smallint PRIMARY KEY,
+            name varchar(32) NOT NULL UNIQUE
+        )
+    """)
+    op.execute("INSERT INTO protocols (id, name) SELECT n, 'IP_PROTO_' || n FROM generate_series(0, 255) AS n")
+    op.execute("INSERT INTO protocols (id, name) VALUES (256, 'TCP'), (257, 'UDP'), (258, 'ICMP'), (259, 'IPv6')")
+    op.execute("""
+        INSERT INTO protocols (id, name)
+        SELECT 999 + row_number() OVER (ORDER BY name), name
+        FROM (SELECT DISTINCT jsonb_object_keys(protocols) AS name FROM traffic_logs) AS names
+        WHERE name NOT IN (SELECT name FROM protocols)
+    """)
+
+    # Colunas e restrição na tabela particionada valem para todas as partições
+    op.execute("""
+        ALTER TABLE traffic_logs
+            ADD COLUMN proto_ids smallint[] NOT NULL DEFAULT '{}',
+            ADD COLUMN proto_bytes bigint[] NOT NULL DEFAULT '{}'
+    """)
+    op.execute("""
+        UPDATE traffic_logs AS t SET (proto_ids, proto_bytes) = (
+            SELECT array_agg(p.id ORDER BY p.id), array_agg(e.value::numeric::bigint ORDER BY p.id)
+            FROM jsonb_each_text(t.protocols) AS e JOIN protocols AS p ON p.name = e.key
+        )
+        WHERE t.protocols <> '{}'::jsonb
+    """)
+    op.execute("ALTER TABLE traffic_logs DROP COLUMN protocols")
+    op.execute("""
+        ALTER TABLE traffic_logs ADD CONSTRAINT traffic_logs_proto_arrays
+            CHECK (cardinality(proto_ids) = cardinality(proto_bytes))
+    """)
+
+    # Mapa {"TCP": bytes, ...} de uma linha, no formato que as rotas sempre devolveram
+    op.execute("""
+        CREATE OR REPLACE FUNCTION protocol_map(ids smallint[], sizes bigint[]) RETURNS jsonb
+        LANGUAGE sql STABLE AS $$
+            SELECT COALESCE(jsonb_object_agg(p.name, u.size), '{}'::jsonb)
+            FROM unnest(ids, sizes) AS u(id, size) JOIN protocols AS p ON p.id = u.id
+        $$
+    """)
+
+
+def downgrade() -> None:
+    """
+    Reverte a migration: volta a gravar o mapa em JSONB.
+    """
+    op.execute("ALTER TABLE traffic_logs ADD COLUMN protocols jsonb NOT NULL DEFAULT '{}'::jsonb")
+    op.execute("UPDATE traffic_logs SET protocols = protocol_map(proto_ids, proto_bytes) WHERE proto_ids <> '{}'")
+    op.execute("ALTER TABLE traffic_logs ALTER COLUMN protocols DROP DEFAULT")
+    op.execute("ALTER TABLE traffic_logs DROP CONSTRAINT traffic_logs_proto_arrays")
+    op.execute("ALTER TABLE traffic_logs DROP COLUMN proto_ids, DROP COLUMN proto_bytes")
+    op.execute("DROP FUNCTION IF EXISTS protocol_map(smallint[], bigint[])")
+    op.execute("DROP TABLE protocols")
@@ -0,0 +1,42 @@
+"""widen traffic counters to bigint
+
+Revision ID: 9b4d2e7a1c56
+Revises: 3f9a7c2e6b18
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b4d2e7a1c56'
+down_revision: Union[str, Sequence[str], None] = '3f9a7c2e6b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    inbound/outbound de traffic_logs passam a bigint, como os rollups e proto_bytes:
+    a linha "outros" do modo sketch (todos os clientes fora do top-K numa janela)
+    e os contadores multiplicados pela taxa de amostragem passam de 2^31 bytes
+    num flood. Na tabela particionada a troca vale para todas as partições.
+    """
+    op.execute("""
+        ALTER TABLE traffic_logs
+            ALTER COLUMN inbound TYPE bigint,
+            ALTER COLUMN outbound TYPE bigint
+    """)
+
+
+def downgrade() -> None:
+    """
+    Reverte a migration: volta a integer (falha se alguma linha passar de 2^31 - 1).
+    """
+    op.execute("""
+        ALTER TABLE traffic_logs
+            ALTER COLUMN inbound TYPE integer,
+            ALTER COLUMN outbound TYPE integer
+    """)
@@ -0,0 +1,41 @@
+"""add keyset pagination indexes
+
+Revision ID: b7e2a9c4d513
+Revises: 8d41f6a2c0b9
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2a9c4d513'
+down_revision: Union[str, Sequence[str], None] = '8d41f6a2c0b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    As rotas de histórico paginam por (created_at, id): com id no fim dos índices de
+    traffic_logs, a comparação de linha `(created_at, id) > (...)` e o ORDER BY
+    usam o índice direto, sem ordenar o período inteiro.
+    """
+    op.drop_index('ix_traffic_logs_created', table_name='traffic_logs')
+    op.create_index('ix_traffic_logs_created', 'traffic_logs', ['created_at', 'id'])
+    op.drop_index('ix_traffic_logs_client_created', table_name='traffic_logs')
+    op.create_index('ix_traffic_logs_client_created', 'traffic_logs', ['client_ip', 'created_at', 'id'],
+                    postgresql_include=['inbound', 'outbound'])
+
+
+def downgrade() -> None:
+    """
+    Reverte a migration: volta aos índices sem id.
+    """
+    op.drop_index('ix_traffic_logs_client_created', table_name='traffic_logs')
+    op.create_index('ix_traffic_logs_client_created', 'traffic_logs', ['client_ip', 'created_at'],
+                    postgresql_include=['inbound', 'outbound'])
+    op.drop_index('ix_traffic_logs_created', table_name='traffic_logs')
+    op.create_index('ix_traffic_logs_created', 'traffic_logs', ['created_at'])
@@ -0,0 +1,33 @@
+"""add server_ip to traffic_logs
+
+Revision ID: c81f3a9e5b27
+Revises: 7b2e9f4c1d3a
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81f3a9e5b27'
+down_revision: Union[str, Sequence[str], None] = '7b2e9f4c1d3a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Registra em cada linha de traffic_logs o endereço monitorado envolvido.
+    Linhas antigas (um único SERVER_IP) ficam com NULL.
+    """
+    op.add_column('traffic_logs', sa.Column('server_ip', sa.String(45), nullable=True))
+
+
+def downgrade() -> None:
+    """
+    Reverte a migration: remove a coluna 'server_ip'.
+    """
+    op.drop_column('traffic_logs', 'server_ip')
@@ -0,0 +1,32 @@
+"""add sampling_rate to traffic_logs
+
+Revision ID: e4a7d2b91f60
+Revises: c81f3a9e5b27
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a7d2b91f60'
+down_revision: Union[str, Sequence[str], None] = 'c81f3a9e5b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Taxa de amostragem efetiva da janela (1 = todos os pacotes contabilizados).
+    """
+    op.add_column('traffic_logs', sa.Column('sampling_rate', sa.Float, nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    """
+    Reverte a migration: remove a coluna 'sampling_rate'.
+    """
+    op.drop_column('traffic_logs', 'sampling_rate')
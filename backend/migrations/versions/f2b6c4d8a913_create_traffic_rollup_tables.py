@@ -0,0 +1,89 @@
+"""create traffic rollup tables
+
+Revision ID: f2b6c4d8a913
+Revises: e4a7d2b91f60
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b6c4d8a913'
+down_revision: Union[str, Sequence[str], None] = 'e4a7d2b91f60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Tabela -> unidade do date_trunc que define o balde
+ROLLUPS = {'traffic_logs_1m': 'minute', 'traffic_logs_1h': 'hour', 'traffic_logs_1d': 'day'}
+
+
+def upgrade() -> None:
+    """
+    Totais de traffic_logs por minuto, hora e dia (balde, IP monitorado, cliente),
+    mantidos pelo reporter a cada flush. As linhas já existentes são agregadas aqui.
+    server_ip vazio ('') corresponde às linhas antigas com NULL; linhas antigas sem
+    created_at não têm balde e ficam de fora.
+    """
+    # Soma dois mapas de protocolos (valores inteiros), usada nos upserts
+    op.execute("""
+        CREATE OR REPLACE FUNCTION jsonb_sum(a jsonb, b jsonb) RETURNS jsonb
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT COALESCE(jsonb_object_agg(key, total), '{}'::jsonb)
+            FROM (
+                SELECT key, SUM(value::numeric)::bigint AS total
+                FROM (SELECT * FROM jsonb_each_text(a) UNION ALL SELECT * FROM jsonb_each_text(b)) AS items
+                GROUP BY key
+            ) AS sums
+        $$
+    """)
+
+    for table, unit in ROLLUPS.items():
+        op.create_table(
+            table,
+            sa.Column('bucket', sa.DateTime, nullable=False),
+            sa.Column('server_ip', sa.String(45), nullable=False, server_default=''),
+            sa.Column('client_ip', sa.String(50), nullable=False),
+            sa.Column('inbound', sa.BigInteger, nullable=False),
+            sa.Column('outbound', sa.BigInteger, nullable=False),
+            sa.Column('protocols', postgresql.JSONB, nullable=False),
+            # Linhas de traffic_logs somadas no balde e maior taxa de amostragem entre elas
+            sa.Column('samples', sa.Integer, nullable=False),
+            sa.Column('sampling_rate', sa.Float, nullable=False, server_default='1'),
+            sa.PrimaryKeyConstraint('bucket', 'server_ip', 'client_ip'),
+        )
+        op.execute(f"""
+            INSERT INTO {table} (bucket, server_ip, client_ip, inbound, outbound, protocols, samples, sampling_rate)
+            SELECT t.bucket, t.server_ip, t.client_ip, t.inbound, t.outbound,
+                   COALESCE(p.protocols, '{{}}'::jsonb), t.samples, t.sampling_rate
+            FROM (
+                SELECT date_trunc('{unit}', created_at) AS bucket, COALESCE(server_ip, '') AS server_ip, client_ip,
+                       SUM(inbound) AS inbound, SUM(outbound) AS outbound, COUNT(*) AS samples,
+                       MAX(sampling_rate) AS sampling_rate
+                FROM traffic_logs WHERE created_at IS NOT NULL GROUP BY 1, 2, 3
+            ) AS t
+            LEFT JOIN (
+                SELECT bucket, server_ip, client_ip, jsonb_object_agg(key, total) AS protocols
+                FROM (
+                    SELECT date_trunc('{unit}', created_at) AS bucket, COALESCE(server_ip, '') AS server_ip,
+                           client_ip, key, SUM(value::numeric)::bigint AS total
+                    FROM traffic_logs, jsonb_each_text(protocols)
+                    WHERE created_at IS NOT NULL
+                    GROUP BY 1, 2, 3, 4
+                ) AS items
+                GROUP BY 1, 2, 3
+            ) AS p USING (bucket, server_ip, client_ip)
+        """)
+
+
+def downgrade() -> None:
+    """
+    Reverte a migration: remove as tabelas de rollup e a função jsonb_sum.
+    """
+    for table in ROLLUPS:
+        op.drop_table(table)
+    op.execute("DROP FUNCTION IF EXISTS jsonb_sum(jsonb, jsonb)")
@@ -0,0 +1,67 @@
+"""
+Reprocessa capturas pcap/pcapng e grava o resultado em traffic_logs.
+
+Exemplos:
+    python replay.py captura.pcapng
+    python replay.py dia1.pcap dia2.pcap --server-ip 10.0.0.5,10.0.1.0/24
+    python replay.py captura.pcap --dry-run
+"""
+import argparse
+import os
+import sys
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Reprocessa capturas pcap/pcapng em traffic_logs")
+    parser.add_argument("files", nargs="+", help="Arquivos .pcap ou .pcapng (apenas Ethernet)")
+    parser.add_argument("--server-ip", help="IPs ou prefixos monitorados nas capturas, separados por vírgula "
+                                            "(padrão: MONITORED_ADDRESSES/SERVER_IP do .env)")
+    parser.add_argument("--dry-run", action="store_true", help="Processa sem gravar no banco")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.server_ip:
+        # Precisa valer antes de importar app.config
+        os.environ["SERVER_IP"] = args.server_ip.split(",")[0]
+        os.environ["MONITORED_ADDRESSES"] = args.server_ip
+
+    from app.services.replay_service import replay_captures, insert_rows, INSERT_BATCH_SIZE
+
+    pending = []
+    conn = None
+    if not args.dry_run:
+        from app.db import connect
+        conn = connect()
+
+    def write_rows(rows):
+        pending.extend(rows)
+        if len(pending) >= INSERT_BATCH_SIZE:
+            flush_pending()
+
+    def flush_pending():
+        if conn is not None and pending:
+            with conn.cursor() as cursor:
+                insert_rows(cursor, pending)
+            conn.commit()
+        pending.clear()
+
+    def progress(stats, elapsed):
+        print(f"{stats['packets']} pacotes ({stats['packets'] / elapsed:,.0f} pacotes/s)", file=sys.stderr)
+
+    try:
+        stats = replay_captures(args.files, write_rows, progress=progress)
+        flush_pending()
+    finally:
+        if conn is not None:
+            conn.close()
+
+    print(
+        f"{stats['packets']} pacotes ({stats['packets_matched']} do servidor) em {stats['elapsed']:.1f}s "
+        f"- {stats['packets_per_second']:,.0f} pacotes/s; {stats['rows']} linhas em {stats['windows']} janelas"
+    )
+
+
+if __name__ == "__main__":
+    main()
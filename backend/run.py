@@ -1,14 +1,33 @@
-from threading import Thread
-from app import create_app, socketio
-from app.services.sniffing_service import start_sniffing
-from app.services.reporting_service import start_reporting_thread
+import os
+from dotenv import load_dotenv
+
+# Modo cooperativo: o monkey patch precisa vir antes de importar Flask, psycopg2 e threading
+load_dotenv()
+SERVER_MODE = os.getenv("SERVER_MODE", "threading").lower()
+if SERVER_MODE == "gevent":
+    from gevent import monkey
+    monkey.patch_all()
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+elif SERVER_MODE == "eventlet":
+    import eventlet
+    eventlet.monkey_patch()
+    from psycogreen.eventlet import patch_psycopg
+    patch_psycopg()
+
+from app import create_app, socketio  # noqa: E402
+from app.services.sniffing_service import start_sniffing  # noqa: E402
+from app.services.reporting_service import start_reporting_thread  # noqa: E402
+from app.services.partition_maintenance import start_maintenance_thread  # noqa: E402
 
 app = create_app()
 
 if __name__ == "__main__":
-    # Inicia sniffing e reporting em threads normais
-    Thread(target=start_sniffing, daemon=True).start()
+    # Inicia os workers de captura e o reporting (ambos criam threads/processos internamente)
+    start_sniffing()
     start_reporting_thread()  # já cria thread internamente
+    # Partições futuras de traffic_logs e retenção das antigas
+    start_maintenance_thread()
 
     # Roda o servidor SocketIO
     socketio.run(app, host="0.0.0.0", port=5000, use_reloader=False)
@@ -1,6 +1,7 @@
 import pytest
 from unittest.mock import MagicMock, patch
 from app import create_app
+from app.services.response_cache import response_cache
 
 # 🔹 Cria app Flask para os testes
 @pytest.fixture
@@ -9,6 +10,8 @@ def app():
     app.config.update({
         "TESTING": True,
     })
+    # Respostas guardadas por um teste não podem vazar para o próximo
+    response_cache.clear()
     return app
 
 # 🔹 Cliente de teste Flask
@@ -47,6 +50,7 @@ def mock_get_connection(monkeypatch):
         if fetchone is not None:
             mock_cursor.fetchone.return_value = fetchone
         mock_conn = MagicMock()
+        mock_conn.__enter__.return_value = mock_conn
         mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
         monkeypatch.setattr("app.routes.traffic_routes.get_connection", lambda: mock_conn)
         return mock_cursor, mock_conn
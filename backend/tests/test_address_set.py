@@ -0,0 +1,70 @@
+import socket
+import numpy as np
+from scapy.all import Ether, IP, IPv6, TCP, UDP, Raw
+from app.services import sniffing_service
+from app.services.address_set import AddressSet
+from app.services.aggregation import TrafficShard, freeze_traffic
+from app.services.packet_ring import PacketRing
+
+
+def _v4(ip):
+    return socket.inet_aton(ip)
+
+
+def _v6(ip):
+    return socket.inet_pton(socket.AF_INET6, ip)
+
+
+def test_address_set_matches_hosts_and_prefixes():
+    addresses = AddressSet(["10.0.0.1", "192.168.10.0/24", "172.16.0.0/12", "2001:db8::/64", "fe80::1"])
+
+    assert _v4("10.0.0.1") in addresses
+    assert _v4("10.0.0.2") not in addresses
+    assert _v4("192.168.10.254") in addresses
+    assert _v4("192.168.11.1") not in addresses
+    assert _v4("172.31.255.255") in addresses
+    assert _v6("2001:db8::42") in addresses
+    assert _v6("2001:db8:0:1::42") not in addresses
+    assert _v6("fe80::1") in addresses
+    assert addresses.expressions() == ["10.0.0.1", "172.16.0.0/12", "192.168.10.0/24", "2001:db8::/64", "fe80::1"]
+
+
+def test_address_set_array_lookup_agrees_with_scalar():
+    addresses = AddressSet(["10.0.0.1", "10.1.0.0/16", "192.168.0.0/30", "0.0.0.0/32"])
+    rng = np.random.default_rng(1)
+    values = np.concatenate([
+        rng.integers(0, 2 ** 32, 2000, dtype=np.uint64),
+        np.array([0x0A000001, 0x0A010203, 0xC0A80003, 0xC0A80004, 0], dtype=np.uint64),
+    ]).astype(np.uint32)
+
+    mask = addresses.contains_ipv4_array(values)
+    assert mask.tolist() == [int(v).to_bytes(4, "big") in addresses for v in values.tolist()]
+    assert mask[-5:].tolist() == [True, True, True, False, True]
+
+
+def test_capture_records_monitored_address_per_row(monkeypatch):
+    monkeypatch.setattr(sniffing_service, "monitored_addresses", AddressSet(["10.0.1.0/24", "2001:db8::/64"]))
+    frames = [
+        bytes(Ether() / IP(src="10.9.0.1", dst="10.0.1.5") / TCP() / Raw(b"a" * 20)),
+        bytes(Ether() / IP(src="10.0.1.7", dst="10.9.0.1") / UDP(sport=53, dport=5353)),
+        bytes(Ether() / IPv6(src="2001:db8::10", dst="2001:db8:1::1") / TCP(sport=443, dport=40000)),
+        bytes(Ether() / IP(src="10.9.0.1", dst="10.0.2.1") / TCP()),
+    ]
+
+    frame_shard, packet_shard, batch_shard = TrafficShard(), TrafficShard(), TrafficShard()
+    ring = PacketRing(8)
+    for frame in frames:
+        sniffing_service.process_frame(frame, frame_shard, ts=1.0)
+        sniffing_service.process_packet(Ether(frame), packet_shard, ts=1.0)
+        ring.append(frame, 1.0)
+    sniffing_service.process_ring(ring, batch_shard)
+
+    result = freeze_traffic(frame_shard.data)
+    assert result == freeze_traffic(packet_shard.data) == freeze_traffic(batch_shard.data)
+    assert result == {
+        ("10.0.1.5", "10.9.0.1"): {"Entrada": len(frames[0]), "Saída": 0, "protocolos": {"TCP": len(frames[0])}},
+        ("10.0.1.7", "10.9.0.1"): {"Entrada": 0, "Saída": len(frames[1]), "protocolos": {"UDP": len(frames[1])}},
+        ("2001:db8::10", "2001:db8:1::1"): {"Entrada": 0, "Saída": len(frames[2]),
+                                            "protocolos": {"IPv6": len(frames[2])}},
+    }
+    assert batch_shard.counters() == frame_shard.counters()
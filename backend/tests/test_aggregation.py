@@ -0,0 +1,125 @@
+import threading
+import time
+from scapy.all import Ether, IP, TCP, UDP, Raw
+from app.services import sniffing_service
+from app.services.aggregation import RealtimeSnapshot, ShardPool
+
+SERVER = sniffing_service.SERVER_IP
+
+
+def _frames(client_suffix, count):
+    frames = []
+    for i in range(count):
+        client = f"10.1.{client_suffix}.{i % 5}"
+        frames.append(bytes(Ether() / IP(src=client, dst=SERVER) / TCP() / Raw(b"a" * 10)))
+        frames.append(bytes(Ether() / IP(src=SERVER, dst=client) / UDP() / Raw(b"b" * 20)))
+    return frames
+
+
+def _replay_worker(shard, frames, done):
+    # Simula um worker de captura: processa os quadros e depois fica ocioso
+    for frame in frames:
+        sniffing_service.process_frame(frame, shard)
+    done.set()
+    while True:
+        time.sleep(0.01)
+        shard.tick()
+
+
+def _expected_total(frames):
+    return sum(len(frame) for frame in frames)
+
+
+def _total_bytes(report):
+    return sum(d["Entrada"] + d["Saída"] for d in report.values())
+
+
+def test_thread_shards_are_merged_at_collect():
+    pool = ShardPool()
+    frames = [_frames(1, 50), _frames(2, 50)]
+    events = [threading.Event(), threading.Event()]
+    pool.start(_replay_worker, list(zip(frames, events)), mode="thread")
+    for event in events:
+        assert event.wait(5)
+
+    assert _total_bytes(pool.peek()) == _expected_total(frames[0] + frames[1])
+    report, _flows = pool.collect()
+    assert _total_bytes(report) == _expected_total(frames[0] + frames[1])
+    assert set(report) == {(SERVER, f"10.1.{s}.{i}") for s in (1, 2) for i in range(5)}
+    assert pool.collect() == ({}, [])
+    assert pool.counters()["packets_matched"] == 200
+
+
+def test_late_peek_answer_is_dropped_for_the_current_one():
+    pool = ShardPool()
+    first, second = _frames(6, 20), _frames(7, 20)
+    ticks, answered, ready = threading.Semaphore(0), threading.Semaphore(0), threading.Event()
+
+    def worker(shard):
+        # Worker em lote (flush_hook): o peek passa pelo flag mesmo em thread
+        shard.flush_hook = lambda: None
+        for frame in first:
+            sniffing_service.process_frame(frame, shard)
+        ready.set()
+        ticks.acquire()
+        shard.tick()
+        # Responde ao primeiro peek depois do timeout e continua capturando
+        for frame in second:
+            sniffing_service.process_frame(frame, shard, size=len(frame))
+        answered.release()
+        while True:
+            ticks.acquire()
+            shard.tick()
+
+    pool.start(worker, [()], mode="thread")
+    assert ready.wait(5)
+    assert pool.peek(timeout=0.05) == {}
+    ticks.release()
+    assert answered.acquire(timeout=5)
+
+    threading.Timer(0.05, ticks.release).start()
+    assert _total_bytes(pool.peek(timeout=5)) == _expected_total(first + second)
+
+
+def test_realtime_snapshot_is_swapped_without_touching_the_workers():
+    pool = ShardPool()
+    frames = [_frames(5, 50)]
+    event = threading.Event()
+    pool.start(_replay_worker, [(frames[0], event)], mode="thread")
+    assert event.wait(5)
+
+    assert len(pool.snapshot) == 0
+    previous = pool.snapshot
+    snapshot = pool.refresh_snapshot()
+    assert pool.snapshot is snapshot and previous is not snapshot
+    assert sum(data["Entrada"] + data["Saída"] for _key, data in snapshot.ranked()) == _expected_total(frames[0])
+
+
+def test_realtime_snapshot_ranks_top_with_heap_and_full_on_demand():
+    traffic = {("10.0.0.1", f"10.2.0.{i}"): {"Entrada": i * 10, "Saída": i, "protocolos": {}} for i in range(20)}
+    snapshot = RealtimeSnapshot(traffic, top_max=5)
+    volumes = [data["Entrada"] + data["Saída"] for _key, data in snapshot.ranked()]
+
+    assert volumes == sorted(volumes, reverse=True) and len(volumes) == 20
+    assert [key for key, _data in snapshot.ranked(3)] == [("10.0.0.1", f"10.2.0.{i}") for i in (19, 18, 17)]
+    assert snapshot.ranked(8) == snapshot.ranked()[:8]
+    assert len(snapshot.top) == 5
+
+
+def test_process_shards_are_merged_at_collect():
+    pool = ShardPool()
+    frames = [_frames(3, 40), _frames(4, 40)]
+    pool.start(_replay_worker, [(f, threading.Event()) for f in frames], mode="process")
+
+    collected = {}
+    deadline = time.monotonic() + 10
+    while _total_bytes(collected) < _expected_total(frames[0] + frames[1]) and time.monotonic() < deadline:
+        for ip, data in pool.collect()[0].items():
+            entry = collected.setdefault(ip, {"Entrada": 0, "Saída": 0, "protocolos": {}})
+            entry["Entrada"] += data["Entrada"]
+            entry["Saída"] += data["Saída"]
+
+    assert _total_bytes(collected) == _expected_total(frames[0] + frames[1])
+    assert pool.counters()["packets_seen"] == 160
+    for worker in pool.workers:
+        worker.runner.terminate()
@@ -0,0 +1,111 @@
+import statistics
+from unittest.mock import MagicMock
+import numpy as np
+import pytest
+from app.services.anomaly import fetch_samples, score_samples
+
+# Histórico por cliente, do registro mais recente para o mais antigo
+HISTORY = {
+    "10.0.0.2": [5000] + [100 + i % 7 for i in range(120)],
+    "10.0.0.3": [100 + i % 7 for i in range(60)],
+    "10.0.0.4": [300] * 30,
+    "10.0.0.5": [1, 2, 3],
+}
+
+
+def _reference(history):
+    # Algoritmo original de /api/prediction/run, com statistics
+    history = history[:100]
+    mean, std = statistics.mean(history), statistics.stdev(history)
+    score = 1 / (1 + np.exp(-(history[0] - mean) / std)) if std > 0 else 0.0
+    return "suspeito" if history[0] > mean + 3 * std else "normal", float(score)
+
+
+class FakeCursor:
+    def execute(self, query, params):
+        self.query, self.params = query, params
+
+    def fetchall(self):
+        ips = self.params[0] if isinstance(self.params[0], list) else sorted(HISTORY)
+        limit = self.params[-1]
+        return [(ip, value) for ip in sorted(ips) for value in HISTORY.get(ip, [])[:limit]]
+
+
+def _connection():
+    conn = MagicMock()
+    conn.__enter__.return_value = conn
+    conn.cursor.return_value.__enter__.return_value = FakeCursor()
+    return conn
+
+
+def test_fetch_samples_uses_one_lateral_query():
+    cursor = FakeCursor()
+    clients, counts, values = fetch_samples(cursor, since="2026-10-18")
+
+    assert "CROSS JOIN LATERAL" in cursor.query and "ROW_NUMBER()" not in cursor.query
+    assert clients == sorted(HISTORY)
+    assert counts.tolist() == [100, 60, 30, 3]
+    assert values[100] == HISTORY["10.0.0.3"][0]
+
+
+def test_fetch_samples_skips_the_sketch_others_row():
+    cursor = FakeCursor()
+    fetch_samples(cursor, since="2026-10-18")
+    assert "client_ip <> %s" in cursor.query and cursor.params[1] == "outros"
+
+    clients, _counts, _values = fetch_samples(cursor, ips=["outros", "10.0.0.3"])
+    assert cursor.params[0] == ["10.0.0.3"] and clients == ["10.0.0.3"]
+
+
+def test_score_samples_matches_statistics_reference():
+    rng = np.random.default_rng(7)
+    history = {f"10.9.{i // 256}.{i % 256}": rng.integers(0, 10 ** 7, rng.integers(10, 101)).tolist()
+               for i in range(500)}
+    history["10.9.9.9"] = [10 ** 8] + [1000] * 99
+    clients = sorted(history)
+    counts = np.array([len(history[ip]) for ip in clients])
+    values = np.concatenate([history[ip] for ip in clients]).astype(np.float64)
+
+    results, skipped = score_samples(clients, counts, values)
+    assert skipped == []
+    for result in results:
+        prediction, score = _reference(history[result["client_ip"]])
+        assert result["prediction"] == prediction
+        assert result["probability"] == pytest.approx(score, rel=1e-12, abs=1e-300)
+    assert {r["client_ip"] for r in results if r["prediction"] == "suspeito"} >= {"10.9.9.9"}
+
+
+def test_constant_and_short_histories():
+    clients, counts, values = fetch_samples(FakeCursor(), ips=["10.0.0.4", "10.0.0.5"])
+    results, skipped = score_samples(clients, counts, values)
+    assert results == [{"client_ip": "10.0.0.4", "prediction": "normal", "probability": 0.0}]
+    assert skipped == ["10.0.0.5"]
+
+
+def test_batch_route_matches_single_ip_route(client, monkeypatch):
+    inserts = []
+    monkeypatch.setattr("app.routes.prediction_routes.get_connection", _connection)
+    monkeypatch.setattr("app.services.anomaly.execute_values",
+                        lambda cursor, query, rows, page_size: inserts.append(rows))
+
+    batch = client.post("/api/prediction/run-batch", json={"period": "day"})
+    assert batch.status_code == 200
+    data = batch.get_json()
+    assert data["insufficient_data"] == ["10.0.0.5"] and data["suspicious"] == 1
+    # Um único INSERT com todas as predições
+    assert len(inserts) == 1 and [row[0] for row in inserts[0]] == ["10.0.0.2", "10.0.0.3", "10.0.0.4"]
+
+    for prediction in data["predictions"]:
+        single = client.post("/api/prediction/run", json={"client_ip": prediction["client_ip"]}).get_json()
+        assert (single["prediction"], single["probability"]) == (prediction["prediction"], prediction["probability"])
+        # As duas rotas contra a conta antiga com statistics, não só uma contra a outra
+        label, score = _reference(HISTORY[prediction["client_ip"]])
+        assert prediction["prediction"] == label
+        assert prediction["probability"] == pytest.approx(score, rel=1e-12, abs=1e-300)
+    assert client.post("/api/prediction/run", json={"client_ip": "10.0.0.5"}).status_code == 400
+    assert client.post("/api/prediction/run", json={"client_ip": "10.0.0.99"}).status_code == 404
+
+
+def test_batch_route_validates_body(client):
+    assert client.post("/api/prediction/run-batch", json={"period": "ano"}).status_code == 400
+    assert client.post("/api/prediction/run-batch", json={"client_ips": "10.0.0.2"}).status_code == 400
@@ -0,0 +1,146 @@
+import threading
+import psycopg2
+import pytest
+from psycopg2 import extensions
+from app.db import ConnectionPool
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.commits = 0
+        self.rollbacks = 0
+        self.fail_ping = False
+        self.on_ping = None
+
+    def cursor(self):
+        conn = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql):
+                if conn.on_ping:
+                    conn.on_ping()
+                if conn.fail_ping:
+                    raise RuntimeError("conexão perdida")
+
+        return Cursor()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commits += 1
+        else:
+            self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+def _pool(**kwargs):
+    opened = []
+
+    def connect():
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    return ConnectionPool(connect, **kwargs), opened
+
+
+def test_connections_are_reused_and_committed():
+    pool, opened = _pool(size=2)
+    for _ in range(5):
+        with pool.connection() as conn:
+            pass
+    assert len(opened) == 1
+    assert conn.commits == 5 and not conn.closed
+
+
+def test_broken_and_expired_connections_are_replaced():
+    pool, opened = _pool(size=2, max_lifetime=3600)
+    with pool.connection() as conn:
+        conn.closed = 2
+    with pytest.raises(psycopg2.OperationalError):
+        with pool.connection():
+            raise psycopg2.OperationalError("servidor encerrou a conexão")
+    assert len(opened) == 2 and len(pool) == 0
+
+    pool.max_lifetime = -1
+    with pool.connection():
+        pass
+    assert len(opened) == 3 and opened[2].closed and len(pool) == 0
+
+
+def test_connection_left_in_unknown_state_is_discarded():
+    pool, opened = _pool()
+    conn = pool.getconn()
+    conn.status = extensions.TRANSACTION_STATUS_UNKNOWN
+    pool.putconn(conn)
+    assert conn.closed and len(pool) == 0
+
+
+def test_idle_connection_failing_health_check_is_discarded():
+    pool, opened = _pool(check_idle=-1)
+    with pool.connection() as conn:
+        pass
+    conn.fail_ping = True
+    with pool.connection() as second:
+        pass
+    assert second is not conn and conn.closed
+
+
+def test_health_check_runs_outside_the_pool_lock():
+    pool, opened = _pool(check_idle=-1)
+    idle, held = pool.getconn(), pool.getconn()
+    pool.putconn(idle)
+    returned = []
+    def ping():
+        # Durante o SELECT 1, outra thread consegue devolver a conexão dela
+        other = threading.Thread(target=lambda: returned.append(pool.putconn(held)))
+        other.start()
+        other.join(1)
+    idle.on_ping = ping
+
+    assert pool.getconn() is idle
+    assert returned == [None] and pool._idle[0][0] is held
+
+
+def test_exception_rolls_back_and_returns_connection():
+    pool, opened = _pool()
+    with pytest.raises(ValueError):
+        with pool.connection():
+            raise ValueError("falha na consulta")
+    assert opened[0].rollbacks == 1
+    with pool.connection() as conn:
+        assert conn is opened[0]
+
+
+def test_pool_blocks_at_size_and_times_out():
+    pool, opened = _pool(size=1, timeout=0.05)
+    conn = pool.getconn()
+    with pytest.raises(RuntimeError):
+        pool.getconn()
+
+    pool.timeout = 5
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.getconn()))
+    waiter.start()
+    pool.putconn(conn)
+    waiter.join(2)
+    assert got == [conn] and len(opened) == 1
@@ -0,0 +1,180 @@
+import threading
+import time
+from datetime import datetime, timedelta
+import psycopg2
+from app.models.traffic_model import TrafficLog
+from app.services.db_writer import DbWriter, decode_batch
+from app.services.spill_log import SpillLog
+
+START = datetime(2024, 1, 1)
+
+
+class FakeDatabase:
+    """
+    Banco que pode ser derrubado: com `down`, toda gravação falha como uma conexão recusada.
+    """
+    def __init__(self):
+        self.down = False
+        self.rows = []
+        self.lock = threading.Lock()
+
+    def write(self, batch):
+        with self.lock:
+            if self.down:
+                raise psycopg2.OperationalError("connection refused")
+            logs, _flows = decode_batch(batch)
+            self.rows.extend((log.client_ip, log.inbound, log.created_at) for log in logs)
+
+
+def _window(index, clients=3):
+    created_at = START + timedelta(seconds=5 * index)
+    return [TrafficLog(f"10.0.{index}.{c}", index * 10 + c, 0, {"TCP": index}, "10.0.0.1", created_at=created_at)
+            for c in range(clients)]
+
+
+def _expected(windows):
+    return [(log.client_ip, log.inbound, log.created_at) for w in windows for log in w]
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_no_rows_lost_when_database_dies_mid_run(tmp_path):
+    database = FakeDatabase()
+    writer = DbWriter(database.write, str(tmp_path), queue_size=4, retry_interval=0.02)
+    writer.start()
+    windows = [_window(i) for i in range(30)]
+
+    for i, window in enumerate(windows):
+        if i == 10:
+            assert _wait_for(lambda: len(database.rows) == 30)
+            database.down = True
+        if i == 22:
+            # Banco volta: o que ficou em disco é relido antes dos lotes novos
+            assert writer.stats()["spill_bytes"] > 0
+            database.down = False
+        writer.submit(window)
+        time.sleep(0.005)
+
+    assert _wait_for(lambda: len(database.rows) == 90)
+    time.sleep(0.05)
+    assert database.rows == _expected(windows)
+    stats = writer.stats()
+    assert stats["queue_depth"] == 0 and stats["spill_bytes"] == 0 and stats["spilled_batches"] > 0
+
+
+def test_full_queue_spills_without_blocking_and_keeps_order(tmp_path):
+    database = FakeDatabase()
+    writer = DbWriter(database.write, str(tmp_path), queue_size=2)
+    windows = [_window(i) for i in range(7)]
+    for window in windows:
+        writer.submit(window)
+    assert writer.stats()["queue_depth"] < 2 and writer.spill.pending()
+
+    assert writer.drain()
+    assert database.rows == _expected(windows)
+    assert not writer.spill.pending()
+
+
+def test_spill_survives_restart_without_duplicates(tmp_path):
+    database = FakeDatabase()
+    spill = SpillLog(str(tmp_path), segment_bytes=200)
+    for i in range(5):
+        spill.append({"traffic": [[f"10.0.0.{i}", i, 0, {}, None, 1.0, START.isoformat()]], "flows": []})
+    assert len(spill._segments()) > 1
+
+    # Primeira execução grava dois lotes e cai
+    calls = []
+    def flaky(batch):
+        if len(calls) == 2:
+            raise psycopg2.OperationalError("server closed the connection")
+        calls.append(batch)
+        database.write(batch)
+    try:
+        spill.replay(flaky)
+    except psycopg2.OperationalError:
+        pass
+
+    # Nova execução (novo processo) retoma do cursor
+    assert DbWriter(database.write, str(tmp_path)).drain()
+    assert [row[0] for row in database.rows] == [f"10.0.0.{i}" for i in range(5)]
+    assert SpillLog(str(tmp_path)).size() == 0
+
+
+def test_rejected_batch_goes_to_dead_letter_and_later_batches_are_written(tmp_path):
+    database = FakeDatabase()
+    poisoned = "10.0.3.0"
+    def write(batch):
+        if batch["traffic"][0][0] == poisoned:
+            raise psycopg2.DataError("integer out of range")
+        database.write(batch)
+
+    writer = DbWriter(write, str(tmp_path), queue_size=2)
+    windows = [_window(i) for i in range(8)]
+    for window in windows:
+        writer.submit(window)
+    # Um lote rejeitado direto da fila também não trava os seguintes
+    writer.submit([TrafficLog(poisoned, 1, 0, {}, "10.0.0.1", created_at=START)])
+    writer.submit(_window(8))
+    assert writer.drain()
+
+    assert database.rows == _expected([w for w in windows if w[0].client_ip != poisoned] + [_window(8)])
+    assert writer.stats()["dead_letter_batches"] == 2
+    dead = (tmp_path / "dead-letter.jsonl").read_text().splitlines()
+    assert len(dead) == 2 and all("DataError" in line for line in dead)
+    assert not writer.spill.pending()
+
+
+def test_corrupt_and_torn_lines_do_not_block_the_spill(tmp_path):
+    database = FakeDatabase()
+    spill = SpillLog(str(tmp_path))
+    batch = {"traffic": [["10.0.0.1", 1, 0, {}, None, 1.0, START.isoformat()]], "flows": []}
+    spill.append(batch)
+    segment = tmp_path / spill._segments()[0]
+    with open(segment, "a") as f:
+        f.write("{corrompido}\n")
+        # Queda no meio da gravação: a última linha fica sem o "\n"
+        f.write('{"traffic":[["10.0.0.9"')
+
+    # Novo processo: o próximo lote não pode ser colado na linha incompleta
+    spill = SpillLog(str(tmp_path))
+    batch2 = {"traffic": [["10.0.0.2", 2, 0, {}, None, 1.0, START.isoformat()]], "flows": []}
+    spill.append(batch2)
+    assert segment.read_text().endswith('"flows":[]}\n') and "10.0.0.9" not in segment.read_text()
+
+    spill.replay(database.write)
+    assert [row[0] for row in database.rows] == ["10.0.0.1", "10.0.0.2"]
+    assert spill.dead_lettered == 1 and not spill.pending()
+
+
+def test_batch_in_flight_stays_ahead_of_a_concurrent_spill(tmp_path):
+    database = FakeDatabase()
+    started, release = threading.Event(), threading.Event()
+    attempts = []
+    def write(batch):
+        attempts.append(batch)
+        if len(attempts) == 1:
+            started.set()
+            release.wait()
+            raise psycopg2.OperationalError("server closed the connection")
+        database.write(batch)
+
+    writer = DbWriter(write, str(tmp_path), queue_size=2)
+    windows = [_window(i) for i in range(6)]
+    writer.submit(windows[0])
+    drainer = threading.Thread(target=writer.drain)
+    drainer.start()
+    assert started.wait(5)
+    # Enquanto o primeiro lote está sendo gravado, a fila enche e vai para o disco
+    for window in windows[1:]:
+        writer.submit(window)
+    assert writer.spill.pending()
+    release.set()
+    drainer.join()
+
+    assert writer.drain()
+    assert database.rows == _expected(windows)
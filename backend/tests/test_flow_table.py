@@ -0,0 +1,82 @@
+import socket
+import tracemalloc
+from scapy.all import Ether, IP, TCP, UDP, Raw
+from app.services import sniffing_service
+from app.services.aggregation import TrafficShard
+from app.services.flow_table import FlowTable, pack_flow_key
+
+SERVER = sniffing_service.SERVER_IP
+
+
+def _key(client, sport, dport=443, proto=6):
+    return pack_flow_key(socket.inet_aton(client), socket.inet_aton(SERVER), sport, dport, proto)
+
+
+def test_flow_counters_and_idle_eviction():
+    table = FlowTable(capacity=16, idle_timeout=10, active_timeout=1000)
+    table.update(_key("10.0.0.2", 1111), 100, now=1.0)
+    table.update(_key("10.0.0.2", 1111), 50, now=2.0)
+    table.update(_key("10.0.0.3", 2222), 70, now=8.0)
+
+    table.sweep(now=15.0)
+    assert len(table) == 1
+    assert table.drain() == [("10.0.0.2", SERVER, 1111, 443, 6, 150, 2, 1.0, 2.0, "idle")]
+
+
+def test_active_timeout_exports_long_flows():
+    table = FlowTable(capacity=16, idle_timeout=100, active_timeout=30)
+    for second in range(0, 40, 5):
+        table.update(_key("10.0.0.2", 1111), 10, now=float(second))
+
+    expired = table.drain()
+    assert [f[-1] for f in expired] == ["active"]
+    assert expired[0][5] == 70
+    assert len(table) == 1
+
+
+def test_full_table_evicts_least_recently_seen_flow():
+    table = FlowTable(capacity=2, idle_timeout=100, active_timeout=1000)
+    table.update(_key("10.0.0.2", 1), 10, now=1.0)
+    table.update(_key("10.0.0.3", 2), 10, now=1.1)
+    table.update(_key("10.0.0.2", 1), 10, now=1.2)
+    table.update(_key("10.0.0.4", 3), 10, now=1.3)
+
+    assert [(f[0], f[-1]) for f in table.drain()] == [("10.0.0.3", "capacity")]
+    assert len(table) == 2
+
+
+def test_port_scan_keeps_memory_bounded():
+    table = FlowTable(capacity=4096, idle_timeout=15, active_timeout=300, export_limit=20000)
+    client = socket.inet_aton("10.9.9.9")
+    server = socket.inet_aton(SERVER)
+
+    tracemalloc.start()
+    for i in range(50000):
+        table.update(pack_flow_key(client, server, 40000, i % 65536, 6), 60, now=1000.0)
+    _, warmup_peak = tracemalloc.get_traced_memory()
+    for i in range(50000, 300000):
+        table.update(pack_flow_key(client, server, 40000 + i // 65536, i % 65536, 6), 60, now=1000.0 + i / 1e5)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert len(table) == 4096
+    assert len(table.expired) == 20000
+    assert table.dropped == 300000 - 4096 - 20000
+    # Depois que a tabela e a fila de exportação enchem, a memória não cresce mais
+    assert peak < warmup_peak * 1.1
+
+
+def test_process_frame_tracks_ports():
+    shard = TrafficShard(track_flows=True)
+    frame = bytes(Ether() / IP(src="10.0.0.2", dst=SERVER) / UDP(sport=5353, dport=53) / Raw(b"q" * 10))
+    sniffing_service.process_frame(frame, shard, ts=10.0)
+    sniffing_service.process_packet(Ether(frame), shard, ts=11.0)
+    sniffing_service.process_frame(bytes(Ether() / IP(src=SERVER, dst="10.0.0.2") / TCP(sport=22, dport=5000)),
+                                   shard, ts=12.0)
+
+    shard.flows.expire_all()
+    flows = {f[:5]: f[5:7] for f in shard.flows.drain()}
+    assert flows == {
+        ("10.0.0.2", SERVER, 5353, 53, 17): (2 * len(frame), 2),
+        (SERVER, "10.0.0.2", 22, 5000, 6): (54, 1),
+    }
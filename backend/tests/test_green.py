@@ -0,0 +1,13 @@
+from app import socketio
+from app.green import run_blocking
+
+
+def test_run_blocking_calls_directly_in_threading_mode():
+    assert run_blocking(divmod, 7, 2) == (3, 1)
+    assert run_blocking(dict, a=1) == {"a": 1}
+
+
+def test_latency_probe_echoes_with_ack(app):
+    client = socketio.test_client(app)
+    assert client.emit("latency_probe", 123.5, callback=True) == 123.5
+    client.disconnect()
@@ -0,0 +1,98 @@
+import csv
+import random
+import tracemalloc
+from unittest.mock import MagicMock
+from app.models.traffic_model import TrafficLog
+from app.services.aggregation import TrafficShard, merge_frozen
+from app.services.heavy_hitters import HeavyHitters, OTHERS_KEY, merge_snapshots
+
+SERVER = "10.0.0.1"
+HEAVY = {f"203.0.113.{i}": 1500 * (i + 1) for i in range(5)}
+
+
+def _flood(table, packets, rng, heavy_every=10):
+    """
+    Flood de origem forjada (60 bytes, fonte aleatória) com alguns clientes pesados no meio.
+    """
+    sent = dict.fromkeys(HEAVY, 0)
+    total = 0
+    for i in range(packets):
+        if i % heavy_every == 0:
+            client = list(HEAVY)[(i // heavy_every) % len(HEAVY)]
+            size = HEAVY[client]
+            sent[client] += size
+        else:
+            client = f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}"
+            size = 60
+        table.add((SERVER, client), "Entrada", "TCP", size)
+        total += size
+    return sent, total
+
+
+def test_heavy_hitters_keep_top_clients_within_error_bound():
+    table = HeavyHitters(top_k=50, width=1024, depth=4)
+    sent, total = _flood(table, 100000, random.Random(7))
+    traffic = table.freeze().traffic()
+
+    assert len(traffic) <= 51
+    assert sum(d["Entrada"] for d in traffic.values()) == total
+    for client, size in sent.items():
+        entry = traffic[(SERVER, client)]
+        assert entry["Entrada"] <= size <= entry["Entrada"] + entry["erro"]
+    assert traffic[OTHERS_KEY]["Entrada"] > 0
+
+
+def test_heavy_hitters_memory_does_not_grow_with_sources():
+    table = HeavyHitters(top_k=200, width=2048, depth=4)
+    rng = random.Random(3)
+    tracemalloc.start()
+    _flood(table, 20000, rng)
+    _, warmup_peak = tracemalloc.get_traced_memory()
+    _flood(table, 80000, rng)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert len(table) == 200
+    assert peak < warmup_peak * 1.1
+
+
+def test_sketch_snapshots_merge_across_workers():
+    shards = [TrafficShard(track_flows=False, sketch=True) for _ in range(3)]
+    for shard in shards:
+        shard.data = HeavyHitters(top_k=20, width=512, depth=4)
+    sent = dict.fromkeys(HEAVY, 0)
+    total = 0
+    for n, shard in enumerate(shards):
+        shard_sent, shard_total = _flood(shard.data, 20000, random.Random(n))
+        total += shard_total
+        for client, size in shard_sent.items():
+            sent[client] += size
+
+    snapshots = [shard.freeze() for shard in shards]
+    merged = merge_snapshots(snapshots)
+    traffic = merge_frozen(snapshots)
+
+    assert len(merged.entries) <= 20
+    assert sum(d["Entrada"] for d in traffic.values()) == merged.total == total
+    for client, size in sent.items():
+        entry = traffic[(SERVER, client)]
+        assert entry["Entrada"] <= size <= entry["Entrada"] + entry["erro"]
+
+
+def test_others_row_above_int4_is_copied_exactly():
+    # Flood de 5 s acima de ~3.4 Gbit/s: só a linha "outros" passa de 2^31 bytes
+    table = HeavyHitters(top_k=2, width=256, depth=4)
+    for i in range(50):
+        table.add((SERVER, f"198.51.100.{i}"), "Entrada", "UDP", 60_000_000)
+    traffic = table.freeze().traffic()
+    others = traffic[OTHERS_KEY]["Entrada"]
+    assert others > 2 ** 31
+
+    cursor = MagicMock()
+    sent = []
+    cursor.copy_expert.side_effect = lambda sql, stream: sent.append(stream.read())
+    TrafficLog.save_many(cursor, [TrafficLog(ip, d["Entrada"], d["Saída"], d["protocolos"], server_ip)
+                                  for (server_ip, ip), d in traffic.items()], "copy")
+    rows = {row[0]: row for row in csv.reader(sent[0].splitlines())}
+    assert int(rows["outros"][1]) == others
+    assert rows["outros"][4] == "{" + str(others) + "}"
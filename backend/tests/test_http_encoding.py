@@ -0,0 +1,64 @@
+import gzip
+import pytest
+from unittest.mock import MagicMock, patch
+
+LOGS = [MagicMock(client_ip=f"10.0.0.{i}", server_ip="10.0.0.1", inbound=100 * i, outbound=50, protocols={"TCP": 10})
+        for i in range(100)]
+
+
+def _get_traffic(client, **headers):
+    with patch("app.routes.traffic_routes.TrafficController.aggregate_realtime", return_value=LOGS), \
+         patch("app.routes.traffic_routes.TrafficController.sampling_rate", return_value=1.0):
+        return client.get("/api/traffic", headers=headers)
+
+
+def test_content_etag_and_not_modified(client):
+    first = _get_traffic(client)
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and etag
+
+    second = _get_traffic(client, **{"If-None-Match": etag})
+    assert second.status_code == 304 and second.data == b""
+    assert "Accept-Encoding" in second.headers["Vary"]
+
+
+def test_gzip_negotiated_by_accept_encoding(client):
+    plain = _get_traffic(client)
+    compressed = _get_traffic(client, **{"Accept-Encoding": "gzip"})
+
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+    # A ETag de qualquer codificação serve para o 304
+    assert _get_traffic(client, **{"If-None-Match": compressed.headers["ETag"]}).status_code == 304
+
+
+def test_small_and_error_responses_are_not_compressed(client):
+    response = client.get("/api/traffic/aggregate?period=invalid", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 400 and "Content-Encoding" not in response.headers
+
+
+def test_msgpack_representation(client):
+    msgpack = pytest.importorskip("msgpack")
+    plain = _get_traffic(client)
+    packed = _get_traffic(client, Accept="application/msgpack")
+
+    assert packed.mimetype == "application/msgpack"
+    assert msgpack.unpackb(packed.data) == plain.get_json()
+    assert packed.headers["ETag"] != plain.headers["ETag"]
+
+
+def test_brotli_preferred_when_available(client):
+    brotli = pytest.importorskip("brotli")
+    response = _get_traffic(client, **{"Accept-Encoding": "gzip, br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert brotli.decompress(response.data) == _get_traffic(client).data
+
+
+def test_cached_route_answers_304_without_database(client, mock_get_connection):
+    cursor, _ = mock_get_connection(rows=[])
+    first = client.get("/api/traffic/aggregate?period=week")
+    assert first.headers["ETag"].startswith('"') and "-traffic-" in first.headers["ETag"]
+
+    again = client.get("/api/traffic/aggregate?period=week", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304 and cursor.execute.call_count == 1
@@ -0,0 +1,136 @@
+import pytest
+from app import socketio
+from app.services import live_updates as live
+from app.services.live_updates import LiveUpdates, parse_room
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Outbox:
+    def __init__(self):
+        self.sent = []
+
+    def __call__(self, event, data, to, callback):
+        self.sent.append((to, event, data, callback))
+
+    def pop(self):
+        sent, self.sent = self.sent, []
+        return sent
+
+
+def _item(client_ip, inbound, outbound=0, server_ip="10.0.0.1"):
+    return {"client_ip": client_ip, "server_ip": server_ip, "inbound": inbound, "outbound": outbound,
+            "protocols": {"TCP": inbound + outbound}}
+
+
+def test_parse_room_normalizes_and_rejects():
+    assert parse_room("all") == "all"
+    assert parse_room("ip:2001:db8:0::1") == "ip:2001:db8::1"
+    assert parse_room("top:05") == "top:5"
+    for room in ("ip:abc", "top:0", f"top:{live.LIVE_TOP_MAX + 1}", "outra"):
+        with pytest.raises(ValueError):
+            parse_room(room)
+
+
+def test_deltas_carry_only_changes_per_room():
+    outbox = Outbox()
+    updates = LiveUpdates(outbox, clock=FakeClock())
+    updates.publish([_item("10.0.0.2", 100), _item("10.0.0.3", 50)])
+    snapshot = updates.subscribe("a", ["ip:10.0.0.2", "top:1"])
+    assert snapshot["rooms"]["ip:10.0.0.2"] == {"seq": 0, "items": [_item("10.0.0.2", 100)]}
+    assert snapshot["rooms"]["top:1"]["items"] == [_item("10.0.0.2", 100)]
+
+    # 10.0.0.2 não mudou; 10.0.0.3 passa a liderar o top:1
+    updates.publish([_item("10.0.0.2", 100), _item("10.0.0.3", 500)])
+    [(sid, event, data, ack)] = outbox.pop()
+    assert (sid, event) == ("a", "traffic_delta")
+    assert data["rooms"] == {"top:1": {"seq": 1, "upsert": [_item("10.0.0.3", 500)],
+                                       "remove": [["10.0.0.1", "10.0.0.2"]]}}
+
+    # Nada mudou nas salas: nenhuma mensagem
+    ack()
+    updates.publish([_item("10.0.0.2", 100), _item("10.0.0.3", 500), _item("10.0.0.4", 1)])
+    assert outbox.pop() == []
+
+
+def test_identical_room_sets_share_one_encoded_message():
+    outbox = Outbox()
+    updates = LiveUpdates(outbox, clock=FakeClock())
+    updates.subscribe("a", ["all"])
+    updates.subscribe("b", ["all"])
+    updates.publish([_item("10.0.0.2", 1)])
+    [(_, _, first, _), (_, _, second, _)] = outbox.pop()
+    assert first is second
+
+
+def test_slow_consumer_is_coalesced_into_one_snapshot():
+    outbox = Outbox()
+    clock = FakeClock()
+    updates = LiveUpdates(outbox, ack_timeout=30, clock=clock)
+    updates.subscribe("lento", ["all"])
+    updates.subscribe("rapido", ["all"])
+
+    acks = {}
+    for inbound in (1, 2, 3):
+        updates.publish([_item("10.0.0.2", inbound)])
+        for sid, event, data, ack in outbox.pop():
+            acks[sid] = (event, data)
+            if sid == "rapido":
+                ack()
+    # O cliente lento recebeu só o primeiro delta; os outros dois foram aglutinados
+    assert acks["lento"][1]["rooms"]["all"]["seq"] == 1
+    assert acks["rapido"][1]["rooms"]["all"]["seq"] == 3
+
+    updates.ack("lento")
+    [(sid, event, data, _)] = outbox.pop()
+    assert (sid, event) == ("lento", "traffic_snapshot")
+    assert data["rooms"]["all"] == {"seq": 3, "items": [_item("10.0.0.2", 3)]}
+
+
+def test_lost_ack_times_out_into_a_snapshot():
+    outbox = Outbox()
+    clock = FakeClock()
+    updates = LiveUpdates(outbox, ack_timeout=30, clock=clock)
+    updates.subscribe("a", ["all"])
+    updates.publish([_item("10.0.0.2", 1)])
+    outbox.pop()
+
+    clock.now = 31
+    updates.publish([_item("10.0.0.2", 1)])
+    [(_, event, data, _)] = outbox.pop()
+    assert event == "traffic_snapshot" and data["rooms"]["all"]["seq"] == 1
+
+
+@pytest.mark.skipif(live.msgpack is None, reason="msgpack não instalado")
+def test_binary_subscribers_receive_msgpack():
+    outbox = Outbox()
+    updates = LiveUpdates(outbox, clock=FakeClock())
+    updates.subscribe("a", ["all"], binary=True)
+    updates.publish([_item("10.0.0.2", 1)])
+    [(_, _, data, _)] = outbox.pop()
+    assert live.msgpack.unpackb(data)["rooms"]["all"]["upsert"] == [_item("10.0.0.2", 1)]
+
+
+def test_subscribe_event_moves_client_out_of_full_broadcast(app, monkeypatch):
+    updates = LiveUpdates(Outbox(), clock=FakeClock())
+    monkeypatch.setattr("app.socket_events.live_updates", updates)
+    updates.publish([_item("10.0.0.2", 7)])
+    client = socketio.test_client(app)
+
+    assert "error" in client.emit("traffic_subscribe", {"rooms": ["top:0"]}, callback=True)
+    snapshot = client.emit("traffic_subscribe", {"rooms": ["ip:10.0.0.2"]}, callback=True)
+    assert snapshot["rooms"]["ip:10.0.0.2"]["items"] == [_item("10.0.0.2", 7)]
+    assert client.emit("traffic_snapshot", callback=True) == snapshot
+
+    socketio.emit("traffic_update", {"traffic": []}, to=live.FULL_ROOM)
+    assert client.get_received() == []
+    client.emit("traffic_subscribe", {"rooms": []}, callback=True)
+    socketio.emit("traffic_update", {"traffic": []}, to=live.FULL_ROOM)
+    assert [event["name"] for event in client.get_received()] == ["traffic_update"]
+    client.disconnect()
@@ -0,0 +1,61 @@
+from scapy.all import Ether, IP, TCP, Raw
+from app import metrics
+from app.services import sniffing_service
+from app.services.aggregation import TrafficShard
+from app.services.packet_ring import PacketRing
+
+SERVER = sniffing_service.SERVER_IP
+
+
+def _samples(text, name):
+    """
+    Valores das linhas `name{...} valor` do texto exposto.
+    """
+    values = {}
+    for line in text.splitlines():
+        if line.startswith(name) and not line.startswith("#"):
+            series, value = line.rsplit(" ", 1)
+            values[series] = float(value)
+    return values
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = metrics.Registry()
+    histogram = registry.histogram("test_seconds", "Teste", buckets=(0.1, 1.0), labels=("route",))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, "/api/x")
+
+    text = registry.render()
+    assert "# TYPE traffic_monitor_test_seconds histogram" in text
+    samples = _samples(text, "traffic_monitor_test_seconds")
+    assert samples['traffic_monitor_test_seconds_bucket{route="/api/x",le="0.1"}'] == 1
+    assert samples['traffic_monitor_test_seconds_bucket{route="/api/x",le="1.0"}'] == 3
+    assert samples['traffic_monitor_test_seconds_bucket{route="/api/x",le="+Inf"}'] == 4
+    assert samples['traffic_monitor_test_seconds_count{route="/api/x"}'] == 4
+    assert samples['traffic_monitor_test_seconds_sum{route="/api/x"}'] == 6.05
+
+
+def test_batch_path_records_packet_time_per_packet():
+    shard = TrafficShard(track_flows=False)
+    ring = PacketRing(64)
+    for i in range(10):
+        ring.append(bytes(Ether() / IP(src=f"10.1.0.{i}", dst=SERVER) / TCP() / Raw(b"a" * 10)), 1.0)
+    sniffing_service.process_ring(ring, shard)
+
+    assert sum(shard.timings()["packet_time"]) == 10
+    assert shard.timings()["packet_time_sum"] > 0
+    # O histograma não entra nos contadores comparados entre os caminhos de captura
+    assert "packet_time" not in shard.counters()
+
+
+def test_metrics_endpoint_exposes_capture_and_route_metrics(client):
+    client.get("/api/traffic/capture")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+    assert "traffic_monitor_packets_seen_total " in text
+    assert "# TYPE traffic_monitor_packet_processing_seconds histogram" in text
+    samples = _samples(text, "traffic_monitor_http_request_seconds_count")
+    assert samples['traffic_monitor_http_request_seconds_count{method="GET",route="/api/traffic/capture",status="200"}'] >= 1
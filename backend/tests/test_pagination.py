@@ -0,0 +1,60 @@
+import json
+from datetime import datetime
+from unittest.mock import MagicMock
+import pytest
+from app.services.pagination import decode_cursor, encode_cursor, iter_query, stream_json, stream_ndjson
+
+
+def test_cursor_round_trip():
+    moment = datetime(2024, 1, 1, 12, 0, 5, 250000)
+    token = encode_cursor([moment, 42])
+    assert "=" not in token
+    assert decode_cursor(token, 2) == [moment, 42]
+    assert decode_cursor(encode_cursor([moment, "", "10.0.0.2"]), 3) == [moment, "", "10.0.0.2"]
+
+
+@pytest.mark.parametrize("token", ["???", encode_cursor([1, 2]), encode_cursor(["2024-01-01T00:00:00"]), "e30"])
+def test_decode_cursor_rejects_bad_tokens(token):
+    with pytest.raises(ValueError, match="Cursor inválido"):
+        decode_cursor(token, 2)
+
+
+def test_iter_query_uses_server_side_cursor():
+    cursor = MagicMock()
+    cursor.__iter__.return_value = iter([(1,), (2,)])
+    conn = MagicMock()
+    conn.__enter__.return_value = conn
+    conn.cursor.return_value.__enter__.return_value = cursor
+
+    rows = iter_query(lambda: conn, "SELECT 1", [], fetch_size=500)
+    conn.cursor.assert_not_called()  # nada é lido antes de a resposta começar
+
+    assert list(rows) == [(1,), (2,)]
+    assert conn.cursor.call_args.kwargs["name"].startswith("stream_")
+    assert cursor.itersize == 500
+    cursor.fetchall.assert_not_called()
+
+
+def test_stream_json_matches_plain_body():
+    items = [{"a": 1}, {"a": 2}]
+    body = "".join(stream_json(iter(items), "traffic", {"resolution": "raw"}))
+    assert json.loads(body) == {"resolution": "raw", "traffic": items}
+    assert json.loads("".join(stream_json(iter([]), "captures", {}))) == {"captures": []}
+
+
+def test_stream_json_reports_error_in_a_valid_body():
+    def items():
+        yield {"a": 1}
+        raise RuntimeError("conexão perdida")
+
+    body = "".join(stream_json(items(), "traffic", {"resolution": "raw"}))
+    assert json.loads(body) == {"resolution": "raw", "traffic": [{"a": 1}], "error": "conexão perdida"}
+
+
+def test_stream_ndjson_reports_error_as_last_line():
+    def items():
+        yield {"a": 1}
+        raise RuntimeError("conexão perdida")
+
+    lines = [json.loads(line) for line in "".join(stream_ndjson(items())).splitlines()]
+    assert lines == [{"a": 1}, {"error": "conexão perdida"}]
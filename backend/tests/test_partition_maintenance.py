@@ -0,0 +1,91 @@
+from datetime import datetime
+from unittest.mock import MagicMock
+from app.services import partition_maintenance as pm
+
+PARTITIONS = [
+    ("traffic_logs_default", "DEFAULT"),
+    ("traffic_logs_legacy", "FOR VALUES FROM (MINVALUE) TO ('2024-01-03 00:00:00')"),
+    ("traffic_logs_p20240103", "FOR VALUES FROM ('2024-01-03 00:00:00') TO ('2024-01-04 00:00:00')"),
+    ("traffic_logs_p20240104", "FOR VALUES FROM ('2024-01-04 00:00:00') TO ('2024-01-05 00:00:00')"),
+]
+
+
+def _cursor(partitions=PARTITIONS, default_has_rows=False):
+    cursor = MagicMock()
+    cursor.fetchall.return_value = partitions
+    cursor.fetchone.return_value = (default_has_rows,)
+    return cursor
+
+
+def _statements(cursor):
+    return [" ".join(call.args[0].split()) for call in cursor.execute.call_args_list]
+
+
+def test_list_partitions_parses_bounds_and_skips_default():
+    partitions = pm.list_partitions(_cursor())
+    assert [name for name, _lower, _upper in partitions] == [
+        "traffic_logs_legacy", "traffic_logs_p20240103", "traffic_logs_p20240104"]
+    assert partitions[0][1] is None and partitions[0][2] == datetime(2024, 1, 3)
+
+
+def test_ensure_partitions_creates_only_missing_days():
+    cursor = _cursor()
+    created = pm.ensure_partitions(cursor, datetime(2024, 1, 4, 15, 30), days_ahead=3)
+
+    assert created == ["traffic_logs_p20240105", "traffic_logs_p20240106", "traffic_logs_p20240107"]
+    create = cursor.execute.call_args_list[2]
+    assert create.args[0].startswith("CREATE TABLE IF NOT EXISTS traffic_logs_p20240105 PARTITION OF traffic_logs")
+    assert create.args[1] == (datetime(2024, 1, 5), datetime(2024, 1, 6))
+    assert not any("DETACH" in s for s in _statements(cursor))
+
+
+def test_create_partition_moves_rows_already_in_default():
+    cursor = _cursor(default_has_rows=True)
+    pm.create_partition(cursor, "traffic_logs_p20240105", datetime(2024, 1, 5), datetime(2024, 1, 6))
+
+    statements = _statements(cursor)
+    assert statements[1] == "ALTER TABLE traffic_logs DETACH PARTITION traffic_logs_default"
+    assert statements[2].startswith("CREATE TABLE IF NOT EXISTS traffic_logs_p20240105 PARTITION OF")
+    assert "DELETE FROM traffic_logs_default" in statements[3]
+    assert "INSERT INTO traffic_logs_p20240105 SELECT * FROM moved" in statements[3]
+    assert statements[4] == "ALTER TABLE traffic_logs ATTACH PARTITION traffic_logs_default DEFAULT"
+
+
+def test_run_maintenance_keeps_going_after_a_failed_day(monkeypatch):
+    cursor = _cursor()
+    conn = MagicMock()
+    conn.__enter__.return_value = conn
+    conn.cursor.return_value.__enter__.return_value = cursor
+    monkeypatch.setattr(pm, "get_connection", lambda: conn)
+    def create(cursor, name, lower, upper):
+        if name == "traffic_logs_p20240105":
+            raise RuntimeError("updated partition constraint for default partition would be violated")
+    monkeypatch.setattr(pm, "create_partition", create)
+    monkeypatch.setattr(pm, "drop_partition", lambda *args: None)
+    cursor.rowcount = 12
+
+    created, dropped, pruned = pm.run_maintenance(datetime(2024, 1, 11, 1), retention_days=7, days_ahead=0)
+    assert created == ["traffic_logs_p20240111"]
+    assert dropped == ["traffic_logs_legacy", "traffic_logs_p20240103"]
+    assert pruned == 12
+    assert cursor.execute.call_args.args == (
+        "DELETE FROM traffic_logs_default WHERE created_at < %s", (datetime(2024, 1, 4, 1),))
+
+
+def test_expired_partitions_follow_retention():
+    partitions = pm.list_partitions(_cursor())
+    now = datetime(2024, 1, 11, 1)
+    assert [p[0] for p in pm.expired_partitions(partitions, now, 7)] == ["traffic_logs_legacy", "traffic_logs_p20240103"]
+    assert pm.expired_partitions(partitions, now, 0) == []
+
+
+def test_drop_partition_rebuilds_rollups_then_drops():
+    cursor = MagicMock()
+    pm.drop_partition(cursor, "traffic_logs_p20240103", datetime(2024, 1, 3), datetime(2024, 1, 4))
+
+    statements = [call.args[0].strip() for call in cursor.execute.call_args_list]
+    assert statements[-1] == "DROP TABLE traffic_logs_p20240103"
+    assert not any(s.startswith("DELETE FROM traffic_logs_p") for s in statements)
+    rebuilt = [s for s in statements if s.startswith("INSERT INTO")]
+    assert [s.split()[2] for s in rebuilt] == ["traffic_logs_1m", "traffic_logs_1h", "traffic_logs_1d"]
+    assert all("FROM traffic_logs_p20240103 GROUP BY" in s for s in rebuilt)
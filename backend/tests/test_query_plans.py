@@ -0,0 +1,176 @@
+"""
+Regressão de planos das consultas das rotas. Roda só com um Postgres local em
+TEST_DATABASE_URL: cria o schema `query_plans`, aplica as migrações, carrega dados
+sintéticos, chama cada rota pelo cliente Flask gravando o SQL emitido e roda
+EXPLAIN (ANALYZE) em cada SELECT. Falha se alguma consulta fizer Seq Scan numa
+tabela com mais de SEQ_SCAN_MIN_ROWS linhas ou passar de PLAN_LATENCY_BUDGET_MS.
+
+    TEST_DATABASE_URL=postgresql://localhost/traffic_test python -m pytest tests/test_query_plans.py
+"""
+import os
+from urllib.parse import quote
+import psycopg2
+import pytest
+from psycopg2 import extensions
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+PLAN_LATENCY_BUDGET_MS = float(os.getenv("PLAN_LATENCY_BUDGET_MS", "50"))
+SEQ_SCAN_MIN_ROWS = int(os.getenv("SEQ_SCAN_MIN_ROWS", "10000"))
+SCHEMA = "query_plans"
+CLIENT = "10.9.0.7"
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="defina TEST_DATABASE_URL (Postgres local)")
+
+SYNTHETIC_DATA = [
+    # 400k linhas brutas de 2000 clientes nos últimos 2 dias
+    """INSERT INTO traffic_logs (client_ip, inbound, outbound, proto_ids, proto_bytes, created_at, server_ip)
+       SELECT '10.9.' || (n % 2000 / 256) || '.' || (n % 2000 % 256), n % 1500, n % 700,
+              '{256,257}', ARRAY[n % 1500, n % 700],
+              now() - n * interval '432 milliseconds', '10.0.0.1'
+       FROM generate_series(0, 399999) AS n""",
+    # Rollups: 50 clientes, 7 dias por minuto e 180 dias por hora
+    """INSERT INTO traffic_logs_1m (bucket, server_ip, client_ip, inbound, outbound, protocols, samples)
+       SELECT date_trunc('minute', now()) - (n / 50) * interval '1 minute', '10.0.0.1',
+              '10.9.0.' || (n % 50), 1000, 500, '{"TCP": 1500}', 12
+       FROM generate_series(0, 50 * 1440 * 7 - 1) AS n""",
+    """INSERT INTO traffic_logs_1h (bucket, server_ip, client_ip, inbound, outbound, protocols, samples)
+       SELECT date_trunc('hour', now()) - (n / 50) * interval '1 hour', '10.0.0.1',
+              '10.9.0.' || (n % 50), 60000, 30000, '{"TCP": 90000}', 720
+       FROM generate_series(0, 50 * 24 * 180 - 1) AS n""",
+    """INSERT INTO predictions (client_ip, prediction, probability, created_at)
+       SELECT '10.9.' || (n % 2000 / 256) || '.' || (n % 2000 % 256), 'normal', 0.1,
+              now() - n * interval '30 seconds'
+       FROM generate_series(0, 99999) AS n""",
+    """INSERT INTO flows (src_ip, dst_ip, src_port, dst_port, protocol, bytes, packets,
+                          first_seen, last_seen, end_reason)
+       SELECT '10.9.' || (n % 2000 / 256) || '.' || (n % 2000 % 256), '10.0.0.1', 40000 + n % 20000, 443, 6,
+              n % 100000, n % 100, now() - n * interval '2 seconds' - interval '10 seconds',
+              now() - n * interval '2 seconds', 'idle'
+       FROM generate_series(0, 199999) AS n""",
+]
+
+# (método, rota, corpo JSON): todas as rotas que consultam o banco
+ROUTES = [
+    ("get", "/api/traffic/aggregate?period=minute", None),
+    ("get", "/api/traffic/aggregate?period=hour", None),
+    ("get", "/api/traffic/aggregate?period=week", None),
+    ("get", "/api/traffic/aggregate?period=day&resolution=raw&limit=500", None),
+    ("get", "/api/traffic/aggregate?period=minute&bucket=10s&group_by=ip&top=10", None),
+    ("get", f"/api/traffic/aggregate?period=day&bucket=1h&group_by=protocol&ip={CLIENT}", None),
+    ("get", "/api/traffic/aggregate?period=week&bucket=6h", None),
+    ("get", "/api/traffic/flows?period=hour", None),
+    ("get", f"/api/traffic/flows?period=day&ip={CLIENT}", None),
+    ("get", "/api/traffic/protocols?period=minute", None),
+    ("get", f"/api/traffic/protocols?period=day&ip={CLIENT}", None),
+    ("get", f"/api/traffic/protocols/{CLIENT}", None),
+    ("get", f"/api/traffic/captures/{CLIENT}?limit=50", None),
+    ("get", "/api/prediction?limit=50", None),
+    ("get", f"/api/prediction/{CLIENT}", None),
+    ("post", "/api/prediction/run", {"client_ip": CLIENT}),
+    ("post", "/api/prediction/forecast", {"client_ip": CLIENT}),
+    ("post", "/api/prediction/forecast-arima", {"client_ip": CLIENT}),
+]
+
+
+def _schema_url(url):
+    separator = "&" if "?" in url else "?"
+    return f"{url}{separator}options={quote(f'-csearch_path={SCHEMA}')}"
+
+
+class RecordingCursor(extensions.cursor):
+    """
+    Cursor que guarda o SQL final (com os parâmetros) de cada execute.
+    """
+    recorded = []
+
+    def execute(self, query, vars=None):
+        RecordingCursor.recorded.append(self.mogrify(query, vars).decode())
+        return super().execute(query, vars)
+
+
+@pytest.fixture(scope="module")
+def plan_database():
+    alembic_command = pytest.importorskip("alembic.command")
+    from alembic.config import Config
+
+    admin = psycopg2.connect(TEST_DATABASE_URL)
+    admin.autocommit = True
+    with admin.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+
+    url = _schema_url(TEST_DATABASE_URL)
+    config = Config(os.path.join(os.path.dirname(__file__), "..", "alembic.ini"))
+    config.set_main_option("sqlalchemy.url", url.replace("postgresql://", "postgresql+psycopg2://", 1)
+                           .replace("%", "%%"))
+    alembic_command.upgrade(config, "head")
+
+    conn = psycopg2.connect(url)
+    with conn, conn.cursor() as cursor:
+        for statement in SYNTHETIC_DATA:
+            cursor.execute(statement)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute("VACUUM ANALYZE")
+    yield url, conn
+
+    conn.close()
+    with admin.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+    admin.close()
+
+
+def _plan_problems(cursor, sql):
+    cursor.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql)
+    plan = cursor.fetchone()[0][0]
+    problems = []
+
+    def walk(node):
+        if node["Node Type"] == "Seq Scan":
+            cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass", (node["Relation Name"],))
+            rows = cursor.fetchone()[0]
+            if rows > SEQ_SCAN_MIN_ROWS:
+                problems.append(f"Seq Scan em {node['Relation Name']} ({rows:,.0f} linhas)")
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan["Plan"])
+    if plan["Execution Time"] > PLAN_LATENCY_BUDGET_MS:
+        problems.append(f"{plan['Execution Time']:.1f} ms (limite {PLAN_LATENCY_BUDGET_MS:g} ms)")
+    return problems
+
+
+@pytest.mark.parametrize("method, route, body", ROUTES)
+def test_route_queries_use_indexes(plan_database, client, monkeypatch, method, route, body):
+    from app.db import ConnectionPool
+
+    url, conn = plan_database
+    pool = ConnectionPool(lambda: psycopg2.connect(url, cursor_factory=RecordingCursor), size=2)
+    monkeypatch.setattr("app.routes.traffic_routes.get_connection", pool.connection)
+    monkeypatch.setattr("app.routes.prediction_routes.get_connection", pool.connection)
+    RecordingCursor.recorded = []
+
+    response = getattr(client, method)(route, json=body) if body else getattr(client, method)(route)
+    pool.closeall()
+    assert response.status_code < 500, response.get_json()
+
+    selects = [sql for sql in RecordingCursor.recorded if sql.lstrip().upper().startswith("SELECT")]
+    assert selects, f"{route} não consultou o banco"
+    with conn.cursor() as cursor:
+        for sql in selects:
+            problems = _plan_problems(cursor, sql)
+            assert not problems, f"{route}: {sql}\n" + "\n".join(problems)
+
+
+def test_traffic_logs_accept_counters_above_int4(plan_database):
+    from app.models.traffic_model import TrafficLog
+    from app.services.heavy_hitters import OTHERS_CLIENT
+
+    _url, conn = plan_database
+    others = 3 * 2 ** 31
+    with conn.cursor() as cursor:
+        cursor.execute("BEGIN")
+        TrafficLog.save_many(cursor, [TrafficLog(OTHERS_CLIENT, others, others, {"UDP": others}, "10.0.0.1")], "copy")
+        cursor.execute("SELECT inbound, outbound FROM traffic_logs WHERE client_ip = %s", (OTHERS_CLIENT,))
+        assert cursor.fetchone() == (others, others)
+        cursor.execute("ROLLBACK")
@@ -0,0 +1,47 @@
+from datetime import datetime
+import pytest
+from scapy.all import Ether, IP, TCP, UDP, Raw, wrpcap
+from scapy.utils import wrpcapng
+from app.services import sniffing_service
+from app.services.replay_service import replay_captures
+
+SERVER = sniffing_service.SERVER_IP
+
+
+def _packets():
+    packets = []
+    for ts, client, size in [(1000.0, "10.0.0.2", 100), (1003.9, "10.0.0.2", 50),
+                             (1004.5, "10.0.0.3", 70), (1006.0, "10.0.0.2", 30),
+                             (1001.0, "10.0.0.2", 20)]:
+        packet = Ether() / IP(src=client, dst=SERVER) / TCP() / Raw(b"x" * size)
+        packet.time = ts
+        packets.append(packet)
+    reply = Ether() / IP(src=SERVER, dst="10.0.0.2") / UDP() / Raw(b"y" * 40)
+    reply.time = 1007.0
+    late = Ether() / IP(src="10.0.0.3", dst=SERVER) / TCP() / Raw(b"z" * 10)
+    late.time = 1030.0
+    return packets + [reply, late]
+
+
+@pytest.mark.parametrize("writer", [wrpcap, wrpcapng])
+def test_replay_buckets_packets_by_capture_time(tmp_path, writer):
+    path = tmp_path / "captura.cap"
+    packets = _packets()
+    writer(str(path), packets)
+
+    rows = []
+    stats = replay_captures([str(path)], rows.extend, interval=5)
+
+    by_key = {(created_at, log.client_ip): log for created_at, log in rows}
+    first = datetime.utcfromtimestamp(1005)
+    second = datetime.utcfromtimestamp(1010)
+    sizes = [len(p) for p in packets]
+
+    assert stats["packets"] == len(packets)
+    assert by_key[(first, "10.0.0.2")].inbound == sizes[0] + sizes[1] + sizes[4]
+    assert by_key[(first, "10.0.0.3")].inbound == sizes[2]
+    assert by_key[(second, "10.0.0.2")].inbound == sizes[3]
+    assert by_key[(second, "10.0.0.2")].outbound == sizes[5]
+    assert by_key[(second, "10.0.0.2")].protocols == {"TCP": sizes[3], "UDP": sizes[5]}
+    assert by_key[(datetime.utcfromtimestamp(1035), "10.0.0.3")].inbound == sizes[6]
+    assert stats["rows"] == len(rows) == 4
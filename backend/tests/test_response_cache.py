@@ -0,0 +1,103 @@
+import pytest
+from flask import Flask, jsonify, request
+from app.services.response_cache import CacheBackend, MemoryBackend, ResponseCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _app(cache, calls):
+    app = Flask(__name__)
+
+    @app.route('/items/<name>')
+    @cache.cached("traffic")
+    def items(name):
+        calls.append(name)
+        if name == "erro":
+            return jsonify({"error": "falhou"}), 500
+        return jsonify({"name": name, "page": request.args.get("page")})
+
+    return app.test_client()
+
+
+def test_cache_hits_until_ttl_and_keys_on_arguments():
+    clock = FakeClock()
+    cache = ResponseCache(MemoryBackend(clock=clock), ttl=5, enabled=True)
+    calls = []
+    client = _app(cache, calls)
+
+    assert client.get("/items/a?page=1").headers["X-Cache"] == "MISS"
+    response = client.get("/items/a?page=1")
+    assert response.headers["X-Cache"] == "HIT" and response.get_json() == {"name": "a", "page": "1"}
+    client.get("/items/a?page=2")
+    assert calls == ["a", "a"]
+
+    clock.now = 5
+    assert client.get("/items/a?page=1").headers["X-Cache"] == "MISS"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"]) == (1, 3, 1)
+
+
+def test_invalidate_and_errors_are_not_cached():
+    cache = ResponseCache(MemoryBackend(), ttl=60, enabled=True)
+    calls = []
+    client = _app(cache, calls)
+
+    client.get("/items/a")
+    cache.invalidate("prediction")
+    assert client.get("/items/a").headers["X-Cache"] == "HIT"
+    cache.invalidate("traffic")
+    assert client.get("/items/a").headers["X-Cache"] == "MISS"
+
+    client.get("/items/erro")
+    client.get("/items/erro")
+    assert calls == ["a", "a", "erro", "erro"]
+    assert client.get("/items/a?stream=ndjson").headers.get("X-Cache") is None
+
+
+def test_response_computed_during_invalidation_is_not_stored():
+    cache = ResponseCache(MemoryBackend(), ttl=60, enabled=True)
+    app = Flask(__name__)
+
+    @app.route('/slow')
+    @cache.cached("traffic")
+    def slow():
+        # Uma gravação termina enquanto a resposta é calculada com dados antigos
+        cache.invalidate("traffic")
+        return jsonify({"ok": True})
+
+    client = app.test_client()
+    client.get("/slow")
+    assert client.get("/slow").headers["X-Cache"] == "MISS"
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_entries=2)
+    backend.set("traffic", "a", 1, 60)
+    backend.set("traffic", "b", 2, 60)
+    assert backend.get("traffic", "a") == 1
+    backend.set("traffic", "c", 3, 60)
+
+    assert backend.get("traffic", "b") is None
+    assert backend.get("traffic", "a") == 1 and backend.get("traffic", "c") == 3
+    assert backend.stats()["evictions"] == 1
+
+
+def test_incomplete_backend_fails_on_creation():
+    class GetOnly(CacheBackend):
+        def get(self, namespace, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly()
+
+
+def test_cache_stats_route(client):
+    response = client.get("/api/cache")
+    assert response.status_code == 200
+    assert {"hits", "misses", "hit_ratio", "entries"} <= set(response.get_json())
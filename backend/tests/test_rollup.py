@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+from app.models.traffic_model import TrafficLog
+from app.services.rollup import bucket_start, rollup_rows, save_rollups, choose_source
+
+
+def _log(client, seconds, inbound, protocols, server_ip="10.0.0.1", rate=1.0):
+    return TrafficLog(client, inbound, 0, protocols, server_ip, sampling_rate=rate,
+                      created_at=datetime(2024, 1, 1, 12, 0) + timedelta(seconds=seconds))
+
+
+def test_bucket_start_matches_date_trunc():
+    moment = datetime(2024, 3, 5, 17, 42, 31, 500)
+    assert bucket_start(moment, timedelta(minutes=1)) == datetime(2024, 3, 5, 17, 42)
+    assert bucket_start(moment, timedelta(hours=1)) == datetime(2024, 3, 5, 17)
+    assert bucket_start(moment, timedelta(days=1)) == datetime(2024, 3, 5)
+
+
+def test_rollup_rows_merge_windows_and_protocols():
+    logs = [
+        _log("10.1.0.1", 5, 100, {"TCP": 100}),
+        _log("10.1.0.1", 10, 50, {"TCP": 30, "UDP": 20}, rate=4.0),
+        _log("10.1.0.1", 65, 7, {"ICMP": 7}),
+        _log("10.1.0.2", 5, 1, {"UDP": 1}, server_ip=None),
+    ]
+    minute = {(r[0], r[1], r[2]): r for r in rollup_rows(logs, timedelta(minutes=1))}
+    first = minute[(datetime(2024, 1, 1, 12, 0), "10.0.0.1", "10.1.0.1")]
+    assert first[3] == 150 and first[5].adapted == {"TCP": 130, "UDP": 20}
+    assert first[6] == 2 and first[7] == 4.0
+    assert minute[(datetime(2024, 1, 1, 12, 1), "10.0.0.1", "10.1.0.1")][3] == 7
+    # server_ip NULL vira '' (faz parte da chave primária)
+    assert (datetime(2024, 1, 1, 12, 0), "", "10.1.0.2") in minute
+
+    hour = rollup_rows(logs, timedelta(hours=1))
+    assert len(hour) == 2
+    assert sum(r[3] for r in hour) == 158
+
+
+def test_save_rollups_upserts_each_table_once():
+    cursor = MagicMock()
+    logs = [_log("10.1.0.1", i * 5, 10, {"TCP": 10}) for i in range(24)]
+    with patch("app.services.rollup.execute_values") as execute_values:
+        save_rollups(cursor, logs)
+
+    tables = [call.args[1].split()[2] for call in execute_values.call_args_list]
+    assert tables == ["traffic_logs_1m", "traffic_logs_1h", "traffic_logs_1d"]
+    assert [len(call.args[2]) for call in execute_values.call_args_list] == [2, 1, 1]
+    assert "ON CONFLICT (bucket, server_ip, client_ip)" in execute_values.call_args_list[0].args[1]
+
+
+def test_choose_source():
+    assert choose_source("raw") == ("traffic_logs", None)
+    assert choose_source("hour") == ("traffic_logs_1h", timedelta(hours=1))
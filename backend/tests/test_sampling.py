@@ -0,0 +1,115 @@
+import math
+import random
+import struct
+from scapy.all import Ether
+from app.services import sniffing_service
+from app.services.aggregation import TrafficShard, freeze_traffic
+from app.services.sampling import AdaptiveSampler
+
+SERVER = sniffing_service.SERVER_IP
+
+
+def _frame(client, size):
+    ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, size - 14, 0, 0, 64, 6, 0,
+                     struct.pack("!I", 0x0A640000 + client), bytes(map(int, SERVER.split("."))))
+    tcp = struct.pack("!HHIIBBHHH", 40000 + client, 443, 0, 0, 0x50, 0x10, 1024, 0, 0)
+    return b"\x00" * 12 + b"\x08\x00" + ip + tcp + b"x" * (size - 54)
+
+
+def test_sampler_backs_off_under_overload_and_recovers():
+    # Modelo: 100k pacotes/s chegando; contabilizar custa 20 us e descartar 2 us
+    sampler = AdaptiveSampler(max_rate=64, lag_threshold=0.5, interval=1.0)
+    arrival, full_cost, skip_cost = 100000, 20e-6, 2e-6
+    backlog = 0.0
+    rates, lags = [], []
+    for second in range(60):
+        rate = sampler.adjust(float(second))
+        work = (arrival + backlog) * (skip_cost + full_cost / rate)
+        backlog = max(0.0, (arrival + backlog) * (1 - 1 / work)) if work > 1 else 0.0
+        lag = backlog / arrival
+        sampler.observe(lag=lag)
+        rates.append(rate)
+        lags.append(lag)
+
+    assert rates[0] == 1
+    # 1-em-4 já dá conta (0.7 s de trabalho por segundo); a taxa nunca passa de 8
+    assert max(rates) <= 8
+    assert 4 in rates[5:]
+    assert max(lags[20:]) < 2.0
+
+    for second in range(60, 70):
+        sampler.observe(lag=0.0)
+        sampler.adjust(float(second))
+    assert sampler.rate == 1
+
+
+def test_sampled_counts_stay_within_error_bound():
+    rng = random.Random(11)
+    rate = 8
+    packets = [(rng.randrange(10), rng.randrange(64, 1500)) for _ in range(40000)]
+
+    shard = TrafficShard(track_flows=True)
+    shard.set_sampling_rate(rate)
+    for client, size in packets:
+        sniffing_service.process_frame(_frame(client, size), shard, ts=1.0)
+
+    estimated = freeze_traffic(shard.data)
+    for client in range(10):
+        sizes = [size for c, size in packets if c == client]
+        true_total = sum(sizes)
+        # Desvio padrão da estimativa 1-em-N (ordem aleatória): sqrt((N - 1) * soma(s^2))
+        bound = 4 * math.sqrt((rate - 1) * sum(s * s for s in sizes))
+        entry = estimated[(SERVER, f"10.100.0.{client}")]
+        assert abs(entry["Entrada"] - true_total) <= bound
+        assert bound / true_total < 0.25
+
+    true_total = sum(size for _client, size in packets)
+    bound = 4 * math.sqrt((rate - 1) * sum(size * size for _client, size in packets))
+    assert abs(sum(e["Entrada"] for e in estimated.values()) - true_total) <= bound
+    assert bound / true_total < 0.08
+
+    counters = shard.counters()
+    assert counters["packets_seen"] == len(packets)
+    assert counters["packets_sampled"] == len(packets) // rate
+    assert counters["window_seen"] / counters["window_sampled"] == rate
+    shard.flows.expire_all()
+    assert sum(flow[6] for flow in shard.flows.drain()) == len(packets)
+
+
+def test_rate_change_restarts_the_sampling_countdown():
+    shard = TrafficShard()
+    shard.set_sampling_rate(64)
+    for _ in range(10):
+        shard.sample()
+    # Sem reiniciar, os 53 pacotes que faltavam da taxa antiga ficariam fora da amostra
+    shard.set_sampling_rate(1)
+    assert shard.sample() == 1
+    shard.set_sampling_rate(4)
+    assert [shard.sample() for _ in range(8)] == [0, 0, 0, 4, 0, 0, 0, 4]
+
+
+def test_scapy_session_samples_before_dissection():
+    frames = [_frame(client, 100) for client in range(8)]
+    dissected = []
+
+    class FakeSocket:
+        def recv_raw(self, x=None):
+            return RecordingEther, frames.pop(0), 1.0
+
+    class RecordingEther(Ether):
+        def __init__(self, *args, **kwargs):
+            if args:
+                dissected.append(args[0])
+            super().__init__(*args, **kwargs)
+
+    shard = TrafficShard()
+    shard.set_sampling_rate(4)
+    session = sniffing_service.SampledSession(shard)
+    sock = FakeSocket()
+    packets = [packet for _ in range(8) for packet in session.recv(sock)]
+
+    assert len(packets) == len(dissected) == 2 and session.rate == 4
+    assert shard.packets_seen == 8
+    for packet in packets:
+        sniffing_service._account_packet(packet, shard, session.rate)
+    assert freeze_traffic(shard.data)[(SERVER, "10.100.0.3")]["Entrada"] == 400
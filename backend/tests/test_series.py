@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+import pytest
+from app.services.series import (
+    build_series, choose_series_source, parse_bucket, series_points, series_query, series_timestamps,
+)
+
+START = datetime(2024, 1, 1, 12)
+MINUTE = timedelta(minutes=1)
+
+
+def test_parse_bucket():
+    assert parse_bucket("10s") == timedelta(seconds=10)
+    assert parse_bucket("5m") == timedelta(minutes=5)
+    assert parse_bucket("1h") == timedelta(hours=1)
+    assert parse_bucket("90") == timedelta(seconds=90)
+    for value in ("0m", "1w", "m", "", None):
+        with pytest.raises(ValueError):
+            parse_bucket(value)
+
+
+@pytest.mark.parametrize("bucket, expected", [
+    ("10s", "raw"), ("90s", "raw"), ("1m", "minute"), ("15m", "minute"), ("1h", "hour"), ("6h", "hour"),
+    ("1d", "day"), ("2d", "day"),
+])
+def test_choose_series_source_picks_coarsest_exact_rollup(bucket, expected):
+    assert choose_series_source(parse_bucket(bucket))[0] == expected
+
+
+def test_series_query_by_ip_limits_to_top_keys():
+    sql, params = series_query("traffic_logs_1m", "ip", START, START + MINUTE * 3, MINUTE, ip=None, top=5)
+    assert sql.startswith("WITH top AS (SELECT t.client_ip AS top_key FROM traffic_logs_1m AS t")
+    assert "ORDER BY SUM(t.inbound + t.outbound) DESC, 1 LIMIT %s" in sql
+    assert "date_bin(%s, t.bucket" in sql and sql.endswith("GROUP BY 1, 2 ORDER BY 1, 2")
+    assert params == [START, START + MINUTE * 3, 5, MINUTE, START, START + MINUTE * 3]
+
+
+def test_series_query_by_protocol_reads_arrays_or_jsonb():
+    raw, params = series_query("traffic_logs", "protocol", START, START + MINUTE, timedelta(seconds=10), "10.0.0.2")
+    assert "unnest(t.proto_ids, t.proto_bytes)" in raw and "t.created_at >= %s" in raw
+    assert params.count("10.0.0.2") == 2
+    rollup, _ = series_query("traffic_logs_1h", "protocol", START, START + MINUTE, MINUTE)
+    assert "jsonb_each_text(t.protocols)" in rollup
+
+
+def test_series_query_without_grouping():
+    sql, params = series_query("traffic_logs", "none", START, START + MINUTE, MINUTE, "10.0.0.2")
+    assert "WITH" not in sql and sql.endswith("GROUP BY 2 ORDER BY 2")
+    assert params == [MINUTE, START, START + MINUTE, "10.0.0.2"]
+
+
+def test_build_series_fills_gaps_and_sorts_by_total():
+    points = series_points(START, START + MINUTE * 2 + timedelta(seconds=30), MINUTE)
+    assert points == 3
+    rows = [
+        ("10.0.0.2", START, 10, 1),
+        ("10.0.0.2", START + MINUTE * 2, 5, 0),
+        ("10.0.0.3", START + MINUTE, 100, 50),
+    ]
+    series = build_series(rows, START, MINUTE, points, ["inbound", "outbound"])
+    assert series == [
+        {"key": "10.0.0.3", "inbound": [0, 100, 0], "outbound": [0, 50, 0]},
+        {"key": "10.0.0.2", "inbound": [10, 0, 5], "outbound": [1, 0, 0]},
+    ]
+    assert series_timestamps(START, MINUTE, points)[-1] == "2024-01-01T12:02:00"
@@ -0,0 +1,106 @@
+from scapy.all import (
+    Ether, Dot1Q, IP, IPv6, IPv6ExtHdrHopByHop, TCP, UDP, ICMP, ARP, DNS, Raw,
+    IPOption, rdpcap, wrpcap,
+)
+from app.services import sniffing_service
+from app.services.pcap_reader import iter_pcap
+from app.services.capture_filter import build_bpf_filter
+from app.services.aggregation import TrafficShard, freeze_traffic
+from app.services.packet_ring import PacketRing
+
+SERVER = sniffing_service.SERVER_IP
+
+
+def _sample_packets():
+    return [
+        Ether() / IP(src="10.0.0.2", dst=SERVER) / TCP(dport=443) / Raw(b"x" * 100),
+        Ether() / IP(src=SERVER, dst="10.0.0.2") / TCP(sport=443) / Raw(b"y" * 1400),
+        Ether() / IP(src="10.0.0.3", dst=SERVER) / UDP(dport=53) / DNS(),
+        Ether() / IP(src=SERVER, dst="10.0.0.3") / ICMP(),
+        Ether() / IP(src="10.0.0.4", dst=SERVER, proto=47) / Raw(b"g" * 30),
+        Ether() / IP(src="10.0.0.4", dst=SERVER, frag=10, proto=6) / Raw(b"f" * 60),
+        Ether() / IP(src="10.0.0.4", dst=SERVER, proto=6) / Raw(b"ab"),
+        Ether() / IP(src="10.0.0.5", dst=SERVER, options=[IPOption(b"\x01\x01\x01\x01")]) / UDP(),
+        Ether() / Dot1Q(vlan=10) / IP(src=SERVER, dst="10.0.0.5") / TCP(),
+        Ether() / IP(src="10.0.0.6", dst=SERVER) / IPv6() / TCP(),
+        Ether() / IP(src="10.0.0.6", dst=SERVER) / IP(src="1.1.1.1", dst="2.2.2.2") / UDP(),
+        Ether() / IPv6() / IP(src="10.0.0.7", dst=SERVER) / TCP(),
+        Ether() / IPv6() / IPv6ExtHdrHopByHop() / IP(src=SERVER, dst="10.0.0.7") / UDP(),
+        Ether() / IP(src=SERVER, dst="10.0.0.8", proto=6, len=30) / Raw(b"p" * 40),
+        Ether() / IP(src=SERVER, dst="10.0.0.8") / ICMP(type=3) / IP(src="10.0.0.8", dst=SERVER) / TCP(),
+        Ether() / IP(src="192.168.1.1", dst="192.168.1.2") / TCP(),
+        Ether() / ARP(psrc=SERVER, pdst="10.0.0.9"),
+        Ether() / IPv6() / UDP(),
+        Ether(type=0x9999) / Raw(b"z" * 20),
+    ]
+
+
+def test_raw_engine_matches_scapy_engine(tmp_path):
+    pcap = tmp_path / "amostra.pcap"
+    wrpcap(str(pcap), _sample_packets())
+
+    scapy_shard = TrafficShard()
+    for packet in rdpcap(str(pcap)):
+        sniffing_service.process_packet(packet, scapy_shard)
+    scapy_result = freeze_traffic(scapy_shard.data)
+
+    raw_shard = TrafficShard()
+    for _ts, frame in iter_pcap(str(pcap)):
+        sniffing_service.process_frame(memoryview(frame), raw_shard)
+    raw_result = freeze_traffic(raw_shard.data)
+
+    assert scapy_result == raw_result
+    assert scapy_result[(SERVER, "10.0.0.2")]["Entrada"] > 0
+    assert scapy_result[(SERVER, "10.0.0.2")]["Saída"] > 0
+    assert "192.168.1.1" not in {client for _server, client in raw_result}
+
+
+def test_engines_agree_on_truncated_frames():
+    frame = bytes(Ether() / IP(src="10.0.0.2", dst=SERVER) / TCP() / Raw(b"x" * 8))
+    scapy_shard, raw_shard = TrafficShard(), TrafficShard()
+    for size in range(14, len(frame) + 1):
+        sniffing_service.process_packet(Ether(frame[:size]), scapy_shard)
+        sniffing_service.process_frame(frame[:size], raw_shard)
+
+    assert freeze_traffic(raw_shard.data) == freeze_traffic(scapy_shard.data)
+
+
+def test_batch_accounting_matches_per_packet_path(tmp_path):
+    pcap = tmp_path / "amostra.pcap"
+    frame = bytes(Ether() / IP(src="10.0.0.2", dst=SERVER) / TCP() / Raw(b"x" * 8))
+    wrpcap(str(pcap), _sample_packets() * 3 + [Ether(frame[:size]) for size in range(14, len(frame))])
+
+    frame_shard = TrafficShard(track_flows=True)
+    batch_shard = TrafficShard(track_flows=True)
+    ring = PacketRing(16)
+    for ts, frame in iter_pcap(str(pcap)):
+        sniffing_service.process_frame(frame, frame_shard, ts)
+        ring.append(frame, ts)
+        if ring.full:
+            sniffing_service.process_ring(ring, batch_shard)
+    sniffing_service.process_ring(ring, batch_shard)
+
+    assert freeze_traffic(batch_shard.data) == freeze_traffic(frame_shard.data)
+    assert batch_shard.counters() == frame_shard.counters()
+    frame_shard.flows.expire_all()
+    batch_shard.flows.expire_all()
+    assert sorted(batch_shard.flows.drain()) == sorted(frame_shard.flows.drain())
+
+
+def test_build_bpf_filter_includes_vlan_and_extra_filter():
+    expression = build_bpf_filter(["10.0.0.1", "2001:db8::/32"], "not port 22")
+    assert expression == (
+        "((ip host 10.0.0.1 or ip6 net 2001:db8::/32) or "
+        "(vlan and (ip host 10.0.0.1 or ip6 net 2001:db8::/32))) and (not port 22)"
+    )
+    assert build_bpf_filter([], "tcp") == "tcp"
+
+
+def test_capture_counters_count_seen_and_matched():
+    shard = TrafficShard()
+    sniffing_service.process_frame(bytes(Ether() / IP(src="10.0.0.2", dst=SERVER) / TCP()), shard)
+    sniffing_service.process_frame(bytes(Ether() / IP(src="10.0.0.2", dst="10.0.0.3") / TCP()), shard)
+
+    counters = shard.counters()
+    assert counters["packets_seen"] == 2
+    assert counters["packets_matched"] == 1
@@ -0,0 +1,52 @@
+import csv
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+from app.models.traffic_model import TrafficLog, encode_protocols
+
+LOGS = [
+    TrafficLog("10.1.0.1", 100, 50, {"TCP": 150}, "10.0.0.1", created_at=datetime(2024, 1, 1, 12, 0, 5)),
+    TrafficLog("outros", 7, 3, {"UDP": 10, "IP_PROTO_47": 0}, None, sampling_rate=4.0),
+]
+
+
+def test_encode_protocols_uses_dictionary_codes():
+    assert encode_protocols({"UDP": 10, "IP_PROTO_47": 4.0, "TCP": 150}) == ([47, 256, 257], [4, 150, 10])
+    assert encode_protocols({}) == ([], [])
+    # Nomes fora do dicionário somam no código reservado, sem erro
+    assert encode_protocols({"QUIC": 1, "TCP": 5, "SCTP?": 2.0}) == ([256, 999], [5, 3])
+
+
+def test_save_many_copies_whole_batch_in_one_command():
+    cursor = MagicMock()
+    sent = []
+    cursor.copy_expert.side_effect = lambda sql, stream: sent.append((sql, stream.read()))
+
+    TrafficLog.save_many(cursor, LOGS, "copy")
+
+    assert cursor.copy_expert.call_count == 1
+    sql, data = sent[0]
+    assert sql.startswith("COPY traffic_logs (client_ip, inbound, outbound, proto_ids, proto_bytes, server_ip, "
+                          "sampling_rate, created_at)")
+    rows = list(csv.reader(data.splitlines()))
+    assert rows[0] == ["10.1.0.1", "100", "50", "{256}", "{150}", "10.0.0.1", "1.0", "2024-01-01T12:00:05"]
+    assert rows[1][3:5] == ["{47,257}", "{0,10}"]
+    # server_ip ausente vira campo vazio sem aspas (NULL no COPY)
+    assert rows[1][5] == "" and ',,4.0,' in data.splitlines()[1]
+
+
+def test_save_many_values_uses_single_page():
+    cursor = MagicMock()
+    with patch("app.models.traffic_model.execute_values") as execute_values:
+        TrafficLog.save_many(cursor, LOGS, "values")
+
+    execute_values.assert_called_once()
+    _cursor, sql, rows = execute_values.call_args.args
+    assert sql.startswith("INSERT INTO traffic_logs") and len(rows) == 2
+    assert rows[1][3:5] == ([47, 257], [0, 10])
+    assert execute_values.call_args.kwargs["page_size"] == 2
+
+
+def test_save_many_skips_empty_batch():
+    cursor = MagicMock()
+    TrafficLog.save_many(cursor, [], "copy")
+    cursor.copy_expert.assert_not_called()
@@ -1,9 +1,11 @@
+import json
 from datetime import datetime, timezone
 from unittest.mock import MagicMock, patch
+from app.services.pagination import decode_cursor, encode_cursor
 
 def test_get_traffic_success(client):
     mock_logs = [
-        MagicMock(client_ip="192.168.0.1", inbound=100, outbound=200, protocols={"TCP": 10})
+        MagicMock(client_ip="192.168.0.1", server_ip="10.0.0.1", inbound=100, outbound=200, protocols={"TCP": 10})
     ]
     
     with patch("app.routes.traffic_routes.TrafficController.aggregate_realtime", return_value=mock_logs):
@@ -13,6 +15,21 @@ def test_get_traffic_success(client):
     data = response.get_json()
     assert "traffic" in data
     assert data["traffic"][0]["client_ip"] == "192.168.0.1"
+    assert data["traffic"][0]["server_ip"] == "10.0.0.1"
+
+def test_get_traffic_limit(client):
+    with patch("app.routes.traffic_routes.TrafficController.aggregate_realtime", return_value=[]) as realtime:
+        assert client.get("/api/traffic?top=5").status_code == 200
+        realtime.assert_called_once_with(5)
+        assert client.get("/api/traffic?limit=0").status_code == 400
+
+def test_get_capture_stats(client):
+    stats = {"packets_seen": 10, "packets_matched": 4, "filter": "ip host 10.0.0.1"}
+    with patch("app.routes.traffic_routes.TrafficController.capture_stats", return_value=stats):
+        response = client.get("/api/traffic/capture")
+
+    assert response.status_code == 200
+    assert response.get_json()["packets_matched"] == 4
 
 def test_get_historical_invalid_period(client):
     response = client.get("/api/traffic/aggregate?period=invalid")
@@ -55,3 +72,183 @@ def test_get_captures_by_ip_success(client, mock_db):
     assert data["captures"][0]["outbound"] == 358
     assert data["captures"][0]["protocols"] == {"UDP": 734}
 
+
+
+def test_get_historical_week_reads_hourly_rollup(client, mock_get_connection):
+    bucket = datetime(2024, 1, 1, 12)
+    cursor, _ = mock_get_connection(rows=[(720, "192.168.0.1", 1000, 500, {"TCP": 1500}, bucket, "10.0.0.1", 1.0)])
+
+    response = client.get("/api/traffic/aggregate?period=week")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["resolution"] == "hour"
+    assert data["traffic"][0]["samples"] == 720
+    assert data["traffic"][0]["timestamp"] == bucket.isoformat()
+    assert "FROM traffic_logs_1h" in cursor.execute.call_args.args[0]
+
+
+def test_get_historical_raw_resolution(client, mock_get_connection):
+    cursor, _ = mock_get_connection(rows=[(1, "192.168.0.1", 10, 5, {"UDP": 15}, datetime(2024, 1, 1), None, 1.0)])
+
+    response = client.get("/api/traffic/aggregate?period=hour&resolution=raw")
+    assert response.status_code == 200
+    assert response.get_json()["traffic"][0]["id"] == 1
+    assert "FROM traffic_logs WHERE" in cursor.execute.call_args.args[0]
+
+    assert client.get("/api/traffic/aggregate?period=day&resolution=second").status_code == 400
+
+
+def test_get_top_protocols_sums_in_sql(client, mock_get_connection):
+    cursor, _ = mock_get_connection(rows=[("TCP", 9000), ("UDP", 120)])
+
+    response = client.get("/api/traffic/protocols?period=day&ip=10.1.0.1&top=2")
+
+    assert response.status_code == 200
+    assert response.get_json()["protocols"] == [{"protocol": "TCP", "bytes": 9000}, {"protocol": "UDP", "bytes": 120}]
+    sql, params = cursor.execute.call_args.args
+    assert "unnest(t.proto_ids, t.proto_bytes)" in sql and "t.client_ip = %s" in sql
+    assert params[1:] == ["10.1.0.1", 2]
+
+
+def test_get_top_protocols_invalid_period(client):
+    response = client.get("/api/traffic/protocols?period=year")
+    assert response.status_code == 400
+
+
+def test_get_historical_keyset_page(client, mock_get_connection):
+    moment = datetime(2024, 1, 1, 12, 0, 5)
+    rows = [(i, "192.168.0.1", 10, 5, {}, moment, None, 1.0) for i in (7, 8)]
+    cursor, _ = mock_get_connection(rows=rows)
+
+    after = encode_cursor([moment, 6])
+    response = client.get(f"/api/traffic/aggregate?period=hour&resolution=raw&limit=2&cursor={after}")
+
+    assert response.status_code == 200
+    assert decode_cursor(response.get_json()["next_cursor"], 2) == [moment, 8]
+    sql, params = cursor.execute.call_args.args
+    assert "AND (created_at, id) > (%s, %s) ORDER BY created_at, id LIMIT %s" in sql
+    assert params[1:] == [moment, 6, 2]
+
+
+def test_get_historical_last_page_has_no_cursor(client, mock_get_connection):
+    mock_get_connection(rows=[(720, "192.168.0.1", 1, 1, {}, datetime(2024, 1, 1), "10.0.0.1", 1.0)])
+    response = client.get("/api/traffic/aggregate?period=week&limit=10")
+    assert response.get_json()["next_cursor"] is None
+
+
+def test_get_historical_rejects_bad_paging(client):
+    assert client.get("/api/traffic/aggregate?cursor=abc").status_code == 400
+    assert client.get("/api/traffic/aggregate?limit=0").status_code == 400
+    assert client.get("/api/traffic/aggregate?stream=csv").status_code == 400
+
+
+def test_get_historical_streams_ndjson(client, mock_get_connection):
+    cursor, conn = mock_get_connection()
+    cursor.__iter__.return_value = iter([(1, "192.168.0.1", 10, 5, {"UDP": 15}, datetime(2024, 1, 1), None, 1.0)])
+
+    response = client.get("/api/traffic/aggregate?period=minute&stream=ndjson")
+
+    assert response.mimetype == "application/x-ndjson"
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [1]
+    assert "name" in conn.cursor.call_args.kwargs
+    cursor.fetchall.assert_not_called()
+
+
+def test_get_captures_streams_chunked_json(client, mock_get_connection):
+    cursor, _ = mock_get_connection()
+    cursor.__iter__.return_value = iter([(376, 358, {"UDP": 734}, datetime(2024, 1, 1), 9)])
+
+    response = client.get("/api/traffic/captures/192.168.0.1?stream=json")
+
+    assert response.get_json() == {"captures": [
+        {"inbound": 376, "outbound": 358, "protocols": {"UDP": 734}, "created_at": "2024-01-01T00:00:00"}
+    ]}
+    sql, params = cursor.execute.call_args.args
+    assert "LIMIT" not in sql and params == ["192.168.0.1"]
+
+
+def test_get_captures_keyset_page(client, mock_get_connection):
+    moment = datetime(2024, 1, 1, 12)
+    cursor, _ = mock_get_connection(rows=[(1, 1, {}, moment, 30)])
+
+    response = client.get(f"/api/traffic/captures/192.168.0.1?limit=1&cursor={encode_cursor([moment, 31])}")
+
+    assert decode_cursor(response.get_json()["next_cursor"], 2) == [moment, 30]
+    sql, params = cursor.execute.call_args.args
+    assert "(created_at, id) < (%s, %s) ORDER BY created_at DESC, id DESC" in sql
+    assert params == ["192.168.0.1", moment, 31, 1]
+
+
+def test_get_captures_default_page_has_no_cursor(client, mock_get_connection):
+    cursor, _ = mock_get_connection(rows=[(1, 1, {}, datetime(2024, 1, 1), 30)])
+
+    response = client.get("/api/traffic/captures/192.168.0.1")
+
+    assert list(response.get_json()) == ["captures"]
+    assert cursor.execute.call_args.args[1] == ["192.168.0.1", 50]
+
+
+def test_get_historical_series_grouped_by_ip(client, mock_get_connection):
+    now = datetime.utcnow()
+    bucket = now.replace(minute=0, second=0, microsecond=0)
+    cursor, _ = mock_get_connection(rows=[("192.168.0.1", bucket, 1000, 500)])
+
+    response = client.get("/api/traffic/aggregate?period=day&bucket=1h&group_by=ip&top=3")
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["resolution"] == "hour" and data["bucket"] == 3600
+    assert len(data["timestamps"]) == len(data["series"][0]["inbound"]) in (24, 25)
+    assert data["timestamps"][-1] == bucket.isoformat()
+    assert data["series"][0]["key"] == "192.168.0.1" and data["series"][0]["inbound"][-1] == 1000
+    assert "FROM traffic_logs_1h" in cursor.execute.call_args.args[0]
+
+
+def test_get_historical_series_rejects_bad_parameters(client):
+    assert client.get("/api/traffic/aggregate?period=week&bucket=10s").status_code == 400
+    assert client.get("/api/traffic/aggregate?period=day&group_by=port").status_code == 400
+    assert client.get("/api/traffic/aggregate?period=day&bucket=1m&resolution=hour").status_code == 400
+    assert client.get("/api/traffic/aggregate?period=day&bucket=1h&top=0").status_code == 400
+
+
+def test_history_is_cached_until_the_writer_flushes(client, mock_get_connection):
+    from app.services.response_cache import TRAFFIC, response_cache
+
+    cursor, _ = mock_get_connection(rows=[(720, "192.168.0.1", 1, 1, {}, datetime(2024, 1, 1), "10.0.0.1", 1.0)])
+    first = client.get("/api/traffic/aggregate?period=week")
+    second = client.get("/api/traffic/aggregate?period=week")
+    assert (first.headers["X-Cache"], second.headers["X-Cache"]) == ("MISS", "HIT")
+    assert second.get_json() == first.get_json() and cursor.execute.call_count == 1
+
+    response_cache.invalidate(TRAFFIC)
+    client.get("/api/traffic/aggregate?period=week")
+    assert cursor.execute.call_count == 2
+
+
+def test_get_top_flows_validates_limit(client, mock_get_connection):
+    cursor, _ = mock_get_connection(rows=[])
+
+    for bad in ("abc", "-1", "0"):
+        assert client.get(f"/api/traffic/flows?limit={bad}").status_code == 400
+    cursor.execute.assert_not_called()
+
+    assert client.get("/api/traffic/flows").status_code == 200
+    assert cursor.execute.call_args.args[1][-1] == 50
+
+
+def test_get_top_protocols_validates_top(client, mock_get_connection):
+    cursor, _ = mock_get_connection(rows=[])
+
+    for bad in ("abc", "-1", "0"):
+        assert client.get(f"/api/traffic/protocols?top={bad}").status_code == 400
+    cursor.execute.assert_not_called()
+
+    assert client.get("/api/traffic/protocols").status_code == 200
+    assert cursor.execute.call_args.args[1][-1] == 10
+
+
+def test_client_protocols_do_not_treat_the_sketch_others_row_as_a_client(client, mock_get_connection):
+    cursor, _ = mock_get_connection(fetchone=("outros", 1, 1, {}, datetime(2024, 1, 1)))
+    assert client.get("/api/traffic/protocols/outros").status_code == 404
+    cursor.execute.assert_not_called()